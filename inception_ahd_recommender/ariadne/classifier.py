@@ -15,14 +15,15 @@
 # limitations under the License.
 import logging
 import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import List, Optional, Any
+from typing import Iterable, Iterator, List, Optional, Any, Tuple
 
 import joblib
 from cassis import Cas
 
 import ariadne
-from ariadne.protocol import TrainingDocument
+from ariadne.protocol import PredictionRequest, TrainingDocument
 
 logger = logging.getLogger(__file__)
 
@@ -54,6 +55,41 @@ class Classifier:
     ):
         raise NotImplementedError()
 
+    def predict_batch(
+        self, requests: Iterable[PredictionRequest], parallelism: int = 1
+    ) -> Iterator[Tuple[PredictionRequest, Optional[Exception]]]:
+        """Predict many documents with up to ``parallelism`` concurrent ``predict`` calls.
+        Yields the requests (with the predictions added to their cas) in the order they are finished,
+        together with the exception of a failed prediction. Requests that already carry an error
+        (e.g. the document could not be parsed) are yielded at once with that error."""
+
+        def _predict(req: PredictionRequest):
+            try:
+                self.predict(req.cas, req.layer, req.feature, req.project_id, req.document_id, req.user_id)
+                return req, None
+            except Exception as e:
+                logger.error("Prediction of document [%s] failed: %s", req.document_id, e)
+                return req, e
+
+        parallelism = max(1, parallelism)
+        with ThreadPoolExecutor(max_workers=parallelism) as executor:
+            in_flight = set()
+            for req in requests:
+                if req.error is not None:
+                    logger.error("Document [%s] not predicted: %s", req.document_id, req.error)
+                    yield req, req.error
+                    continue
+                in_flight.add(executor.submit(_predict, req))
+                # read ahead only a few documents, the others stay unparsed
+                if len(in_flight) >= 2 * parallelism:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            while in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
     def _load_model(self, user_id: str) -> Optional[Any]:
         model_path = self._get_model_path(user_id)
         if model_path.is_file():
@@ -1,11 +1,13 @@
+import hashlib
 import json
 import logging
 import pathlib
 import sys
 from abc import ABC, abstractmethod
 from collections import namedtuple, defaultdict
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
+from typing import Iterator
 
 import cassis
 from cassis.typesystem import TypeNotFoundError, FeatureStructure
@@ -42,38 +44,54 @@ class Annotation:
         return getattr(self, attr, None)
 
 
+@dataclass
+class ConsumerResult:
+    """Accumulator of the results of one ``ResponseConsumer.process`` call.
+    Every call builds its own, so that one consumer can serve concurrent requests."""
+    count: int = 0
+    offsets: list = field(default_factory=list)
+    labels: list = field(default_factory=list)
+    scores: list = field(default_factory=list)
+    features: list = field(default_factory=list)
+
+    def add(self, anno: Annotation, label, features: dict = None):
+        self.count += 1
+        self.offsets.append(
+            (
+                anno.begin,
+                anno.end,
+            )
+        )
+        self.labels.append(label)
+        self.scores.append(anno.score)
+        self.features.append(features if features is not None else {})
+
+    def to_return_value(self) -> "response_consumer_return_value":
+        return response_consumer_return_value(
+            self.offsets, self.labels, self.count, self.scores, self.features
+        )
+
+
 class Processor(ABC):
+    """Iterates over the annotations of a server response; stateless, the response is passed to every call."""
+
     def __init__(self, proc_type):
         self.type = proc_type
 
     @abstractmethod
-    def init(self, response, consumer):
-        consumer.count = 0
-        consumer.labels = []
-        consumer.offsets = []
-        consumer.scores = []
-        consumer.features = []
-
-    @abstractmethod
-    def get_next(self, layer) -> Annotation:
+    def get_next(self, response, layer) -> Iterator[Annotation]:
         raise NotImplementedError
 
 
 class JsonProcessor(Processor):
     def __init__(self):
         super().__init__(self.__class__.__name__)
-        self.json_data = None
 
-    def init(self, json_response: dict, consumer):
+    def get_next(self, json_response: dict, layer) -> Iterator[Annotation]:
+        logging.debug(f"Getting next for layer {layer}")
         if "payload" not in json_response:
             logging.warning(f"No payload:\n{json_response}")
-        super().init(json_response, consumer)
-        self.json_data = json_response.get("payload", [])
-        return self
-
-    def get_next(self, layer) -> Annotation:
-        logging.debug(f"Getting next for layer {layer}")
-        for anno in self.json_data:
+        for anno in json_response.get("payload", []):
             _begin = anno.get("begin", None)
             _end = anno.get("end", None)
             _layer = anno.get("type", None)
@@ -88,17 +106,11 @@ class JsonProcessor(Processor):
 class CasProcessor(Processor):
     def __init__(self):
         super().__init__(self.__class__.__name__)
-        self.cas_data = None
-
-    def init(self, cas: cassis.Cas, consumer):
-        super().init(cas, consumer)
-        self.cas_data = cas
-        return self
 
-    def get_next(self, layer) -> Annotation:
+    def get_next(self, cas: cassis.Cas, layer) -> Iterator[Annotation]:
         logging.debug(f"Getting next for layer {layer}")
         try:
-            for anno in self.cas_data.select(layer):
+            for anno in cas.select(layer):
                 result_anno = Annotation(
                     begin=anno.get("begin"),
                     end=anno.get("end"),
@@ -114,18 +126,19 @@ class CasProcessor(Processor):
 
 
 class ResponseConsumer(ABC):
+    """Maps the response of an external server to ``response_consumer_return_value``.
+    Consumers hold only their configuration: ``process`` keeps the results of a response in its own
+    ``ConsumerResult``, so one instance is safe to use from many threads (e.g. gthread workers)."""
+
     def __init__(self, name: str, processor: ProcessorType):
         self.processor_types = {
             ProcessorType.CAS: CasProcessor,
             ProcessorType.JSON: JsonProcessor,
         }
         self.name = name
+        # identifies the configuration of the consumer in cache keys (ariadne.contrib.prediction_cache)
+        self.fingerprint = name
         self.processor = self.processor_types.get(processor, CasProcessor)()
-        self.count = 0
-        self.labels = []
-        self.offsets = []
-        self.scores = []
-        self.features = []
 
     @abstractmethod
     def process(self, response, layer = None) -> "response_consumer_return_value":
@@ -139,7 +152,11 @@ class MappingConsumer(ResponseConsumer):
     ):
         super().__init__(name=self.__class__.__name__, processor=processor)
         self.mapper = MappingConfig.build(pathlib.Path(config))
+        self.fingerprint = (
+            f"{self.name}:{hashlib.sha256(pathlib.Path(config).read_bytes()).hexdigest()}"
+        )
         self._check_target_layers()
+        self._check_additional_features()
 
     def _check_target_layers(self):
         _target_layers = defaultdict(list)
@@ -171,8 +188,25 @@ class MappingConsumer(ResponseConsumer):
             )
             sys.exit(-1)
 
+    def _check_additional_features(self):
+        # the target feature is set by the label; done once here, the mapping is not changed while processing
+        for check_dict in self.mapper.annotation_mapping.values():
+            _dupl = check_dict.additional_feats.pop(check_dict.target_feature, None)
+            if _dupl is not None:
+                logging.warning(
+                    f"Removed {_dupl} from 'add_feature' for entry '{check_dict.entry_name}'.")
+
+    @staticmethod
+    def _label_features(anno: Annotation, target_feature: str, label: str, additional_feats: dict) -> dict:
+        _features = {target_feature: label}
+        for _target_feature, mapping_tuple in additional_feats.items():  # Provide the "add_feature" values
+            _feat_val = mapping_tuple[0](anno, mapping_tuple[1])
+            if _feat_val is not None:
+                _features[_target_feature] = _feat_val
+        return _features
+
     def process(self, response, layer = None) -> "response_consumer_return_value":
-        _processor = self.processor.init(response, self)
+        _result = ConsumerResult()
 
         for source_layer, check_dict in self.mapper.annotation_mapping.items():
             # Multilayer is not allowed for Recommender since a single Recommender is configured for an INCEpTION layer
@@ -187,25 +221,27 @@ class MappingConsumer(ResponseConsumer):
 
             anno: Annotation
             _warned = False
-            for anno in _processor.get_next(source_layer):
+            for anno in self.processor.get_next(response, source_layer):
                 _final_label = None
                 _final_features = None
 
                 if anno is None:
                     continue
+                if check_dict.dispatch is not None:
+                    # compiled mapping: one feature read and one lookup
+                    _match = check_dict.dispatch.get(anno)
+                    if _match is not None:
+                        _final_label = _match[0]
+                        _final_features = self._label_features(anno, check_dict.target_feature, *_match)
+                    _result.add(anno, _final_label, _final_features)
+                    continue
                 # if check_dict.mapping_type == MappingTypeEnum.SINGLELAYER:
                 for _label, _check_call in check_dict.items():
                     if callable(_check_call) and _check_call(anno):
                         _final_label = _label
-                        _final_features = {check_dict.target_feature: _label}
-                        _dupl = check_dict.additional_feats.pop(check_dict.target_feature, None)
-                        if _dupl is not None:
-                            logging.warning(
-                                f"Removed {_dupl} from 'add_feature' for entry '{check_dict.entry_name}_{_label}'.")
-                        for target_feature, mapping_tuple in check_dict.additional_feats.items():  # Provide the "add_feature" values
-                            _feat_val = mapping_tuple[0](anno,mapping_tuple[1])
-                            if _feat_val is not None:
-                                _final_features[target_feature] = _feat_val
+                        _final_features = self._label_features(
+                            anno, check_dict.target_feature, _label, check_dict.additional_feats
+                        )
                         break  # Stacking layers is not allowed
                     elif isinstance(_check_call, tuple) and _check_call[0](anno, _check_call[1]) is not None:
                         _final_label = _check_call[0](anno, _check_call[1])
@@ -218,19 +254,8 @@ class MappingConsumer(ResponseConsumer):
                                 f" Trying to evaluate the settings."
                             )
                             _warned = True
-                self.count += 1
-                self.labels.append(_final_label)
-                self.offsets.append(
-                    (
-                        anno.begin,
-                        anno.end,
-                    )
-                )
-                self.scores.append(anno.score)
-                self.features.append(_final_features)
-        return response_consumer_return_value(
-            self.offsets, self.labels, self.count, self.scores, self.features
-        )
+                _result.add(anno, _final_label, _final_features)
+        return _result.to_return_value()
 
 
 class SimpleDeidConsumer(ResponseConsumer):
@@ -248,25 +273,15 @@ class SimpleDeidConsumer(ResponseConsumer):
             "PHIOther",
         ]
 
-    def process(self, response) -> "response_consumer_return_value":
-        _processor = self.processor.init(response, self)
+    def process(self, response, layer = None) -> "response_consumer_return_value":
+        _result = ConsumerResult()
 
-        for anno in _processor.get_next():
-            if anno.layer.startswith(self.namespace):
-                _anno_label = anno.layer[len(self.namespace) :]
-                if _anno_label not in self.deid_types:
+        for _anno_label in self.deid_types:
+            for anno in self.processor.get_next(response, f"{self.namespace}{_anno_label}"):
+                if anno is None:
                     continue
-                self.count += 1
-                self.offsets.append(
-                    (
-                        anno.begin,
-                        anno.end,
-                    )
-                )
-                self.labels.append(_anno_label)
-        return response_consumer_return_value(
-            self.offsets, self.labels, self.count, self.scores, None
-        )
+                _result.add(anno, _anno_label)
+        return _result.to_return_value()
 
 
 if __name__ == "__main__":
@@ -1,18 +1,23 @@
 import json
 import logging
+import os
 import pathlib
 import sys
+import threading
 from abc import abstractmethod, ABC
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from pydoc import locate
-from typing import Any, Optional, List, Union
+from typing import Any, Optional, List, Tuple, Union
 
 import cassis
 import requests
 from cassis import Cas
 from averbis import Client as AHDClient
 from requests import RequestException
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from ariadne.classifier import Classifier as AriadneClassifier
 from ariadne.contrib.external_server_consumer import (
@@ -22,6 +27,9 @@ from ariadne.contrib.external_server_consumer import (
     CasProcessor,
 )
 from ariadne.contrib.inception_util import create_span_prediction
+from ariadne.contrib.prediction_cache import PredictionCache
+from ariadne.contrib.text_chunker import IncompletePrediction, chunk_text, merge_chunk_results
+from ariadne.metrics import metrics
 from ariadne.protocol import TrainingDocument
 
 logging.basicConfig(level=logging.INFO)
@@ -92,12 +100,59 @@ def _as_named_tuple(dct: dict):
     )
 
 
+def create_http_session(
+    pool_size: int = 10, retries: int = 3, backoff_factor: float = 0.5
+) -> requests.Session:
+    """Session with a pool of keep-alive connections and retries with exponential backoff on connection
+    errors and on 502/503/504 of idempotent requests. A POST (text analysis) is only retried if the connection
+    could not be established: a read timeout of a long analysis is not repeated."""
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=0,
+        backoff_factor=backoff_factor,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def connection_statistics(session: requests.Session) -> Tuple[int, int]:
+    """Number of requests and of opened connections of the connection pools of a session."""
+    _requests, _connections = 0, 0
+    for adapter in set(session.adapters.values()):
+        for key in adapter.poolmanager.pools.keys():
+            pool = adapter.poolmanager.pools[key]
+            _requests += pool.num_requests
+            _connections += pool.num_connections
+    return _requests, _connections
+
+
 class ExternalClassifier(ABC):
-    def __init__(self, config, classifier_type):
+    def __init__(
+        self,
+        config,
+        classifier_type,
+        prediction_cache: Optional[PredictionCache] = None,
+        prefetch_parallelism: int = 4,
+        chunk_size: int = 0,
+        chunk_context: int = 200,
+        chunk_parallelism: int = 4,
+    ):
         self._classifier_type = classifier_type
         self._config: Optional["config_object"] = None
         self._server = None
         self._response_consumer: Optional[ResponseConsumer] = None
+        self._prediction_cache = prediction_cache
+        self._prefetch_parallelism = prefetch_parallelism
+        self._chunk_size = chunk_size
+        self._chunk_context = chunk_context
+        self._chunk_parallelism = chunk_parallelism
 
         self._initialize_configuration(config)
         self._initialize_server()
@@ -181,24 +236,180 @@ class ExternalClassifier(ABC):
     def process_text(self, text: str, layer: str, language: str = None):
         raise NotImplementedError
 
+    def get_prediction_cache(self) -> Optional[PredictionCache]:
+        return self._prediction_cache
+
+    def process_text_chunked(self, text: str, layer: str, language: str = None):
+        """Like ``process_text``, but texts longer than ``chunk_size`` are split at paragraph/sentence
+        boundaries and the chunks are analysed in parallel (``chunk_parallelism``). Texts up to
+        ``chunk_size`` (or every text, if ``chunk_size`` is 0) are sent as they are.
+        Raises ``IncompletePrediction`` if only some of the chunks failed."""
+        _chunks = chunk_text(text, self._chunk_size, self._chunk_context)
+        if len(_chunks) == 1:
+            return self.process_text(text, layer, language)
+
+        def _analyse(chunk):
+            try:
+                return self.process_text(chunk.text(text), layer, language)
+            except Exception as e:
+                logging.error(f"Analysis of the chunk {chunk.begin}-{chunk.end} failed: '{e}'")
+                return None
+
+        logging.info(
+            f"Analysing a document of {len(text)} characters in {len(_chunks)} chunks"
+            f" (parallelism: {self._chunk_parallelism})."
+        )
+        with ThreadPoolExecutor(max_workers=max(1, self._chunk_parallelism)) as executor:
+            _results = list(executor.map(_analyse, _chunks))
+
+        _failed = sum(1 for r in _results if not isinstance(r, response_consumer_return_value))
+        if _failed == len(_chunks):
+            return None
+        _merged = merge_chunk_results(_chunks, _results)
+        if _failed:
+            logging.warning(f"{_failed} of {len(_chunks)} chunks failed, the prediction is incomplete.")
+            raise IncompletePrediction(_merged, _failed, len(_chunks))
+        return _merged
+
+    def process_text_cached(self, text: str, layer: str, feature: str, language: str = None):
+        """Like ``process_text_chunked``, but answered from the prediction cache if the same text was already
+        processed with the same pipeline, layer, feature and response consumer configuration.
+        Concurrent requests of the same document wait for the first one (single flight)."""
+        try:
+            if self._prediction_cache is None:
+                return self.process_text_chunked(text, layer, language)
+
+            _key = self._prediction_key(text, layer, feature, language)
+            return self._prediction_cache.get_or_compute(
+                _key, lambda: self.process_text_chunked(text, layer, language)
+            )
+        except IncompletePrediction as e:
+            return e.prediction
+
+    def _prediction_key(self, text: str, layer: str, feature: str, language: str = None) -> str:
+        _fingerprint = getattr(self.get_response_consumer(), "fingerprint", None)
+        if 0 < self._chunk_size < len(text):
+            # the result of a chunked text depends on the chunking
+            _fingerprint = f"{_fingerprint}:chunks-{self._chunk_size}-{self._chunk_context}"
+        return self._prediction_cache.key(
+            text,
+            language,
+            self.get_configuration().pipeline_project,
+            self.get_configuration().pipeline_name,
+            layer,
+            feature,
+            _fingerprint,
+        )
+
+    def prefetch(self, documents: List[TrainingDocument], layer: str, feature: str) -> int:
+        """Precompute the predictions of the documents (e.g. of a training request, which contains every
+        document of the project) into the prediction cache, so that later predict requests are answered
+        at once. Returns the number of analysed documents."""
+        if self._prediction_cache is None or not self._prefetch_parallelism:
+            return 0
+
+        _pending = {}
+        for doc in documents:
+            _text = doc.cas.sofa_string
+            if not _text:
+                continue
+            _language = doc.cas.document_language
+            _key = self._prediction_key(_text, layer, feature, _language)
+            if _key not in _pending and self._prediction_cache.get(_key, record=False) is None:
+                _pending[_key] = (_text, _language)
+
+        if _pending:
+            logging.info(
+                f"Prefetching the predictions of {len(_pending)} of {len(documents)} documents"
+                f" (parallelism: {self._prefetch_parallelism})."
+            )
+            self._prefetch_texts(_pending, layer)
+        return len(_pending)
+
+    def _prefetch_texts(self, pending: dict, layer: str):
+        """Analyse the texts ``{key: (text, language)}`` and store the results in the prediction cache."""
+
+        def _analyse(key_text_language):
+            _key, (_text, _language) = key_text_language
+            try:
+                self._prediction_cache.put(_key, self.process_text_chunked(_text, layer, _language))
+            except IncompletePrediction:
+                pass
+
+        with ThreadPoolExecutor(max_workers=self._prefetch_parallelism) as executor:
+            list(executor.map(_analyse, pending.items()))
+
 
 class ExternalUIMAClassifier(AriadneClassifier, ExternalClassifier):
-    def __init__(self, config: Union[Path, dict], model_directory: Path = None):
+    # log the connection reuse of the http session every n requests
+    CONNECTION_STATISTICS_INTERVAL = 100
+
+    def __init__(
+        self,
+        config: Union[Path, dict],
+        model_directory: Path = None,
+        prediction_cache: Optional[PredictionCache] = None,
+        prefetch_parallelism: int = 4,
+        chunk_size: int = 0,
+        chunk_context: int = 200,
+        chunk_parallelism: int = 4,
+        pool_size: int = 10,
+        timeout: Tuple[float, float] = (5.0, 300.0),
+        retries: int = 3,
+        backoff_factor: float = 0.5,
+    ):
+        # needed by _initialize_server, which is called by ExternalClassifier.__init__
+        self._pool_size = pool_size
+        self._timeout = timeout
+        self._retries = retries
+        self._backoff_factor = backoff_factor
+        self._session: Optional[requests.Session] = None
+        self._session_pid: Optional[int] = None
+        self._session_requests = 0
+        self._session_lock = threading.Lock()
         super().__init__(model_directory)
-        super(AriadneClassifier, self).__init__(config, self.__class__.__name__)
+        super(AriadneClassifier, self).__init__(
+            config,
+            self.__class__.__name__,
+            prediction_cache,
+            prefetch_parallelism,
+            chunk_size,
+            chunk_context,
+            chunk_parallelism,
+        )
+
+    def get_session(self) -> requests.Session:
+        # one session per worker process: a session created before a fork is not shared with the parent
+        with self._session_lock:
+            if self._session is None or self._session_pid != os.getpid():
+                self._session = create_http_session(self._pool_size, self._retries, self._backoff_factor)
+                self._session_pid = os.getpid()
+                self._session_requests = 0
+            return self._session
+
+    def _count_request(self):
+        with self._session_lock:
+            self._session_requests += 1
+            _log = self._session_requests % self.CONNECTION_STATISTICS_INTERVAL == 0
+        if _log:
+            _requests, _connections = connection_statistics(self._session)
+            logging.info(
+                f"HTTP session of worker {self._session_pid}: {_requests} requests"
+                f" over {_connections} connections."
+            )
 
     def _initialize_server(self):
         try:
             if self.get_configuration().address is None:
                 raise RuntimeError("Configuration has seemingly failed")
-            response = requests.get(self.get_configuration().address)
+            response = self.get_session().get(self.get_configuration().address, timeout=self._timeout)
             logging.info(f"Server accessible: '{response.status_code}'")
             _endpoint = (
                 f"health-discovery/rest/v1/textanalysis/projects/{self.get_configuration().pipeline_project}"
                 f"/pipelines/{self.get_configuration().pipeline_name}/analyseText"
             )
             self._server = f"{self.get_configuration().address}/{_endpoint}"
-        except (requests.exceptions.HTTPError, requests.exceptions.ConnectionError):
+        except RequestException:
             logging.error(
                 f"No server reachable under '{self.get_configuration().address}'"
             )
@@ -214,15 +425,25 @@ class ExternalUIMAClassifier(AriadneClassifier, ExternalClassifier):
 
     def process_text(self, text: str, layer: str, language: str = None):
         if self.get_server() is not None and self.get_response_consumer() is not None:
-            response = requests.post(
-                self.get_server(),
-                data=text.encode("utf-8"),
-                headers={
-                    "Content-Type": "text/plain; charset=utf-8",
-                    "api-token": self.get_configuration().security_token,
-                },
-            )
-            _parsed_response = self.get_response_consumer().process(response.json())
+            try:
+                with metrics.time("round_trip"):
+                    response = self.get_session().post(
+                        self.get_server(),
+                        data=text.encode("utf-8"),
+                        headers={
+                            "Content-Type": "text/plain; charset=utf-8",
+                            "api-token": self.get_configuration().security_token,
+                        },
+                        timeout=self._timeout,
+                    )
+                response.raise_for_status()
+            except RequestException as e:
+                logging.error(f"Server not accessible: '{e}'")
+                return None
+            finally:
+                self._count_request()
+            with metrics.time("mapping"):
+                _parsed_response = self.get_response_consumer().process(response.json())
             return _parsed_response
         else:
             _faulty_config = (
@@ -242,7 +463,9 @@ class ExternalUIMAClassifier(AriadneClassifier, ExternalClassifier):
         document_id: str,
         user_id: str,
     ):
-        _server_response = self.process_text(cas.sofa_string)
+        _server_response = self.process_text_cached(
+            cas.sofa_string, layer, feature, cas.document_language
+        )
         add_prediction_to_cas(
             cas,
             layer,
@@ -264,14 +487,32 @@ class ExternalUIMAClassifier(AriadneClassifier, ExternalClassifier):
     ):
         for doc in documents:
             logging.info(doc.document_id)
+        self.prefetch(documents, layer, feature)
 
 
 class AHDClassifier(AriadneClassifier, ExternalClassifier):
 
-    def __init__(self, config: Union[Path, dict], model_directory: Path = None):
+    def __init__(
+        self,
+        config: Union[Path, dict],
+        model_directory: Path = None,
+        prediction_cache: Optional[PredictionCache] = None,
+        prefetch_parallelism: int = 4,
+        chunk_size: int = 0,
+        chunk_context: int = 200,
+        chunk_parallelism: int = 4,
+    ):
         self._pipeline = None
         super().__init__(model_directory)
-        super(AriadneClassifier, self).__init__(config, self.__class__.__name__)
+        super(AriadneClassifier, self).__init__(
+            config,
+            self.__class__.__name__,
+            prediction_cache,
+            prefetch_parallelism,
+            chunk_size,
+            chunk_context,
+            chunk_parallelism,
+        )
 
     def get_pipeline(self):
         return self._pipeline
@@ -331,10 +572,10 @@ class AHDClassifier(AriadneClassifier, ExternalClassifier):
 
     def process_text(self, text: str, layer: str, language: str = None):
         try:
-            return self.get_response_consumer().process(
-                self.get_pipeline().analyse_text_to_cas(source=text, language=language),
-                layer
-            )
+            with metrics.time("round_trip"):
+                _response = self.get_pipeline().analyse_text_to_cas(source=text, language=language)
+            with metrics.time("mapping"):
+                return self.get_response_consumer().process(_response, layer)
         except RequestException as e:
             log_str = f"AHD not accessible: '{e}'"
             if self.get_configuration().docker_mode:
@@ -351,6 +592,34 @@ class AHDClassifier(AriadneClassifier, ExternalClassifier):
         user_id: str,
     ):
         super().fit(documents, layer, feature, project_id, user_id)
+        # nothing to train: the documents of the project are used to warm the prediction cache
+        self.prefetch(documents, layer, feature)
+
+    def _prefetch_texts(self, pending: dict, layer: str):
+        # long texts are chunked one after another, the others are batched per language
+        # with the parallel analysis of the pipeline
+        _long = {k: v for k, v in pending.items() if 0 < self._chunk_size < len(v[0])}
+        if _long:
+            super()._prefetch_texts(_long, layer)
+        _by_language = {}
+        for _key, (_text, _language) in pending.items():
+            if _key not in _long:
+                _by_language.setdefault(_language, {})[_text] = _key
+
+        for _language, _keys in _by_language.items():
+            try:
+                for result in self.get_pipeline().analyse_texts_to_cas(
+                    list(_keys), parallelism=self._prefetch_parallelism, language=_language
+                ):
+                    if not result.successful():
+                        logging.warning(f"Prefetch of a document failed: '{result.exception}'")
+                        continue
+                    self._prediction_cache.put(
+                        _keys[result.source],
+                        self.get_response_consumer().process(result.data, layer),
+                    )
+            except RequestException as e:
+                logging.error(f"AHD not accessible during prefetch: '{e}'")
 
     def predict(
         self,
@@ -361,7 +630,9 @@ class AHDClassifier(AriadneClassifier, ExternalClassifier):
         document_id: str,
         user_id: str,
     ):
-        _server_response = self.process_text(cas.sofa_string, layer, cas.document_language)
+        _server_response = self.process_text_cached(
+            cas.sofa_string, layer, feature, cas.document_language
+        )
         add_prediction_to_cas(
             cas,
             layer,
@@ -387,18 +658,19 @@ def add_prediction_to_cas(
     if isinstance(response, response_consumer_return_value) and isinstance(
         response.count, int
     ):
-        for i in range(response.count):
-            _begin, _end = response.offsets[i]
-            prediction = create_span_prediction(
-                cas,
-                layer,
-                feature,
-                _begin,
-                _end,
-                response.labels[i] if feature not in response.features[i] else response.features[i][feature],
-                response.score[i],
-            )
-            cas.add(prediction)
+        with metrics.time("add_predictions"):
+            for i in range(response.count):
+                _begin, _end = response.offsets[i]
+                prediction = create_span_prediction(
+                    cas,
+                    layer,
+                    feature,
+                    _begin,
+                    _end,
+                    response.labels[i] if feature not in response.features[i] else response.features[i][feature],
+                    response.score[i],
+                )
+                cas.add(prediction)
     else:
         logging.error(
             f"Failed to predict document with id: {document_id} (response from 'process_text' seems to be faulty)."
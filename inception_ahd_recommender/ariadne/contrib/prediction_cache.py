@@ -0,0 +1,239 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable, Dict, Optional, Union
+
+from filelock import FileLock, Timeout
+
+from ariadne.contrib.external_server_consumer import response_consumer_return_value
+from ariadne.metrics import metrics
+
+
+def text_fingerprint(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class PredictionCache:
+    """Content-addressed cache of the mapped server responses (``response_consumer_return_value``).
+
+    The key covers everything a prediction depends on: the hash of the document text, the document language,
+    the pipeline (project/name), the target layer/feature and the fingerprint of the response consumer
+    (e.g. the hash of the mapping file). A document that is opened again is answered from the cache without a
+    request to the external server.
+
+    Tiers:
+    * in-memory LRU (``max_entries``, per process),
+    * optional on-disk tier (``directory``), one json file per key, shared by all gunicorn workers.
+      Files are written atomically, so concurrent workers never read a partial entry.
+
+    ``get_or_compute`` coalesces concurrent misses of the same key (single flight): within a worker the
+    threads wait for the first one, with the disk tier the workers wait on a file lock in ``lock_directory``
+    and read the result of the first one from disk.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        directory: Optional[Union[str, Path]] = None,
+        lock_directory: Optional[Union[str, Path]] = None,
+        lock_timeout: float = 120,
+    ):
+        self.max_entries = max_entries
+        self.directory = Path(directory) if directory else None
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self.lock_directory = (
+            Path(lock_directory)
+            if lock_directory
+            else Path(tempfile.gettempdir()) / ".ariadne_locks" / "predictions"
+        )
+        self.lock_timeout = lock_timeout
+        self._entries: "OrderedDict[str, response_consumer_return_value]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def key(
+        text: str,
+        language: Optional[str],
+        pipeline_project: Optional[str],
+        pipeline_name: Optional[str],
+        layer: Optional[str],
+        feature: Optional[str],
+        consumer_fingerprint: Optional[str],
+    ) -> str:
+        _parts = [
+            text_fingerprint(text),
+            language,
+            pipeline_project,
+            pipeline_name,
+            layer,
+            feature,
+            consumer_fingerprint,
+        ]
+        return hashlib.sha256(
+            "\x00".join("" if p is None else str(p) for p in _parts).encode("utf-8")
+        ).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _remember(self, key: str, value: response_consumer_return_value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key: str, record: bool = True) -> Optional[response_consumer_return_value]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                if record:
+                    self.hits_memory += 1
+                    metrics.inc("ariadne_prediction_cache_total", {"result": "memory"})
+                return value
+
+        if self.directory is not None:
+            try:
+                with self._path(key).open("r", encoding="utf-8") as f:
+                    data = json.load(f)
+                value = response_consumer_return_value(
+                    offsets=[tuple(o) for o in data["offsets"]],
+                    labels=data["labels"],
+                    count=data["count"],
+                    score=data["score"],
+                    features=data["features"],
+                )
+            except FileNotFoundError:
+                value = None
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logging.warning(f"Prediction cache entry '{key}' not readable, ignored: {e}")
+                value = None
+            if value is not None:
+                self._remember(key, value)
+                if record:
+                    with self._lock:
+                        self.hits_disk += 1
+                    metrics.inc("ariadne_prediction_cache_total", {"result": "disk"})
+                return value
+
+        if record:
+            with self._lock:
+                self.misses += 1
+            metrics.inc("ariadne_prediction_cache_total", {"result": "miss"})
+        return None
+
+    def get_or_compute(
+        self, key: str, compute: Callable[[], response_consumer_return_value]
+    ) -> Optional[response_consumer_return_value]:
+        """Cached value of the key, otherwise the result of ``compute``, which runs only once for concurrent
+        requests of the same key."""
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            # a former leader may have finished after the miss above, its value is in the memory tier
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.coalesced += 1
+                metrics.inc("ariadne_prediction_cache_total", {"result": "coalesced"})
+                return value
+
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = Future()
+                self._in_flight[key] = flight
+            else:
+                self.coalesced += 1
+                metrics.inc("ariadne_prediction_cache_total", {"result": "coalesced"})
+
+        if not leader:
+            logging.debug(f"Waiting for the prediction in flight '{key[:12]}...'")
+            return flight.result()
+
+        try:
+            value = self._compute_exclusive(key, compute)
+            flight.set_result(value)
+            return value
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def _compute_exclusive(self, key: str, compute: Callable[[], response_consumer_return_value]):
+        if self.directory is None:
+            value = compute()
+            self.put(key, value)
+            return value
+
+        # the workers share the disk tier: the first one computes, the others find its result after the lock
+        self.lock_directory.mkdir(parents=True, exist_ok=True)
+        lock = FileLock(self.lock_directory / f"{key[:3]}.lock", timeout=self.lock_timeout, thread_local=False)
+        try:
+            with lock:
+                value = self.get(key, record=False)
+                if value is not None:
+                    with self._lock:
+                        self.coalesced += 1
+                    metrics.inc("ariadne_prediction_cache_total", {"result": "coalesced"})
+                    return value
+                value = compute()
+                self.put(key, value)
+                return value
+        except Timeout:
+            logging.warning(f"Prediction '{key[:12]}...' still locked by another worker, computing it anyway.")
+            value = compute()
+            self.put(key, value)
+            return value
+
+    def put(self, key: str, value: response_consumer_return_value):
+        if not isinstance(value, response_consumer_return_value):
+            return
+        self._remember(key, value)
+
+        if self.directory is not None:
+            path = self._path(key)
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(value._asdict(), f)
+                os.replace(tmp_path, path)
+            except (OSError, TypeError, ValueError) as e:
+                logging.warning(f"Prediction cache entry '{key}' not written: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def statistics(self) -> dict:
+        with self._lock:
+            _hits = self.hits_memory + self.hits_disk
+            _requests = _hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "disk": str(self.directory) if self.directory is not None else None,
+                "hits_memory": self.hits_memory,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_rate": _hits / _requests if _requests else 0.0,
+            }
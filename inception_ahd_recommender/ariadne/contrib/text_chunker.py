@@ -0,0 +1,110 @@
+import re
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from ariadne.contrib.external_server_consumer import response_consumer_return_value
+
+# split points in order of preference: end of a paragraph, end of a sentence, any whitespace
+_PARAGRAPH_END = re.compile(r"\n[ \t]*\n\s*")
+_SENTENCE_END = re.compile(r"(?<=[.!?;:])\s+")
+_WHITESPACE = re.compile(r"\s+")
+_SPLIT_PATTERNS = (_PARAGRAPH_END, _SENTENCE_END, _WHITESPACE)
+
+
+class TextChunk(NamedTuple):
+    """Part ``text[begin:end]`` of a document, analysed together with ``text[end:context_end]``.
+
+    The chunks partition the document (``begin``/``end``); the trailing context lets the analysis see
+    an annotation that starts in the chunk but ends behind the seam."""
+
+    begin: int
+    end: int
+    context_end: int
+
+    def text(self, document: str) -> str:
+        return document[self.begin:self.context_end]
+
+
+def _last_match_end(pattern: re.Pattern, text: str, begin: int, end: int) -> Optional[int]:
+    _last = None
+    for match in pattern.finditer(text, begin, end):
+        if begin < match.end() < end:
+            _last = match.end()
+    return _last
+
+
+def _split_point(text: str, begin: int, limit: int) -> int:
+    """Position in ``(begin, limit]`` to split the text at; prefers paragraph over sentence boundaries,
+    as long as the chunk keeps at least half of its size."""
+    if limit >= len(text):
+        return len(text)
+    _fallback = None
+    for pattern in _SPLIT_PATTERNS:
+        _point = _last_match_end(pattern, text, begin, limit + 1)
+        if _point is None:
+            continue
+        if _point - begin >= (limit - begin) // 2:
+            return _point
+        _fallback = _fallback or _point
+    return _fallback or limit
+
+
+def chunk_text(text: str, max_chars: int, context_chars: int = 0) -> List[TextChunk]:
+    """Split the text at paragraph/sentence boundaries into chunks of at most ``max_chars`` characters
+    (plus up to ``context_chars`` of trailing context). Texts up to ``max_chars`` are a single chunk."""
+    if max_chars <= 0 or len(text) <= max_chars:
+        return [TextChunk(0, len(text), len(text))]
+
+    chunks = []
+    begin = 0
+    while begin < len(text):
+        end = _split_point(text, begin, begin + max_chars)
+        context_end = end if context_chars <= 0 else _split_point(text, end, end + context_chars)
+        chunks.append(TextChunk(begin, end, context_end))
+        begin = end
+    return chunks
+
+
+def merge_chunk_results(
+    chunks: Sequence[TextChunk], results: Sequence[Optional[response_consumer_return_value]]
+) -> response_consumer_return_value:
+    """Merge the results of the chunks into one result in document coordinates.
+
+    An annotation belongs to the chunk it begins in, so annotations found again in the trailing context
+    of the previous chunk are dropped. So is the rest of an annotation cut at the seam, if the previous
+    chunk found the whole annotation with the same label. Failed chunks (``None``) contribute nothing."""
+    offsets, labels, scores, features = [], [], [], []
+    # annotations of the previous chunks that reach over the seam: (end, label)
+    _crossing: List[Tuple[int, str]] = []
+
+    for chunk, result in zip(chunks, results):
+        if not isinstance(result, response_consumer_return_value) or not isinstance(result.count, int):
+            _crossing = []
+            continue
+        _next_crossing = []
+        for i in range(result.count):
+            _begin, _end = result.offsets[i]
+            _begin, _end = _begin + chunk.begin, _end + chunk.begin
+            if _begin >= chunk.end:
+                continue
+            if any(_begin < c_end and label == result.labels[i] for c_end, label in _crossing):
+                continue
+            offsets.append((_begin, _end))
+            labels.append(result.labels[i])
+            scores.append(result.score[i])
+            features.append(result.features[i])
+            if _end > chunk.end:
+                _next_crossing.append((_end, result.labels[i]))
+        _crossing = _next_crossing
+
+    return response_consumer_return_value(
+        offsets=offsets, labels=labels, count=len(offsets), score=scores, features=features
+    )
+
+
+class IncompletePrediction(Exception):
+    """Some chunks of a document failed; ``prediction`` holds the merged result of the others. Raised
+    instead of returned, so that the incomplete result is not stored in the prediction cache."""
+
+    def __init__(self, prediction: response_consumer_return_value, failed: int, total: int):
+        super().__init__(f"{failed} of {total} chunks failed")
+        self.prediction = prediction
@@ -0,0 +1,192 @@
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7, 5e7)
+
+# name: (type, help, buckets)
+METRICS = {
+    "ariadne_requests_total": ("counter", "Requests per classifier and endpoint.", None),
+    "ariadne_request_errors_total": ("counter", "Failed requests per classifier and endpoint.", None),
+    "ariadne_prediction_cache_total": (
+        "counter",
+        "Lookups of the prediction cache by result (memory, disk, miss, coalesced).",
+        None,
+    ),
+    "ariadne_request_duration_seconds": ("histogram", "Latency of the requests.", LATENCY_BUCKETS),
+    "ariadne_stage_duration_seconds": (
+        "histogram",
+        "Latency of the stages of a prediction (parse, round_trip, mapping, add_predictions, serialize).",
+        LATENCY_BUCKETS,
+    ),
+    "ariadne_payload_bytes": ("histogram", "Size of the request and response bodies.", SIZE_BUCKETS),
+}
+
+_Labels = Tuple[Tuple[str, str], ...]
+
+
+def default_metrics_directory() -> Path:
+    return Path(os.getenv("METRICS_DIR") or Path(tempfile.gettempdir()) / ".ariadne_metrics")
+
+
+def _labels(labels: Optional[Dict[str, str]]) -> _Labels:
+    return tuple(sorted((k, str(v)) for k, v in (labels or {}).items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: _Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    _all = labels + extra
+    if not _all:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in _all) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metrics:
+    """Counters and histograms of the recommender, rendered in the Prometheus text format.
+
+    Every gunicorn worker keeps its own values and writes them (atomically) to one file per worker in
+    ``directory`` after each request; ``render`` sums the files of all workers, so that ``/metrics`` shows
+    the same totals no matter which worker answers. Files of stopped workers are kept, so the counters do
+    not decrease. Without a directory only the values of the own process are rendered.
+    """
+
+    def __init__(self, directory: Union[str, Path, None] = None):
+        self.directory = Path(directory) if directory else None
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, _Labels], float] = {}
+        # name, labels: [counts per bucket (the last one is +Inf), sum]
+        self._histograms: Dict[Tuple[str, _Labels], list] = {}
+        self._worker = f"worker_{os.getpid()}_{time.time_ns()}"
+        self._pid = os.getpid()
+
+    def inc(self, name: str, labels: Optional[Dict[str, str]] = None, value: float = 1):
+        _key = (name, _labels(labels))
+        with self._lock:
+            self._counters[_key] = self._counters.get(_key, 0) + value
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, str]] = None):
+        _buckets = METRICS[name][2]
+        _key = (name, _labels(labels))
+        with self._lock:
+            _histogram = self._histograms.get(_key)
+            if _histogram is None:
+                _histogram = [[0] * (len(_buckets) + 1), 0.0]
+                self._histograms[_key] = _histogram
+            _histogram[0][bisect_left(_buckets, value)] += 1
+            _histogram[1] += value
+
+    @contextmanager
+    def time(self, stage: str, labels: Optional[Dict[str, str]] = None):
+        """Observes the duration of the block as ``ariadne_stage_duration_seconds{stage=...}``."""
+        _start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(
+                "ariadne_stage_duration_seconds", time.perf_counter() - _start, {"stage": stage, **(labels or {})}
+            )
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def _snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "counters": [[n, list(map(list, l)), v] for (n, l), v in self._counters.items()],
+                "histograms": [[n, list(map(list, l)), h[0][:], h[1]] for (n, l), h in self._histograms.items()],
+            }
+
+    def _worker_path(self) -> Path:
+        if self._pid != os.getpid():
+            # forked after the creation: a new worker with its own file
+            self._pid = os.getpid()
+            self._worker = f"worker_{os.getpid()}_{time.time_ns()}"
+            self.reset()
+        return self.directory / f"{self._worker}.json"
+
+    def flush(self):
+        if self.directory is None:
+            return
+        path = self._worker_path()
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self._snapshot(), f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logging.warning(f"Metrics of '{self._worker}' not written: {e}")
+
+    def _collect(self) -> Tuple[Dict[Tuple[str, _Labels], float], Dict[Tuple[str, _Labels], list]]:
+        snapshots = [self._snapshot()]
+        if self.directory is not None and self.directory.exists():
+            _own = self._worker_path().name
+            for path in self.directory.glob("worker_*.json"):
+                if path.name == _own:
+                    continue
+                try:
+                    with path.open("r", encoding="utf-8") as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError) as e:
+                    logging.warning(f"Metrics file '{path.name}' not readable, ignored: {e}")
+
+        counters, histograms = {}, {}
+        for snapshot in snapshots:
+            for name, labels, value in snapshot["counters"]:
+                _key = (name, tuple(map(tuple, labels)))
+                counters[_key] = counters.get(_key, 0) + value
+            for name, labels, buckets, total in snapshot["histograms"]:
+                _key = (name, tuple(map(tuple, labels)))
+                if name not in METRICS or len(buckets) != len(METRICS[name][2]) + 1:
+                    continue
+                _histogram = histograms.setdefault(_key, [[0] * len(buckets), 0.0])
+                _histogram[0] = [a + b for a, b in zip(_histogram[0], buckets)]
+                _histogram[1] += total
+        return counters, histograms
+
+    def render(self) -> str:
+        counters, histograms = self._collect()
+        lines = []
+        for name, (kind, description, bucket_bounds) in METRICS.items():
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "counter":
+                for (n, labels), value in sorted(counters.items()):
+                    if n == name:
+                        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            for (n, labels), (buckets, total) in sorted(histograms.items()):
+                if n != name:
+                    continue
+                _cumulative = 0
+                for bound, count in zip(tuple(bucket_bounds) + (math.inf,), buckets):
+                    _cumulative += count
+                    lines.append(
+                        f"{name}_bucket{_format_labels(labels, (('le', _format_value(bound)),))} {_cumulative}"
+                    )
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {_cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
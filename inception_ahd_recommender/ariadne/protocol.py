@@ -13,7 +13,10 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-from typing import Dict, Any, List
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Iterator, List, Optional
 
 import attr
 import cassis
@@ -24,6 +27,61 @@ from cassis import load_cas_from_xmi, load_typesystem
 
 JsonDict = Dict[str, Any]
 
+# Typesystem cache
+
+
+class TypeSystemCache:
+    """Bounded LRU of parsed typesystems, keyed by the hash of the typesystem XML.
+
+    INCEpTION sends the same typesystem with every request of a project, parsing it again costs more than
+    parsing the document. The parsed typesystem is shared by the requests, which only read it.
+    """
+
+    def __init__(self, max_entries: int = 16):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, cassis.TypeSystem]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, typesystem_xml: str) -> cassis.TypeSystem:
+        if self.max_entries <= 0:
+            return load_typesystem(typesystem_xml)
+
+        key = hashlib.sha256(typesystem_xml.encode("utf-8")).hexdigest()
+        with self._lock:
+            typesystem = self._entries.get(key)
+            if typesystem is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return typesystem
+            self.misses += 1
+
+        # parsed outside of the lock, a concurrent miss of the same key just parses it twice
+        typesystem = load_typesystem(typesystem_xml)
+        with self._lock:
+            self._entries[key] = typesystem
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return typesystem
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def statistics(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+typesystem_cache = TypeSystemCache()
+
 # Data classes
 
 
@@ -35,6 +93,8 @@ class PredictionRequest:
     project_id: str = attr.ib()
     document_id: str = attr.ib()
     user_id: str = attr.ib()
+    # set instead of the cas if the document of a batch could not be parsed
+    error: Optional[Exception] = attr.ib(default=None)
 
 
 @attr.s
@@ -52,7 +112,7 @@ class TrainingRequest:
     @property
     def documents(self) -> List["TrainingDocument"]:
         # We parse this lazily as sometimes when already training, we just do not need to parse it at all.
-        typesystem = load_typesystem(self._typesystem_xml)
+        typesystem = typesystem_cache.load(self._typesystem_xml)
         training_documents = []
         for document in self._documents_json:
             cas = load_cas_from_xmi(document["xmi"], typesystem)
@@ -63,6 +123,42 @@ class TrainingRequest:
         return training_documents
 
 
+@attr.s
+class BatchPredictionRequest:
+    layer: str = attr.ib()
+    feature: str = attr.ib()
+    project_id: str = attr.ib()
+    _typesystem_xml: str = attr.ib()
+    _documents_json: List[Dict[str, str]] = attr.ib()
+
+    def __len__(self) -> int:
+        return len(self._documents_json)
+
+    @property
+    def typesystem(self) -> cassis.TypeSystem:
+        return typesystem_cache.load(self._typesystem_xml)
+
+    @property
+    def requests(self) -> Iterator[PredictionRequest]:
+        # Parsed one after another, so that the first documents are predicted while the others are parsed.
+        # A document that cannot be parsed is yielded with its error, the others are still predicted.
+        typesystem = self.typesystem
+        for document in self._documents_json:
+            document = document if isinstance(document, dict) else {}
+            document_id = document.get("documentId")
+            user_id = document.get("userId")
+            try:
+                if document_id is None or user_id is None:
+                    raise KeyError("documentId" if document_id is None else "userId")
+                cas = load_cas_from_xmi(document["xmi"], typesystem)
+            except Exception as e:
+                yield PredictionRequest(
+                    None, self.layer, self.feature, self.project_id, document_id, user_id, error=e
+                )
+                continue
+            yield PredictionRequest(cas, self.layer, self.feature, self.project_id, document_id, user_id)
+
+
 @attr.s
 class TrainingDocument:
     cas: cassis.Cas = attr.ib()
@@ -78,7 +174,7 @@ def parse_prediction_request(json_object: JsonDict) -> PredictionRequest:
     feature = metadata["feature"]
     project_id = metadata["projectId"]
 
-    typesystem = load_typesystem(json_object["typeSystem"])
+    typesystem = typesystem_cache.load(json_object["typeSystem"])
     cas = load_cas_from_xmi(document["xmi"], typesystem)
     document_id = document["documentId"]
     user_id = document["userId"]
@@ -96,3 +192,15 @@ def parse_training_request(json_object: JsonDict) -> TrainingRequest:
     documents_json = json_object["documents"]
 
     return TrainingRequest(layer, feature, project_id, typesystem_xml, documents_json)
+
+
+def parse_batch_prediction_request(json_object: JsonDict) -> BatchPredictionRequest:
+    metadata = json_object["metadata"]
+
+    layer = metadata["layer"]
+    feature = metadata["feature"]
+    project_id = metadata["projectId"]
+    typesystem_xml = json_object["typeSystem"]
+    documents_json = json_object["documents"]
+
+    return BatchPredictionRequest(layer, feature, project_id, typesystem_xml, documents_json)
@@ -13,34 +13,50 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import json
 import logging
 import tempfile
+import time
 from http import HTTPStatus
 import threading
 from pathlib import Path
 from typing import Dict
 
 from filelock import Timeout, FileLock
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 
 from ariadne.classifier import Classifier
-from ariadne.protocol import parse_prediction_request, parse_training_request
+from ariadne.metrics import metrics
+from ariadne.protocol import (
+    parse_batch_prediction_request,
+    parse_prediction_request,
+    parse_training_request,
+    typesystem_cache,
+)
 
 logger = logging.getLogger(__name__)
 
 
 class Server:
-    def __init__(self):
+    def __init__(self, batch_parallelism: int = 4):
         self._app = Flask(__name__)
         self._classifiers: Dict[str, Classifier] = {}
         self._lock_directory: Path = Path(tempfile.gettempdir()) / ".ariadne_locks"
+        self._batch_parallelism = batch_parallelism
 
         self._app.add_url_rule(
             "/<classifier_name>/predict", "predict", self._predict, methods=["POST"]
         )
+        self._app.add_url_rule(
+            "/<classifier_name>/predict_batch", "predict_batch", self._predict_batch, methods=["POST"]
+        )
         self._app.add_url_rule(
             "/<classifier_name>/train", "train", self._train, methods=["POST"]
         )
+        self._app.add_url_rule(
+            "/<classifier_name>/cache", "cache", self._cache, methods=["GET"]
+        )
+        self._app.add_url_rule("/metrics", "metrics", self._metrics, methods=["GET"])
 
     def add_classifier(self, name: str, classifier: Classifier):
         self._classifiers[name] = classifier
@@ -57,21 +73,106 @@ class Server:
                 HTTPStatus.NOT_FOUND.value,
             )
 
-        json_data = request.get_json()
+        labels = {"classifier": classifier_name, "endpoint": "predict"}
+        metrics.inc("ariadne_requests_total", labels)
+        metrics.observe("ariadne_payload_bytes", request.content_length or 0, {**labels, "direction": "request"})
+        start = time.perf_counter()
+        try:
+            with metrics.time("parse"):
+                json_data = request.get_json()
+                req = parse_prediction_request(json_data)
+            classifier = self._classifiers[classifier_name]
+            classifier.predict(
+                req.cas,
+                req.layer,
+                req.feature,
+                req.project_id,
+                req.document_id,
+                req.user_id,
+            )
 
-        req = parse_prediction_request(json_data)
+            with metrics.time("serialize"):
+                document = req.cas.to_xmi()
+            result = jsonify(document=document)
+            metrics.observe("ariadne_payload_bytes", result.content_length or 0, {**labels, "direction": "response"})
+            return result
+        except Exception:
+            metrics.inc("ariadne_request_errors_total", labels)
+            raise
+        finally:
+            metrics.observe("ariadne_request_duration_seconds", time.perf_counter() - start, labels)
+            metrics.flush()
+
+    def _predict_batch(self, classifier_name: str):
+        logger.info("Got batch prediction request for [%s]", classifier_name)
+
+        if classifier_name not in self._classifiers:
+            return (
+                "Classifier with name [{0}] not found!".format(classifier_name),
+                HTTPStatus.NOT_FOUND.value,
+            )
+
+        labels = {"classifier": classifier_name, "endpoint": "predict_batch"}
+        metrics.inc("ariadne_requests_total", labels)
+        metrics.observe("ariadne_payload_bytes", request.content_length or 0, {**labels, "direction": "request"})
+        start = time.perf_counter()
+        try:
+            json_data = request.get_json()
+            req = parse_batch_prediction_request(json_data)
+            # parsed before the response starts: without typesystem no document can be predicted
+            req.typesystem
+        except Exception as e:
+            metrics.inc("ariadne_request_errors_total", labels)
+            metrics.flush()
+            logger.error("Batch prediction request not readable: %s", e)
+            return "Batch prediction request not readable: {0}".format(e), HTTPStatus.BAD_REQUEST.value
         classifier = self._classifiers[classifier_name]
-        classifier.predict(
-            req.cas,
-            req.layer,
-            req.feature,
-            req.project_id,
-            req.document_id,
-            req.user_id,
+        # the parallelism of a request is limited by the one of the server
+        parallelism = min(
+            request.args.get("parallelism", self._batch_parallelism, type=int),
+            self._batch_parallelism,
         )
-
-        result = jsonify(document=req.cas.to_xmi())
-        return result
+        logger.info("Predicting [%d] documents, [%d] at a time", len(req), parallelism)
+
+        def _parsed():
+            # the documents are parsed lazily while the first ones are predicted
+            documents = iter(req.requests)
+            while True:
+                with metrics.time("parse"):
+                    prediction_request = next(documents, None)
+                if prediction_request is None:
+                    return
+                yield prediction_request
+
+        def _generate():
+            response_bytes = 0
+            try:
+                for prediction, error in classifier.predict_batch(_parsed(), parallelism):
+                    if error is None:
+                        with metrics.time("serialize"):
+                            document = prediction.cas.to_xmi()
+                        line = {
+                            "documentId": prediction.document_id,
+                            "userId": prediction.user_id,
+                            "document": document,
+                        }
+                    else:
+                        # counted per failed document
+                        metrics.inc("ariadne_request_errors_total", labels)
+                        line = {
+                            "documentId": prediction.document_id,
+                            "userId": prediction.user_id,
+                            "error": str(error),
+                        }
+                    payload = json.dumps(line) + "\n"
+                    response_bytes += len(payload.encode("utf-8"))
+                    yield payload
+            finally:
+                metrics.observe("ariadne_payload_bytes", response_bytes, {**labels, "direction": "response"})
+                metrics.observe("ariadne_request_duration_seconds", time.perf_counter() - start, labels)
+                metrics.flush()
+
+        return Response(stream_with_context(_generate()), mimetype="application/x-ndjson")
 
     def _train(self, classifier_name: str):
         logger.info("Got training request for [%s]", classifier_name)
@@ -82,6 +183,11 @@ class Server:
                 HTTPStatus.NOT_FOUND.value,
             )
 
+        labels = {"classifier": classifier_name, "endpoint": "train"}
+        metrics.inc("ariadne_requests_total", labels)
+        metrics.observe("ariadne_payload_bytes", request.content_length or 0, {**labels, "direction": "request"})
+        metrics.flush()
+
         json_data = request.get_json()
         req = parse_training_request(json_data)
         user_id = req.user_id
@@ -117,6 +223,24 @@ class Server:
                 HTTPStatus.TOO_MANY_REQUESTS.value,
             )
 
+    def _cache(self, classifier_name: str):
+        if classifier_name not in self._classifiers:
+            return (
+                "Classifier with name [{0}] not found!".format(classifier_name),
+                HTTPStatus.NOT_FOUND.value,
+            )
+
+        classifier = self._classifiers[classifier_name]
+        get_prediction_cache = getattr(classifier, "get_prediction_cache", None)
+        prediction_cache = get_prediction_cache() if get_prediction_cache is not None else None
+        if prediction_cache is None:
+            return jsonify(enabled=False, typesystems=typesystem_cache.statistics())
+        return jsonify(enabled=True, typesystems=typesystem_cache.statistics(), **prediction_cache.statistics())
+
+    def _metrics(self):
+        # the values of all gunicorn workers, in the Prometheus text format
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
     def _get_lock(self, classifier_name: str, user_id: str) -> FileLock:
         self._lock_directory.mkdir(parents=True, exist_ok=True)
         lock_path = self._lock_directory / f"{classifier_name}_{user_id}.lock"
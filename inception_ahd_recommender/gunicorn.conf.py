@@ -1,6 +1,19 @@
 import os
+import tempfile
+from pathlib import Path
 
 workers = os.environ.get("RECOMMENDER_WORKERS", "2")
+# more than one thread per worker selects the threaded worker class (gthread)
+threads = os.environ.get("RECOMMENDER_THREADS", "1")
 bind = os.environ.get("RECOMMENDER_ADDRESS", ":5000")
 log_level = 'info'
-wsgi_app = "main:app"
\ No newline at end of file
+wsgi_app = "main:app"
+
+
+def on_starting(server):
+    # the metrics files of the workers of a previous run (see ariadne.metrics.default_metrics_directory),
+    # only these are removed, METRICS_DIR may be a directory with other files
+    directory = Path(os.environ.get("METRICS_DIR") or os.path.join(tempfile.gettempdir(), ".ariadne_metrics"))
+    for pattern in ("worker_*.json", "*.tmp"):
+        for path in directory.glob(pattern):
+            path.unlink(missing_ok=True)
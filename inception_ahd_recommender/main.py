@@ -7,6 +7,9 @@ from typing import Union
 
 from ariadne.contrib.external_server_consumer import ProcessorType
 from ariadne.contrib.external_uima_classifier import AHDClassifier
+from ariadne.contrib.prediction_cache import PredictionCache
+from ariadne.metrics import default_metrics_directory, metrics
+from ariadne.protocol import typesystem_cache
 from ariadne.server import Server
 
 
@@ -32,6 +35,27 @@ _config = {
     "docker_mode": eval_bool(os.getenv("DOCKER_MODE", True)),
 }
 
+_prediction_cache_size = int(os.getenv("PREDICTION_CACHE_SIZE", 1024))
+_prediction_cache = (
+    PredictionCache(
+        max_entries=_prediction_cache_size,
+        directory=os.getenv("PREDICTION_CACHE_DIR") or None,
+    )
+    if _prediction_cache_size > 0
+    else None
+)
+
+typesystem_cache.max_entries = int(os.getenv("TYPESYSTEM_CACHE_SIZE", 16))
+# shared by the gunicorn workers, so that /metrics shows the sums of all workers
+metrics.directory = default_metrics_directory()
+
+_prefetch_parallelism = int(os.getenv("PREFETCH_PARALLELISM", 4))
+_chunking = {
+    "chunk_size": int(os.getenv("CHUNK_SIZE", 0)),
+    "chunk_context": int(os.getenv("CHUNK_CONTEXT", 200)),
+    "chunk_parallelism": int(os.getenv("CHUNK_PARALLELISM", 4)),
+}
+
 _server_handle = os.getenv("SERVER_HANDLE", "deid_recommender")
 _model_folder = os.getenv("MODEL_DIR", None)
 try:
@@ -56,7 +80,7 @@ except Exception as e:
     logging.error(e)
     sys.exit(-1)
 
-server = Server()
+server = Server(batch_parallelism=int(os.getenv("BATCH_PARALLELISM", 4)))
 
 if __name__ == "__main__":
     _config = {
@@ -77,12 +101,26 @@ if __name__ == "__main__":
     )
     server.add_classifier(
         # _server_handle, _classifier(config=_config, model_directory=_model_folder)
-        "ahd_recommender", _classifier(config=_config, model_directory=_model_folder)
+        "ahd_recommender",
+        _classifier(
+            config=_config,
+            model_directory=_model_folder,
+            prediction_cache=_prediction_cache,
+            prefetch_parallelism=_prefetch_parallelism,
+            **_chunking,
+        ),
     )
     server.start(port=5002)
 elif __name__ != "__main__":
     server.add_classifier(
-        _server_handle, _classifier(config=_config, model_directory=_model_folder)
+        _server_handle,
+        _classifier(
+            config=_config,
+            model_directory=_model_folder,
+            prediction_cache=_prediction_cache,
+            prefetch_parallelism=_prefetch_parallelism,
+            **_chunking,
+        ),
     )
     app = server._app
 
@@ -0,0 +1,49 @@
+"""Latency of parsing a prediction request with and without the typesystem cache.
+
+    cd tests && PYTHONPATH=.. python benchmark_typesystem_cache.py [repetitions]
+"""
+import sys
+import time
+from pathlib import Path
+
+from ariadne.protocol import parse_prediction_request, typesystem_cache
+
+_RESOURCES = Path(__file__).parent / "resources"
+
+
+def _request() -> dict:
+    return {
+        "metadata": {"layer": "webanno.custom.Span", "feature": "value", "projectId": "1"},
+        "typeSystem": (_RESOURCES / "INCEpTION_TypeSystem.xml").read_text(encoding="utf-8"),
+        "document": {
+            "xmi": (_RESOURCES / "Wikipedia-Obama.xmi").read_text(encoding="utf-8"),
+            "documentId": "1",
+            "userId": "u",
+        },
+    }
+
+
+def _latencies(request: dict, repetitions: int) -> list:
+    latencies = []
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        parse_prediction_request(request)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return sorted(latencies)
+
+
+def main(repetitions: int = 50):
+    request = _request()
+    for name, max_entries in [("without cache", 0), ("with cache", 16)]:
+        typesystem_cache.clear()
+        typesystem_cache.max_entries = max_entries
+        parse_prediction_request(request)
+        latencies = _latencies(request, repetitions)
+        print(
+            f"{name:>14}: median {latencies[len(latencies) // 2]:7.2f} ms,"
+            f" p95 {latencies[int(len(latencies) * 0.95) - 1]:7.2f} ms ({repetitions} requests)"
+        )
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
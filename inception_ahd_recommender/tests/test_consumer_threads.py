@@ -0,0 +1,39 @@
+import copy
+import json
+import pathlib
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from ariadne.contrib.external_server_consumer import MappingConsumer, ProcessorType, SimpleDeidConsumer
+
+_response = json.load(pathlib.Path("resources/albers_response.json").open("rb"))
+
+
+def _responses(n: int):
+    # responses of different length, so that mixed up results are detected
+    for i in range(n):
+        response = copy.deepcopy(_response)
+        response["payload"] = response["payload"][: (i * 7) % len(response["payload"]) + 1]
+        yield response
+
+
+def test_consumers_are_thread_safe():
+    responses = list(_responses(40))
+    for consumer in [
+        MappingConsumer(config="../prefab-mapping-files/deid_mapping_singlelayer.json", processor=ProcessorType.JSON),
+        SimpleDeidConsumer(processor=ProcessorType.JSON),
+    ]:
+        expected = [consumer.process(response, "PHI") for response in responses]
+        assert len({result.count for result in expected}) > 1
+
+        # a gthread worker with many threads shares one consumer between its requests,
+        # frequent thread switches make interleaved requests likely
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            with ThreadPoolExecutor(max_workers=32) as executor:
+                for _ in range(5):
+                    results = list(executor.map(lambda response: consumer.process(response, "PHI"), responses))
+                    assert results == expected
+        finally:
+            sys.setswitchinterval(switch_interval)
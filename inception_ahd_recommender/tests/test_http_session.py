@@ -0,0 +1,89 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ariadne.contrib.external_uima_classifier import (
+    ExternalUIMAClassifier,
+    connection_statistics,
+    create_http_session,
+)
+
+
+class _AnalysisHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    unavailable = 0
+
+    def _answer(self, text: str):
+        if _AnalysisHandler.unavailable > 0:
+            _AnalysisHandler.unavailable -= 1
+            status, body = 503, b""
+        else:
+            status, body = 200, json.dumps({"payload": [{"begin": 0, "end": len(text)}]}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._answer("")
+
+    def do_POST(self):
+        self._answer(self.rfile.read(int(self.headers["Content-Length"])).decode("utf-8"))
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _start_server() -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _AnalysisHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_http_session_reuses_connections_and_retries_idempotent_requests():
+    server = _start_server()
+    try:
+        session = create_http_session(pool_size=2, retries=2, backoff_factor=0)
+        url = f"http://127.0.0.1:{server.server_address[1]}/analyseText"
+
+        # the 503 of a GET is retried on the same connection
+        _AnalysisHandler.unavailable = 1
+        assert session.get(url, timeout=5).status_code == 200
+        # the analysis (POST) is not repeated
+        _AnalysisHandler.unavailable = 1
+        assert session.post(url, data="Anna".encode("utf-8"), timeout=5).status_code == 503
+        responses = [session.post(url, data="Anna".encode("utf-8"), timeout=5) for _ in range(3)]
+
+        assert [r.status_code for r in responses] == [200] * 3
+        assert responses[0].json()["payload"][0]["end"] == 4
+        assert connection_statistics(session) == (6, 1)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_process_text_returns_none_on_server_errors():
+    server = _start_server()
+    try:
+        classifier = ExternalUIMAClassifier(
+            {
+                "address": f"http://127.0.0.1:{server.server_address[1]}",
+                "security_token": "token",
+                "pipeline_project": "GeMTeX",
+                "pipeline_name": "deid",
+                "response_consumer": "ariadne.contrib.external_server_consumer.MappingConsumer::"
+                "../prefab-mapping-files/deid_mapping_singlelayer.json",
+                "classifier": False,
+                "processor": "json",
+                "docker_mode": False,
+            },
+            retries=0,
+        )
+        _AnalysisHandler.unavailable = 1
+
+        assert classifier.process_text("Anna", "PHI") is None
+    finally:
+        _AnalysisHandler.unavailable = 0
+        server.shutdown()
+        server.server_close()
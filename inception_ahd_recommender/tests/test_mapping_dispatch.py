@@ -0,0 +1,52 @@
+import copy
+import json
+import pathlib
+
+import pytest
+
+from ariadne.contrib.external_server_consumer import MappingConsumer, ProcessorType
+from ariadne.contrib.uima_cas_mapper.mapping_reader import FeatureValueCheck, MappingConfig, MappingTypeEnum
+
+_mapping_files = sorted(pathlib.Path("../prefab-mapping-files").glob("*.json"))
+
+
+def _sequential_label(annotation_mapping, anno):
+    for label, check in annotation_mapping.items():
+        if callable(check) and check(anno):
+            return label
+    return None
+
+
+@pytest.mark.parametrize("mapping_file", _mapping_files, ids=lambda p: p.name)
+def test_dispatch_matches_sequential_checks(mapping_file):
+    mapping = MappingConfig.build(mapping_file)
+
+    for annotation_mapping in mapping.annotation_mapping.values():
+        if annotation_mapping.mapping_type == MappingTypeEnum.MULTILAYER:
+            assert annotation_mapping.dispatch is None
+            continue
+        assert annotation_mapping.dispatch is not None
+
+        values = {None, "", "unknown"}
+        for check in annotation_mapping.values():
+            if isinstance(check, FeatureValueCheck):
+                values.update(check.values)
+                values.update(v.upper() for v in check.values)
+        for value in values:
+            anno = {annotation_mapping.dispatch.feature: value}
+            match = annotation_mapping.dispatch.get(anno)
+            assert (match[0] if match else None) == _sequential_label(annotation_mapping, anno)
+
+
+@pytest.mark.parametrize("mapping_file", _mapping_files, ids=lambda p: p.name)
+def test_consumer_with_dispatch_matches_sequential_checks(mapping_file):
+    response = json.load(pathlib.Path("resources/albers_response.json").open("rb"))
+    consumer = MappingConsumer(config=str(mapping_file), processor=ProcessorType.JSON)
+
+    sequential = copy.copy(consumer)
+    sequential.mapper = copy.deepcopy(consumer.mapper)
+    for annotation_mapping in sequential.mapper.annotation_mapping.values():
+        annotation_mapping.dispatch = None
+
+    for layer in ["PHI", "webanno.custom.PHI", None]:
+        assert consumer.process(response, layer) == sequential.process(response, layer)
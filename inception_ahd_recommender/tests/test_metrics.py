@@ -0,0 +1,63 @@
+from cassis import Cas
+
+from ariadne.metrics import Metrics, metrics
+from ariadne.server import Server
+
+from test_server import FirstTokenClassifier, _typesystem
+
+
+def test_metrics_are_summed_over_the_workers(tmp_path):
+    worker_1, worker_2 = Metrics(tmp_path), Metrics(tmp_path)
+    worker_1.inc("ariadne_requests_total", {"classifier": "c", "endpoint": "predict"})
+    worker_1.observe("ariadne_stage_duration_seconds", 0.003, {"stage": "parse"})
+    worker_1.flush()
+    worker_2.inc("ariadne_requests_total", {"classifier": "c", "endpoint": "predict"}, 2)
+    worker_2.observe("ariadne_stage_duration_seconds", 0.2, {"stage": "parse"})
+    worker_2.flush()
+
+    for rendered in (worker_1.render(), worker_2.render(), Metrics(tmp_path).render()):
+        lines = rendered.splitlines()
+        assert 'ariadne_requests_total{classifier="c",endpoint="predict"} 3' in lines
+        assert 'ariadne_stage_duration_seconds_bucket{stage="parse",le="0.005"} 1' in lines
+        assert 'ariadne_stage_duration_seconds_bucket{stage="parse",le="0.25"} 2' in lines
+        assert 'ariadne_stage_duration_seconds_bucket{stage="parse",le="+Inf"} 2' in lines
+        assert 'ariadne_stage_duration_seconds_sum{stage="parse"} 0.203' in lines
+        assert 'ariadne_stage_duration_seconds_count{stage="parse"} 2' in lines
+        assert "# TYPE ariadne_stage_duration_seconds histogram" in lines
+
+
+def test_metrics_endpoint_times_the_stages(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "directory", tmp_path)
+    metrics.reset()
+    typesystem = _typesystem()
+    server = Server()
+    server.add_classifier("first_token", FirstTokenClassifier())
+    client = server._app.test_client()
+
+    for i, text in enumerate(["Anna lebt in Berlin", "Bernd"]):
+        client.post(
+            "/first_token/predict",
+            json={
+                "metadata": {"layer": "custom.Span", "feature": "value", "projectId": "1"},
+                "typeSystem": typesystem.to_xml(),
+                "document": {
+                    "xmi": Cas(typesystem=typesystem, sofa_string=text).to_xmi(),
+                    "documentId": str(i + 1),
+                    "userId": "u",
+                },
+            },
+        )
+    # no json body: the request fails
+    assert client.post("/first_token/predict", data="x").status_code >= 400
+
+    response = client.get("/metrics")
+    lines = response.get_data(as_text=True).splitlines()
+    assert response.mimetype == "text/plain"
+    assert 'ariadne_requests_total{classifier="first_token",endpoint="predict"} 3' in lines
+    assert 'ariadne_request_errors_total{classifier="first_token",endpoint="predict"} 1' in lines
+    assert 'ariadne_stage_duration_seconds_count{stage="parse"} 3' in lines
+    assert 'ariadne_stage_duration_seconds_count{stage="serialize"} 2' in lines
+    assert 'ariadne_request_duration_seconds_count{classifier="first_token",endpoint="predict"} 3' in lines
+    assert 'ariadne_payload_bytes_count{classifier="first_token",direction="response",endpoint="predict"} 2' in lines
+    assert len(list(tmp_path.glob("worker_*.json"))) == 1
+    metrics.reset()
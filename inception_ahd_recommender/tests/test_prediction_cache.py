@@ -0,0 +1,139 @@
+import threading
+import time
+
+from cassis import Cas
+
+from ariadne.contrib.external_server_consumer import response_consumer_return_value
+from ariadne.contrib.external_uima_classifier import ExternalClassifier
+from ariadne.contrib.prediction_cache import PredictionCache
+from ariadne.protocol import TrainingDocument
+
+_config = {
+    "address": "http://localhost:8080",
+    "security_token": "",
+    "pipeline_project": "GeMTeX",
+    "pipeline_name": "deid",
+    "response_consumer": "ariadne.contrib.external_server_consumer.MappingConsumer::"
+    "../prefab-mapping-files/deid_mapping_singlelayer.json",
+    "classifier": False,
+    "processor": "cas",
+    "docker_mode": False,
+}
+
+
+class CountingClassifier(ExternalClassifier):
+    def __init__(self, prediction_cache=None):
+        self.calls = 0
+        super().__init__(_config, self.__class__.__name__, prediction_cache)
+
+    def _initialize_server(self):
+        self._server = "counting"
+
+    def process_text(self, text: str, layer: str, language: str = None):
+        self.calls += 1
+        return response_consumer_return_value([(0, len(text))], ["NAME"], 1, [0.0], [{"kind": "NAME"}])
+
+
+def test_prediction_cache_skips_server():
+    classifier = CountingClassifier(PredictionCache(max_entries=8))
+
+    first = classifier.process_text_cached("Max Mustermann", "PHI", "kind", "de")
+    second = classifier.process_text_cached("Max Mustermann", "PHI", "kind", "de")
+    classifier.process_text_cached("Max Mustermann", "PHI", "kind", "en")
+
+    assert first == second
+    assert classifier.calls == 2
+    statistics = classifier.get_prediction_cache().statistics()
+    assert statistics["hits_memory"] == 1
+    assert statistics["misses"] == 2
+
+
+def test_prediction_cache_lru_and_disk_tier(tmp_path):
+    value = response_consumer_return_value([(0, 3)], ["AGE"], 1, [0.5], [{"kind": "AGE"}])
+    writer = PredictionCache(max_entries=1, directory=tmp_path)
+    writer.put("a" * 64, value)
+    writer.put("b" * 64, value)
+    assert writer.statistics()["entries"] == 1
+
+    # another worker process: empty memory tier, shared disk tier
+    reader = PredictionCache(max_entries=1, directory=tmp_path)
+    assert reader.get("a" * 64) == value
+    assert reader.get("c" * 64) is None
+    assert reader.statistics()["hits_disk"] == 1
+    assert reader.statistics()["hit_rate"] == 0.5
+
+
+def _run_concurrently(*calls):
+    results = [None] * len(calls)
+
+    def _run(i):
+        results[i] = calls[i]()
+
+    threads = [threading.Thread(target=_run, args=(i,)) for i in range(len(calls))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return results
+
+
+def test_single_flight_across_threads_and_workers(tmp_path):
+    value = response_consumer_return_value([(0, 3)], ["AGE"], 1, [0.5], [{"kind": "AGE"}])
+    calls = []
+
+    def _slow_compute():
+        calls.append(1)
+        time.sleep(0.3)
+        return value
+
+    # two "workers" sharing the disk tier and the lock directory
+    worker_1 = PredictionCache(directory=tmp_path / "cache", lock_directory=tmp_path / "locks")
+    worker_2 = PredictionCache(directory=tmp_path / "cache", lock_directory=tmp_path / "locks")
+    key = "d" * 64
+
+    results = _run_concurrently(
+        lambda: worker_1.get_or_compute(key, _slow_compute),
+        lambda: worker_1.get_or_compute(key, _slow_compute),
+        lambda: worker_1.get_or_compute(key, _slow_compute),
+        lambda: (time.sleep(0.1), worker_2.get_or_compute(key, _slow_compute))[1],
+    )
+
+    assert results == [value] * 4
+    assert len(calls) == 1
+    assert worker_1.statistics()["coalesced"] == 2
+    assert worker_2.statistics()["coalesced"] == 1
+
+
+def test_no_new_flight_after_the_leader_finished():
+    value = response_consumer_return_value([(0, 3)], ["AGE"], 1, [0.5], [{"kind": "AGE"}])
+    cache = PredictionCache()
+    key = "e" * 64
+    calls = []
+    _get = cache.get
+
+    def _get_before_the_leader_finished(key, record=True):
+        # the leader of the flight puts its value and removes the flight right after this miss
+        result = _get(key, record)
+        cache.put(key, value)
+        return result
+
+    cache.get = _get_before_the_leader_finished
+
+    assert cache.get_or_compute(key, lambda: calls.append(1) or value) == value
+    assert calls == []
+    assert cache.statistics()["coalesced"] == 1
+
+
+def test_prefetch_warms_prediction_cache():
+    classifier = CountingClassifier(PredictionCache(max_entries=8))
+    documents = [
+        TrainingDocument(Cas(sofa_string=text), str(i), "user") for i, text in enumerate(["Anna", "Berlin", "Anna"])
+    ]
+
+    assert classifier.prefetch(documents, "PHI", "kind") == 2
+    assert classifier.calls == 2
+
+    for doc in documents:
+        classifier.process_text_cached(doc.cas.sofa_string, "PHI", "kind", doc.cas.document_language)
+    assert classifier.calls == 2
+    assert classifier.prefetch(documents, "PHI", "kind") == 0
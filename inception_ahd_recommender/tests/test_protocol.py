@@ -0,0 +1,56 @@
+from pathlib import Path
+
+from cassis import Cas, load_typesystem
+
+from ariadne.protocol import (
+    TypeSystemCache,
+    parse_prediction_request,
+    parse_training_request,
+    typesystem_cache,
+)
+
+_TYPESYSTEM_XML = (Path(__file__).parent / "resources" / "INCEpTION_TypeSystem.xml").read_text(encoding="utf-8")
+
+
+def _request(document_id: str, text: str) -> dict:
+    typesystem = load_typesystem(_TYPESYSTEM_XML)
+    return {
+        "metadata": {"layer": "webanno.custom.Span", "feature": "value", "projectId": "1"},
+        "typeSystem": _TYPESYSTEM_XML,
+        "document": {
+            "xmi": Cas(typesystem=typesystem, sofa_string=text).to_xmi(),
+            "documentId": document_id,
+            "userId": "u",
+        },
+    }
+
+
+def test_prediction_requests_share_the_parsed_typesystem():
+    typesystem_cache.clear()
+    first = parse_prediction_request(_request("1", "Anna lebt in Berlin"))
+    second = parse_prediction_request(_request("2", "Bernd"))
+    training = parse_training_request(
+        {
+            "metadata": {"layer": "webanno.custom.Span", "feature": "value", "projectId": "1"},
+            "typeSystem": _TYPESYSTEM_XML,
+            "documents": [_request("3", "Carla")["document"]],
+        }
+    )
+
+    assert first.cas.typesystem is second.cas.typesystem
+    assert training.documents[0].cas.typesystem is first.cas.typesystem
+    assert second.cas.sofa_string == "Bernd"
+    assert typesystem_cache.statistics()["entries"] == 1
+
+
+def test_typesystem_cache_is_bounded():
+    cache = TypeSystemCache(max_entries=1)
+    # any change of the XML is another typesystem
+    other_xml = _TYPESYSTEM_XML + "\n"
+
+    first = cache.load(_TYPESYSTEM_XML)
+    assert cache.load(_TYPESYSTEM_XML) is first
+    cache.load(other_xml)
+    assert cache.load(_TYPESYSTEM_XML) is not first
+
+    assert cache.statistics() == {"entries": 1, "max_entries": 1, "hits": 1, "misses": 3}
@@ -0,0 +1,97 @@
+import json
+import time
+
+from cassis import Cas, TypeSystem
+
+from ariadne.classifier import Classifier
+from ariadne.contrib.inception_util import create_span_prediction
+from ariadne.server import Server
+
+
+def _typesystem() -> TypeSystem:
+    typesystem = TypeSystem()
+    span = typesystem.create_type("custom.Span")
+    typesystem.create_feature(span, "inception_internal_predicted", "uima.cas.Boolean")
+    typesystem.create_feature(span, "value", "uima.cas.String")
+    typesystem.create_feature(span, "value_score", "uima.cas.Double")
+    typesystem.create_feature(span, "value_score_explanation", "uima.cas.String")
+    typesystem.create_feature(span, "value_auto_accept", "uima.cas.Boolean")
+    return typesystem
+
+
+class FirstTokenClassifier(Classifier):
+    def predict(self, cas, layer, feature, project_id, document_id, user_id):
+        # the first document is the slowest one
+        time.sleep(0.3 if document_id == "0" else 0.0)
+        token = cas.sofa_string.split(" ")[0]
+        cas.add(create_span_prediction(cas, layer, feature, 0, len(token), token.upper()))
+
+
+def test_predict_batch_streams_ndjson():
+    typesystem = _typesystem()
+    texts = ["Anna lebt in Berlin", "Bernd", "Carla wohnt in Leipzig"]
+    server = Server(batch_parallelism=2)
+    server.add_classifier("first_token", FirstTokenClassifier())
+
+    response = server._app.test_client().post(
+        "/first_token/predict_batch",
+        json={
+            "metadata": {"layer": "custom.Span", "feature": "value", "projectId": "1"},
+            "typeSystem": typesystem.to_xml(),
+            "documents": [
+                {"xmi": Cas(typesystem=typesystem, sofa_string=text).to_xmi(), "documentId": str(i), "userId": "u"}
+                for i, text in enumerate(texts)
+            ],
+        },
+    )
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    # finished documents are streamed first
+    assert [line["documentId"] for line in lines] == ["1", "2", "0"]
+    for line in lines:
+        assert "error" not in line
+        assert f'value="{texts[int(line["documentId"])].split(" ")[0].upper()}"' in line["document"]
+
+
+def test_predict_batch_reports_unparsable_documents():
+    typesystem = _typesystem()
+    server = Server(batch_parallelism=2)
+    server.add_classifier("first_token", FirstTokenClassifier())
+    xmi = Cas(typesystem=typesystem, sofa_string="Anna lebt in Berlin").to_xmi()
+
+    response = server._app.test_client().post(
+        "/first_token/predict_batch",
+        json={
+            "metadata": {"layer": "custom.Span", "feature": "value", "projectId": "1"},
+            "typeSystem": typesystem.to_xml(),
+            "documents": [
+                {"xmi": "<broken", "documentId": "0", "userId": "u"},
+                {"xmi": xmi, "documentId": "1", "userId": "u"},
+                {"xmi": xmi, "documentId": "2"},
+                {"xmi": xmi, "documentId": "3", "userId": "u"},
+            ],
+        },
+    )
+
+    lines = {line["documentId"]: line for line in map(json.loads, response.get_data(as_text=True).splitlines())}
+    assert sorted(lines) == ["0", "1", "2", "3"]
+    assert "error" in lines["0"] and "userId" in lines["2"]["error"]
+    assert 'value="ANNA"' in lines["1"]["document"] and 'value="ANNA"' in lines["3"]["document"]
+
+
+def test_predict_batch_rejects_a_broken_typesystem():
+    server = Server()
+    server.add_classifier("first_token", FirstTokenClassifier())
+
+    response = server._app.test_client().post(
+        "/first_token/predict_batch",
+        json={
+            "metadata": {"layer": "custom.Span", "feature": "value", "projectId": "1"},
+            "typeSystem": "<broken",
+            "documents": [{"xmi": "", "documentId": "0", "userId": "u"}],
+        },
+    )
+
+    assert response.status_code == 400
@@ -0,0 +1,92 @@
+import re
+
+from ariadne.contrib.external_server_consumer import response_consumer_return_value
+from ariadne.contrib.external_uima_classifier import ExternalClassifier
+from ariadne.contrib.prediction_cache import PredictionCache
+from ariadne.contrib.text_chunker import chunk_text
+
+_config = {
+    "address": "http://localhost:8080",
+    "security_token": "",
+    "pipeline_project": "GeMTeX",
+    "pipeline_name": "deid",
+    "response_consumer": "ariadne.contrib.external_server_consumer.MappingConsumer::"
+    "../prefab-mapping-files/deid_mapping_singlelayer.json",
+    "classifier": False,
+    "processor": "cas",
+    "docker_mode": False,
+}
+
+# a name is a sequence of capitalised words, e.g. "Anna Maria Schmidt"
+_NAME = re.compile(r"[A-Z][a-z]+(?: [A-Z][a-z]+)*")
+
+
+class NameClassifier(ExternalClassifier):
+    def __init__(self, prediction_cache=None, fail_on=None, **chunking):
+        self.texts = []
+        self.fail_on = fail_on
+        super().__init__(_config, self.__class__.__name__, prediction_cache, **chunking)
+
+    def _initialize_server(self):
+        self._server = "names"
+
+    def process_text(self, text: str, layer: str, language: str = None):
+        self.texts.append(text)
+        if self.fail_on is not None and self.fail_on in text:
+            return None
+        matches = list(_NAME.finditer(text))
+        return response_consumer_return_value(
+            [m.span() for m in matches],
+            ["NAME"] * len(matches),
+            len(matches),
+            [1.0] * len(matches),
+            [{"kind": "NAME"} for _ in matches],
+        )
+
+
+def test_chunks_end_at_sentences():
+    text = "".join(f"Satz {i} endet hier. " for i in range(40))
+    chunks = chunk_text(text, 100)
+
+    assert chunks[0].begin == 0 and chunks[-1].end == len(text)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert previous.end == chunk.begin
+    for chunk in chunks:
+        assert chunk.end - chunk.begin <= 100
+        assert text[:chunk.end].endswith(". ")
+    assert chunk_text(text, len(text)) == [(0, len(text), len(text))]
+
+
+def test_short_documents_are_not_chunked():
+    text = "Anna Schmidt wurde in Leipzig behandelt."
+    classifier = NameClassifier(chunk_size=1000)
+
+    assert classifier.process_text_cached(text, "PHI", "kind") == NameClassifier().process_text(text, "PHI")
+    assert classifier.texts == [text]
+
+
+def test_chunked_result_equals_unchunked_result():
+    # no sentence boundaries: the chunks are split at whitespace, also within the names
+    text = " und ".join(f"Anna Maria Schmidt{'' if i % 2 else ' Meier'} wohnt in der Nummer {i}" for i in range(60))
+    expected = NameClassifier().process_text(text, "PHI")
+
+    classifier = NameClassifier(chunk_size=150, chunk_context=40, chunk_parallelism=3)
+    result = classifier.process_text_cached(text, "PHI", "kind")
+
+    # chunks starting within a name see only its rest
+    assert sum(1 for t in classifier.texts if not t.startswith("Anna")) > 10
+    assert result == expected
+    assert {text[b:e] for b, e in result.offsets} == {"Anna Maria Schmidt", "Anna Maria Schmidt Meier", "Nummer"}
+
+
+def test_failed_chunks_give_an_uncached_partial_result():
+    text = "".join(f"Patient {i} heißt Anna Schmidt. " for i in range(30))
+    cache = PredictionCache(max_entries=8)
+    classifier = NameClassifier(cache, fail_on="Patient 10 ", chunk_size=200)
+
+    result = classifier.process_text_cached(text, "PHI", "kind")
+    expected = NameClassifier().process_text(text, "PHI")
+
+    assert 0 < result.count < expected.count
+    assert set(result.offsets) < set(expected.offsets)
+    assert cache.statistics()["entries"] == 0
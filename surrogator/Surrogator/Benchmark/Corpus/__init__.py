@@ -0,0 +1,214 @@
+import io
+import json
+import os
+import random
+import zipfile
+
+import cassis
+
+from Surrogator.Configuration.const import BENCHMARK_TEMPLATE_PROJECT_PATH
+
+
+TOKEN_TYPE = 'de.tudarmstadt.ukp.dkpro.core.api.segmentation.type.Token'
+SENTENCE_TYPE = 'de.tudarmstadt.ukp.dkpro.core.api.segmentation.type.Sentence'
+
+# PHI annotations per 100 tokens
+DEFAULT_PHI_DENSITY = {
+    'NAME_PATIENT': 1.0,
+    'NAME_DOCTOR': 0.5,
+    'NAME_TITLE': 0.3,
+    'DATE': 1.0,
+    'DATE_BIRTH': 0.2,
+    'AGE': 0.2,
+    'PROFESSION': 0.2,
+    'LOCATION_HOSPITAL': 0.3,
+    'LOCATION_ORGANIZATION': 0.2,
+    'LOCATION_CITY': 0.3,
+    'LOCATION_STREET': 0.2,
+    'LOCATION_ZIP': 0.2,
+    'ID': 0.3,
+    'CONTACT_PHONE': 0.2,
+    'CONTACT_EMAIL': 0.1,
+    'CONTACT_URL': 0.1,
+}
+
+PHI_VALUES = {
+    'NAME_PATIENT': ['Müller', 'Schmidt', 'Anna Schneider', 'Fischer', 'Klaus Weber', 'Meyer', 'Wagner'],
+    'NAME_DOCTOR': ['Becker', 'Hoffmann', 'Sabine Schulz', 'Koch', 'Richter'],
+    'NAME_RELATIVE': ['Klein', 'Wolf', 'Maria Neumann'],
+    'NAME_TITLE': ['Dr.', 'Prof. Dr.', 'Dr. med.'],
+    'NAME_USER': ['mmueller', 'sschulz'],
+    'DATE': ['12.03.2021', '01.04.2020', '24.12.2019', '3.5.2022', '15.11.2021'],
+    'DATE_BIRTH': ['17.08.1954', '02.02.1961', '30.06.1949'],
+    'DATE_DEATH': ['11.01.2022'],
+    'AGE': ['67', '72', '58'],
+    'PROFESSION': ['Busfahrerin', 'Lehrer', 'Landwirt', 'Krankenschwester'],
+    'LOCATION_HOSPITAL': ['Universitätsklinikum Leipzig', 'Klinikum St. Georg', 'Herzzentrum Dresden'],
+    'LOCATION_ORGANIZATION': ['Technische Universität Dresden', 'Sportverein Grünau'],
+    'LOCATION_OTHER': ['Rosensäle', 'Völkerschlachtdenkmal'],
+    'LOCATION_COUNTRY': ['Deutschland', 'Österreich'],
+    'LOCATION_STATE': ['Sachsen', 'Bayern'],
+    'LOCATION_CITY': ['Leipzig', 'Dresden', 'Chemnitz', 'Zwickau'],
+    'LOCATION_STREET': ['Liebigstraße 20', 'Hauptstraße 5', 'Delitzscher Straße 141'],
+    'LOCATION_ZIP': ['04103', '01307', '09111'],
+    'ID': ['123456789', 'AB-4711-2021', 'DE89370400440532013000', 'KH 2021/0815'],
+    'CONTACT_PHONE': ['0341 9710', '+49 351 4580', '0176 12345678'],
+    'CONTACT_FAX': ['0341 9712'],
+    'CONTACT_EMAIL': ['onkologie@med.uni-leipzig.de', 'anna.schneider@example.de'],
+    'CONTACT_URL': ['https://www.uniklinikum-leipzig.de/', 'www.klinikum-st-georg.de'],
+}
+
+FILLER_WORDS = [
+    'Der', 'Patient', 'wurde', 'am', 'in', 'unserer', 'Klinik', 'aufgenommen', 'und', 'bei', 'Beschwerden',
+    'ambulant', 'weiterbehandelt', 'Die', 'Anamnese', 'ergab', 'keine', 'Hinweise', 'auf', 'eine', 'akute',
+    'Erkrankung', 'Befund', 'unauffällig', 'Therapie', 'mit', 'Ibuprofen', 'empfohlen', 'Kontrolle', 'nach',
+    'zwei', 'Wochen', 'Blutdruck', 'stabil', 'Entlassung', 'in', 'gutem', 'Allgemeinzustand', 'mit', 'freundlichen',
+]
+
+
+def load_template_typesystem(template_project=BENCHMARK_TEMPLATE_PROJECT_PATH):
+    """
+    Load the typesystem (with the PHI layer) from the first curated document of an INCEpTION project export.
+
+    Parameters
+    ----------
+    template_project : str
+
+    Returns
+    -------
+    cassis.TypeSystem
+    """
+
+    with zipfile.ZipFile(template_project, 'r') as zip_file:
+        for file_name in zip_file.namelist():
+            if file_name.startswith('curation/') and file_name.endswith('.json'):
+                return cassis.load_cas_from_json(io.BytesIO(zip_file.read(file_name))).typesystem
+
+    raise ValueError('No curated document in template project: ' + str(template_project))
+
+
+def create_synthetic_cas(typesystem, document_length, phi_density, rng):
+    """
+    Create a cas with a synthetic text of document_length tokens, tokens, sentences and PHI annotations.
+
+    Parameters
+    ----------
+    typesystem : cassis.TypeSystem
+    document_length : int, number of tokens (without PHI)
+    phi_density : dict, PHI annotations per 100 tokens for every kind
+    rng : random.Random
+
+    Returns
+    -------
+    cassis.Cas, int (number of PHI annotations)
+    """
+
+    phi_type = typesystem.get_type(next(t.name for t in typesystem.get_types() if 'PHI' in t.name))
+    token_type = typesystem.get_type(TOKEN_TYPE)
+    sentence_type = typesystem.get_type(SENTENCE_TYPE)
+
+    segments = [(rng.choice(FILLER_WORDS), None) for _ in range(document_length)]
+    for kind, density in phi_density.items():
+        for _ in range(round(density * document_length / 100)):
+            segments.insert(rng.randrange(len(segments) + 1), (rng.choice(PHI_VALUES[kind]), kind))
+
+    text = ''
+    tokens = []
+    phis = []
+    sentences = []
+    sentence_begin = 0
+    for i, (value, kind) in enumerate(segments):
+        begin = len(text)
+        for j, token in enumerate(value.split(' ')):
+            if j:
+                text = text + ' '
+            tokens.append((len(text), len(text) + len(token)))
+            text = text + token
+        if kind is not None:
+            phis.append((begin, len(text), kind))
+
+        if (i + 1) % 15 == 0 or i == len(segments) - 1:
+            tokens.append((len(text), len(text) + 1))
+            text = text + '.'
+            sentences.append((sentence_begin, len(text)))
+            text = text + '\n'
+            sentence_begin = len(text)
+        else:
+            text = text + ' '
+
+    cas = cassis.Cas(typesystem=typesystem)
+    cas.sofa_string = text
+    for begin, end in sentences:
+        cas.add(sentence_type(begin=begin, end=end))
+    for order, (begin, end) in enumerate(tokens):
+        cas.add(token_type(begin=begin, end=end, order=order))
+    for begin, end, kind in phis:
+        cas.add(phi_type(begin=begin, end=end, kind=kind))
+
+    return cas, len(phis)
+
+
+def generate_synthetic_project(path_zip, n_documents=20, document_length=300, phi_density=None, seed=0,
+                               template_project=BENCHMARK_TEMPLATE_PROJECT_PATH):
+    """
+    Generate a synthetic INCEpTION project export (zip) with curated documents, readable by read_dir().
+
+    Parameters
+    ----------
+    path_zip : str
+    n_documents : int
+    document_length : int, tokens per document (without PHI)
+    phi_density : dict, PHI annotations per 100 tokens for every kind (default: DEFAULT_PHI_DENSITY)
+    seed : int
+    template_project : str, INCEpTION project export with the PHI layer
+
+    Returns
+    -------
+    dict, statistics of the corpus
+    """
+
+    if phi_density is None:
+        phi_density = DEFAULT_PHI_DENSITY
+
+    unknown_kinds = set(phi_density) - set(PHI_VALUES)
+    if unknown_kinds:
+        raise ValueError('No synthetic values for PHI kinds: ' + ', '.join(sorted(unknown_kinds)))
+
+    rng = random.Random(seed)
+    typesystem = load_template_typesystem(template_project)
+    project_name = os.path.basename(path_zip).split('.')[0]
+
+    os.makedirs(name=os.path.dirname(path_zip) or '.', exist_ok=True)
+
+    source_documents = []
+    n_phi = 0
+    n_characters = 0
+    with zipfile.ZipFile(path_zip, 'w', compression=zipfile.ZIP_DEFLATED) as zip_file:
+        for i in range(n_documents):
+            document_name = 'synthetic_' + str(i).zfill(5) + '.txt'
+            cas, n_phi_document = create_synthetic_cas(typesystem, document_length, phi_density, rng)
+            n_phi = n_phi + n_phi_document
+            n_characters = n_characters + len(cas.sofa_string)
+
+            zip_file.writestr('curation/' + document_name + '/CURATION_USER.json', cas.to_json(pretty_print=0))
+            source_documents.append({'name': document_name, 'format': 'text', 'state': 'CURATION_FINISHED'})
+
+        zip_file.writestr(
+            'exportedproject.json',
+            json.dumps({
+                'name': project_name,
+                'description': 'Synthetic benchmark corpus.',
+                'source_documents': source_documents
+            })
+        )
+
+    return {
+        'project': project_name,
+        'path': path_zip,
+        'documents': n_documents,
+        'document_length': document_length,
+        'phi_density': phi_density,
+        'phi': n_phi,
+        'characters': n_characters,
+        'seed': seed,
+    }
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.request import urlopen
+
+
+EMPTY_RESULT = json.dumps({'version': 0.6, 'generator': 'Overpass stand-in', 'elements': []})
+
+
+def get_query_key(query):
+    """
+    Key of a recorded response: sha256 of the (whitespace normalized) Overpass QL query.
+
+    Parameters
+    ----------
+    query : bytes or str
+
+    Returns
+    -------
+    str
+    """
+
+    if isinstance(query, bytes):
+        query = query.decode('utf-8')
+    return hashlib.sha256(' '.join(query.split()).encode('utf-8')).hexdigest()
+
+
+class OverpassStandIn:
+
+    """
+    Local HTTP stand-in of the Overpass API, used via environment variable OVERPASS_URL (see CasManagementFictive).
+    Queries are answered from recorded responses, unknown queries with an empty result. If an upstream
+    Overpass API is given, unknown queries are forwarded and the responses are recorded (save()).
+
+    Parameters
+    ----------
+    recordings_path : str, json file {query key: {'query', 'content_type', 'body'}}
+    upstream_url : str, Overpass API for recording (e.g. https://overpass-api.de/api/interpreter)
+    """
+
+    def __init__(self, recordings_path=None, upstream_url=None):
+        self.recordings_path = recordings_path
+        self.upstream_url = upstream_url
+        self.recordings = {}
+        self.stats = {'queries': 0, 'replayed': 0, 'recorded': 0, 'empty': 0}
+        self.lock = threading.Lock()
+
+        if recordings_path and os.path.exists(recordings_path):
+            with open(recordings_path, encoding='utf8') as recordings_file:
+                self.recordings = json.load(recordings_file)
+            logging.info(msg='Overpass recordings loaded: ' + str(len(self.recordings)) + ' responses.')
+
+        self.server = None
+        self.thread = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:' + str(self.server.server_address[1]) + '/api/interpreter'
+
+    def start(self):
+        """
+        Start the stand-in on a free local port.
+
+        Returns
+        -------
+        str, url of the stand-in
+        """
+
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_POST(self):
+                query = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                content_type, body = stand_in.answer(query)
+                data = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, name='OverpassStandIn', daemon=True)
+        self.thread.start()
+        logging.info(msg='Overpass stand-in: ' + self.url)
+
+        return self.url
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def answer(self, query):
+        """
+        Answer a query from the recordings, the upstream API (recording) or with an empty result.
+
+        Parameters
+        ----------
+        query : bytes
+
+        Returns
+        -------
+        str, str (content type, body)
+        """
+
+        key = get_query_key(query)
+
+        with self.lock:
+            self.stats['queries'] = self.stats['queries'] + 1
+            recording = self.recordings.get(key)
+            if recording is not None:
+                self.stats['replayed'] = self.stats['replayed'] + 1
+                return recording['content_type'], recording['body']
+
+        if self.upstream_url:
+            with urlopen(self.upstream_url, query) as response:
+                recording = {
+                    'query': query.decode('utf-8'),
+                    'content_type': response.getheader('Content-Type'),
+                    'body': response.read().decode('utf-8')
+                }
+            with self.lock:
+                self.recordings[key] = recording
+                self.stats['recorded'] = self.stats['recorded'] + 1
+            return recording['content_type'], recording['body']
+
+        with self.lock:
+            self.stats['empty'] = self.stats['empty'] + 1
+        return 'application/json', EMPTY_RESULT
+
+    def save(self, recordings_path=None):
+        """
+        Save the recordings (json).
+
+        Parameters
+        ----------
+        recordings_path : str, default: path of the loaded recordings
+        """
+
+        recordings_path = recordings_path or self.recordings_path
+        with open(recordings_path, mode='w', encoding='utf8') as recordings_file:
+            json.dump(self.recordings, recordings_file, indent=2, ensure_ascii=False)
+        logging.info(msg='Overpass recordings saved: ' + recordings_path)
@@ -0,0 +1,221 @@
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import tempfile
+import time
+from copy import deepcopy
+from datetime import datetime
+
+from Surrogator.Benchmark.Corpus import generate_synthetic_project, DEFAULT_PHI_DENSITY
+from Surrogator.Benchmark.Overpass import OverpassStandIn
+from Surrogator.Configuration.const import BENCHMARK_TEMPLATE_PROJECT_PATH, BENCHMARK_OVERPASS_RECORDINGS_PATH
+from Surrogator.Substitution.ProjectManagement import create_cas_management
+
+
+SURROGATE_MODES = ['x', 'entity', 'gemtex', 'fictive']
+
+
+def get_peak_rss_mb():
+    """
+    Peak resident set size of the current process in MB.
+
+    Returns
+    -------
+    float
+    """
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak_rss / (1024 * 1024 if platform.system() == 'Darwin' else 1024), 1)
+
+
+def benchmark_mode(mode, dir_corpus, dir_out, n_phi, date_shift=0):
+    """
+    Benchmark one surrogate mode, per stage (read, quality control, setup, manipulate, serialize) and end-to-end
+    (set_surrogates_in_inception_projects).
+
+    Parameters
+    ----------
+    mode : str
+    dir_corpus : str, directory with the synthetic project
+    dir_out : str, output directory of the end-to-end run
+    n_phi : int, number of PHI annotations in the corpus
+    date_shift : int
+
+    Returns
+    -------
+    dict
+    """
+
+    from Surrogator.FileUtils import read_dir
+    from Surrogator.QualityControl import run_quality_control_of_project
+    from Surrogator.Substitution.ProjectManagement import set_surrogates_in_inception_projects
+
+    config = {
+        'input': {'task': 'surrogate', 'annotation_project_path': dir_corpus},
+        'surrogate_process': {'surrogate_modes': [mode], 'date_surrogation': date_shift},
+        'output': {'out_directory': dir_out}
+    }
+
+    stages = {}
+
+    start = time.perf_counter()
+    projects = read_dir(dir_path=dir_corpus)
+    stages['read'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    corpus_files = {}
+    for project in projects:
+        corpus_files[project['name']] = run_quality_control_of_project(project)['corpus_files']
+    stages['quality_control'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cm = create_cas_management(mode, config)
+    stages['setup'] = time.perf_counter() - start
+
+    results = []
+    start = time.perf_counter()
+    for project in projects:
+        for document, part_of_corpus in corpus_files[project['name']].items():
+            if part_of_corpus:
+                results.append(cm.manipulate_cas(cas=deepcopy(project['annotations'][document])))
+    stages['manipulate'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for pipeline_results in results:
+        pipeline_results['cas'].sofa_string.encode('utf-8')
+        pipeline_results['cas'].to_json(pretty_print=0)
+    stages['serialize'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    set_surrogates_in_inception_projects(config)
+    end_to_end = time.perf_counter() - start
+
+    n_documents = len(results)
+
+    return {
+        'mode': mode,
+        'documents': n_documents,
+        'phi': n_phi,
+        'seconds_end_to_end': round(end_to_end, 4),
+        'docs_per_second': round(n_documents / end_to_end, 3) if end_to_end else None,
+        'phi_per_second': round(n_phi / end_to_end, 3) if end_to_end else None,
+        'docs_per_second_manipulate': round(n_documents / stages['manipulate'], 3) if stages['manipulate'] else None,
+        'stages_seconds': {stage: round(seconds, 4) for stage, seconds in stages.items()},
+        'peak_rss_mb': get_peak_rss_mb(),
+    }
+
+
+def _benchmark_mode_in_process(arguments):
+    mode, dir_corpus, dir_out, n_phi, date_shift, overpass_url = arguments
+    if not overpass_url:
+        return benchmark_mode(mode, dir_corpus, dir_out, n_phi, date_shift)
+
+    former_overpass_url = os.environ.get('OVERPASS_URL')
+    os.environ['OVERPASS_URL'] = overpass_url
+    try:
+        return benchmark_mode(mode, dir_corpus, dir_out, n_phi, date_shift)
+    finally:
+        if former_overpass_url is None:
+            del os.environ['OVERPASS_URL']
+        else:
+            os.environ['OVERPASS_URL'] = former_overpass_url
+
+
+def run_benchmark(modes=None, n_documents=20, document_length=300, phi_density=None, seed=0, date_shift=0,
+                  overpass_recordings=None, overpass_upstream=None, work_dir=None, isolate=True,
+                  template_project=BENCHMARK_TEMPLATE_PROJECT_PATH):
+    """
+    Generate a synthetic corpus and benchmark the surrogate modes on it.
+    Mode fictive runs against a local Overpass stand-in (recorded responses, offline). Without
+    overpass_recordings and overpass_upstream the shipped recordings of the synthetic corpus are replayed,
+    they cover the queries of the corpus with the default parameters.
+
+    Parameters
+    ----------
+    modes : list of strings, default: all modes
+    n_documents : int
+    document_length : int, tokens per document
+    phi_density : dict, PHI annotations per 100 tokens for every kind
+    seed : int
+    date_shift : int
+    overpass_recordings : str, json file with recorded Overpass responses (default: BENCHMARK_OVERPASS_RECORDINGS_PATH)
+    overpass_upstream : str, Overpass API to record unknown queries (not offline)
+    work_dir : str, directory for corpus and outputs (default: temporary directory)
+    isolate : bool, every mode in an own process (peak RSS per mode)
+    template_project : str
+
+    Returns
+    -------
+    dict
+    """
+
+    modes = modes or SURROGATE_MODES
+    phi_density = phi_density or DEFAULT_PHI_DENSITY
+    if overpass_recordings is None and not overpass_upstream:
+        overpass_recordings = str(BENCHMARK_OVERPASS_RECORDINGS_PATH)
+
+    with tempfile.TemporaryDirectory(prefix='surrogator_benchmark_') as tmp_dir:
+        work_dir = work_dir or tmp_dir
+        dir_corpus = work_dir + os.sep + 'corpus'
+
+        start = time.perf_counter()
+        corpus = generate_synthetic_project(
+            path_zip=dir_corpus + os.sep + 'synthetic-benchmark.zip',
+            n_documents=n_documents,
+            document_length=document_length,
+            phi_density=phi_density,
+            seed=seed,
+            template_project=template_project
+        )
+        corpus['seconds_generation'] = round(time.perf_counter() - start, 4)
+        logging.info(msg='Synthetic corpus: ' + str(corpus['documents']) + ' documents, ' + str(corpus['phi']) + ' PHI.')
+
+        results = {}
+        with OverpassStandIn(recordings_path=overpass_recordings, upstream_url=overpass_upstream) as overpass:
+            for mode in modes:
+                logging.info(msg='Benchmark mode: ' + mode)
+                arguments = (mode, dir_corpus, work_dir + os.sep + 'out_' + mode, corpus['phi'], date_shift,
+                             overpass.url if mode == 'fictive' else None)
+                if isolate:
+                    with multiprocessing.get_context().Pool(processes=1) as pool:
+                        results[mode] = pool.apply(_benchmark_mode_in_process, (arguments,))
+                else:
+                    results[mode] = _benchmark_mode_in_process(arguments)
+
+            if overpass_upstream and overpass_recordings:
+                overpass.save()
+            overpass_stats = dict(overpass.stats)
+
+    if overpass_stats['empty']:
+        logging.warning(msg=str(overpass_stats['empty']) + ' Overpass queries without recorded response, answered '
+                            'with an empty result (record them with overpass_upstream).')
+
+    corpus.pop('path')
+
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'corpus': corpus,
+        'overpass': overpass_stats,
+        'modes': results,
+    }
+
+
+def write_benchmark_report(report, path_json):
+    """
+    Write a benchmark report (json).
+
+    Parameters
+    ----------
+    report : dict
+    path_json : str
+    """
+
+    with open(path_json, mode='w', encoding='utf8') as outfile:
+        json.dump(report, outfile, indent=2, ensure_ascii=False)
+    logging.info(msg='Benchmark report: ' + path_json)
@@ -0,0 +1,68 @@
+import argparse
+import json
+import logging
+import re
+
+from Surrogator.Benchmark import run_benchmark, write_benchmark_report, SURROGATE_MODES
+
+
+def main():
+    """
+    Benchmark of the surrogate modes on a synthetic corpus.
+
+    -   all modes, 20 documents with 300 tokens
+        `python -m Surrogator.Benchmark -o benchmark.json`
+
+    -   modes x and entity, 200 documents, more names
+        `python -m Surrogator.Benchmark -m x,entity -n 200 --density NAME_PATIENT=5`
+    """
+
+    parser = argparse.ArgumentParser(description="GeMTeX Surrogator Benchmark")
+    parser.add_argument("-m", "--modes", type=str, default=','.join(SURROGATE_MODES),
+                        help="Surrogate modes, comma separated")
+    parser.add_argument("-n", "--documents", type=int, default=20, help="Number of synthetic documents")
+    parser.add_argument("-t", "--tokens", type=int, default=300, help="Tokens per document")
+    parser.add_argument("--density", type=str, action="append", default=[], metavar="KIND=VALUE",
+                        help="PHI annotations per 100 tokens of a kind, only the given kinds if used")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="Seed of the synthetic corpus")
+    parser.add_argument("-d", "--DATE", type=int, default=0, help="Integer value as date shift (mode fictive)")
+    parser.add_argument("--overpass_recordings", type=str,
+                        help="Recorded Overpass responses (json) for mode fictive, default: the shipped recordings "
+                             "of the synthetic corpus with the default -n, -t, -s and --density")
+    parser.add_argument("--overpass_upstream", type=str,
+                        help="Overpass API to record unknown queries into --overpass_recordings")
+    parser.add_argument("--no_isolate", action="store_true", help="Run all modes in this process")
+    parser.add_argument("-w", "--work_dir", type=str, help="Directory for corpus and outputs (default: temporary)")
+    parser.add_argument("-o", "--output", type=str, help="Benchmark report (json), default: stdout")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    phi_density = None
+    if args.density:
+        phi_density = {}
+        for density in args.density:
+            kind, value = density.split('=')
+            phi_density[kind.strip()] = float(value)
+
+    report = run_benchmark(
+        modes=re.split(r',\s*', args.modes),
+        n_documents=args.documents,
+        document_length=args.tokens,
+        phi_density=phi_density,
+        seed=args.seed,
+        date_shift=args.DATE,
+        overpass_recordings=args.overpass_recordings,
+        overpass_upstream=args.overpass_upstream,
+        work_dir=args.work_dir,
+        isolate=not args.no_isolate
+    )
+
+    if args.output:
+        write_benchmark_report(report, args.output)
+    else:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -6,6 +6,7 @@ from pathlib import Path
 
 _THIS_DIR = Path(__file__).parent
 _RESSOURCE_DIR = _THIS_DIR.parent.parent / 'resources'
+_TEST_DATA_DIR = _THIS_DIR.parent.parent / 'test_data'
 
 HOSPITAL_DATA_PATH = _RESSOURCE_DIR / 'Location_Lists' / 'Combined_healthcare_facilities.txt'
 HOSPITAL_NEAREST_NEIGHBORS_MODEL_PATH = _RESSOURCE_DIR / 'model' / 'nearest_neighbors_model_location_hospital.joblib'
@@ -21,4 +22,7 @@ EMBEDDING_MODEL_NAME = 'sentence-transformers/paraphrase-multilingual-MiniLM-L12
 EMBEDDING_MODEL_LOCAL_COPY = _RESSOURCE_DIR / 'model' / 'paraphrase-multilingual-MiniLM-L12-v2'
 SPACY_MODEL = 'de_core_news_lg'
 
-PHONE_AREA_CODE_PATH = _RESSOURCE_DIR / 'phone' / 'tel_numbers_merged.json'
\ No newline at end of file
+PHONE_AREA_CODE_PATH = _RESSOURCE_DIR / 'phone' / 'tel_numbers_merged.json'
+
+BENCHMARK_TEMPLATE_PROJECT_PATH = _TEST_DATA_DIR / 'projects' / 'project-deid-test-data-1-2025-09-18-160813.zip'
+BENCHMARK_OVERPASS_RECORDINGS_PATH = _TEST_DATA_DIR / 'benchmark' / 'overpass_recordings.json'
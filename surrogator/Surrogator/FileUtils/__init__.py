@@ -1,7 +1,13 @@
+import hashlib
+import io
 import json
 import logging
 import os
+import queue
 import re
+import tarfile
+import threading
+import time
 import zipfile
 from collections import defaultdict
 from datetime import datetime
@@ -15,10 +21,14 @@ def handle_config(config):
         * private-'timestamp-key-of-run'/'project-name'
         * private-'timestamp-key-of-run'/'project-name'
 
-    dict config: contains the configuration of the run.
+    dict config: contains the configuration of the run,
+        config['output']['resume'] continues the run with the given timestamp key (same output directories).
     """
 
-    timestamp_key = datetime.now().strftime('%Y%m%d-%H%M%S')
+    if get_output_option(config, 'resume'):
+        timestamp_key = get_output_option(config, 'resume')
+    else:
+        timestamp_key = datetime.now().strftime('%Y%m%d-%H%M%S')
 
     if 'output' in config:
         if 'out_directory' in config['output']:
@@ -64,6 +74,26 @@ def handle_config(config):
     return out_directory_private, out_directory_public, surrogate_modes, timestamp_key
 
 
+def get_output_option(config, option, default=None):
+    """
+    Get an option of the output configuration, config['output'] is optional and may be an empty string.
+
+    Parameters
+    ----------
+    config : dict
+    option : str
+    default : any
+
+    Returns
+    -------
+    any
+    """
+
+    if isinstance(config.get('output'), dict):
+        return config['output'].get(option, default)
+    return default
+
+
 def translate_tag(tag, translation_path=None):
     """
     Translate the given tag to a human-readable format.
@@ -92,10 +122,13 @@ def translate_tag(tag, translation_path=None):
     #        return tag
 
 
-def read_dir(dir_path: str, selected_projects: list = None) -> list[dict]:
+def read_dir(dir_path: str, selected_projects: list = None, load_cas: bool = True) -> list[dict]:
     """
     Read input directories from path with INCEpTION projects, it is derived from:
     https://github.com/inception-project/inception-reporting-dashboard/blob/main/inception_reports/generate_reports_manager.py
+    With load_cas=False the annotations are the cas json files (bytes) instead of cas objects.
+    The name of a project is its file name (with the timestamp of the export), the slug from exportedproject.json
+    stays the same over exports of the project.
 
     Returns
     -------
@@ -169,12 +202,16 @@ def read_dir(dir_path: str, selected_projects: list = None) -> list[dict]:
                                     if not file.endswith("INITIAL_CAS.json")
                                 )
 
+                        annotation_hashes = {}
                         for annotation_file in selected_annotation_files:
                             try:
                                 subfolder_name = os.path.dirname(annotation_file).split("/")[1]
-                                with zip_file.open(annotation_file) as cas_file:
-                                    cas = cassis.load_cas_from_json(cas_file)
-                                    annotations[subfolder_name] = cas
+                                cas_content = zip_file.read(annotation_file)
+                                if load_cas:
+                                    annotations[subfolder_name] = cassis.load_cas_from_json(io.BytesIO(cas_content))
+                                else:
+                                    annotations[subfolder_name] = cas_content
+                                annotation_hashes[subfolder_name] = hashlib.sha256(cas_content).hexdigest()
 
                             except Exception as e:
                                 logging.warning(f"Failed to load annotation file {annotation_file} from {file_name}: {e}")
@@ -183,9 +220,11 @@ def read_dir(dir_path: str, selected_projects: list = None) -> list[dict]:
                         projects.append(
                             {
                                 "name": file_name,
+                                "slug": project_meta.get("slug") or file_name,
                                 "tags": project_tags if project_tags else None,
                                 "documents": project_documents,
-                                "annotations": annotations
+                                "annotations": annotations,
+                                "annotation_hashes": annotation_hashes
                             }
                         )
 
@@ -196,29 +235,221 @@ def read_dir(dir_path: str, selected_projects: list = None) -> list[dict]:
     return projects
 
 
-def export_cas_to_file(cas, dir_out_text, dir_out_cas, file_name):
+def iter_dir(dir_path: str, load_cas: bool = True):
     """
-        Export (new produced) cas to txt file and json file.
+    Read the INCEpTION projects of a directory one after another (read_dir), only one project is in memory.
+
+    Returns
+    -------
+    iterator of dicts
+    """
+
+    if os.path.isdir(dir_path):
+        for file_name in sorted(os.listdir(dir_path)):
+            if file_name.endswith('.zip'):
+                yield from read_dir(dir_path=dir_path, selected_projects=[file_name.split(".")[0]], load_cas=load_cas)
+
+
+def create_cas_exporter(config, dir_out_text, dir_out_cas):
+    """
+    Create the background writer of a project as configured in config['output']:
+    'archive' (None, 'zip', 'tar'), 'export_queue_size', 'export_batch_size' and 'fsync' ('none', 'batch', 'file').
 
     Parameters
     ----------
-    cas : Cas
+    config : dict
     dir_out_text : str
-    file_name: str
+    dir_out_cas : str
 
-    Return
-    ------
-    0
+    Returns
+    -------
+    CasExporter
     """
-    txt_file = dir_out_text + os.sep + file_name + '.txt'
 
-    f = open(txt_file, "w", encoding="utf-8")
-    f.write(cas.sofa_string)
-    f.close()
-    logging.info('New text file: ' + txt_file)
+    return CasExporter(
+        dir_out_text=dir_out_text,
+        dir_out_cas=dir_out_cas,
+        archive=get_output_option(config, 'archive'),
+        queue_size=get_output_option(config, 'export_queue_size', 16),
+        batch_size=get_output_option(config, 'export_batch_size', 8),
+        fsync=get_output_option(config, 'fsync', 'none'),
+    )
 
-    json_cas_file = dir_out_cas + os.sep + file_name + '.json'
-    cas.to_json(json_cas_file, pretty_print=0)
-    logging.info('New cas file: ' + json_cas_file)
 
-    return 0
+class CasExporter:
+
+    """
+    Background writer for the output of a project: the text and cas json file of every document.
+    Documents are queued by export(), the serialization of the cas and the writing is done in batches
+    in a writer thread. The caller is only blocked if the (bounded) queue is full.
+
+    Parameters
+    ----------
+    dir_out_text : str
+    dir_out_cas : str
+    archive : str, None (directories), 'zip' or 'tar' (one archive instead of each directory)
+    queue_size : int
+    batch_size : int
+    fsync : str, 'none', 'batch' (after every batch) or 'file' (after every file)
+    """
+
+    def __init__(self, dir_out_text, dir_out_cas, archive=None, queue_size=16, batch_size=8, fsync='none'):
+        if archive not in [None, 'zip', 'tar']:
+            raise ValueError('No valid archive format, only zip and tar allowed: ' + str(archive))
+        if fsync not in ['none', 'batch', 'file']:
+            raise ValueError('No valid fsync policy, only none, batch and file allowed: ' + str(fsync))
+
+        self.archive = archive
+        self.batch_size = batch_size
+        self.fsync = fsync
+
+        self.error = None
+        self.stats = {'documents': 0, 'batches': 0, 'seconds_writing': 0.0}
+
+        self.targets = {}
+        self.archive_paths = []
+        for target, directory in [('text', dir_out_text), ('cas', dir_out_cas)]:
+            if archive is None:
+                os.makedirs(name=directory, exist_ok=True)
+                self.targets[target] = directory
+            else:
+                os.makedirs(name=os.path.dirname(directory) or '.', exist_ok=True)
+                archive_path = directory + '.' + archive
+                if archive == 'zip':
+                    self.targets[target] = zipfile.ZipFile(archive_path, mode='w', compression=zipfile.ZIP_DEFLATED)
+                else:
+                    self.targets[target] = tarfile.open(archive_path, mode='w')
+                self.archive_paths.append(archive_path)
+                logging.info(msg='New archive: ' + archive_path)
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = threading.Thread(target=self._run, name='CasExporter', daemon=True)
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def export(self, cas, file_name):
+        """
+        Queue a (new produced) cas for the export to txt file and json file.
+
+        Parameters
+        ----------
+        cas : Cas
+        file_name : str
+        """
+
+        if self.error is not None:
+            raise self.error
+        self.queue.put((cas, file_name))
+
+    def flush(self):
+        """
+        Wait until all queued documents are written (e.g. for a checkpoint).
+        """
+
+        self.queue.join()
+
+        if self.archive is not None:
+            for target in self.targets.values():
+                (target.fp if isinstance(target, zipfile.ZipFile) else target.fileobj).flush()
+
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        """
+        Write all queued documents, close the archives and wait for the writer thread.
+        """
+
+        self.queue.put(None)
+        self.thread.join()
+
+        if self.archive is not None:
+            for target in self.targets.values():
+                target.close()
+            if self.fsync != 'none':
+                for archive_path in self.archive_paths:
+                    self._sync(archive_path)
+
+        logging.info(
+            msg='Export done: ' + str(self.stats['documents']) + ' documents in ' + str(self.stats['batches'])
+            + ' batches, ' + str(round(self.stats['seconds_writing'], 3)) + ' s writing.'
+        )
+
+        if self.error is not None:
+            raise self.error
+
+    def _run(self):
+        batch = []
+        while True:
+            item = self.queue.get()
+            if item is not None:
+                batch.append(item)
+            if batch and (item is None or len(batch) >= self.batch_size or self.queue.empty()):
+                self._write_batch(batch)
+                batch = []
+            self.queue.task_done()
+            if item is None:
+                break
+
+    def _write_batch(self, batch):
+        if self.error is not None:
+            return  # keep draining the queue, the error is raised in the main thread
+
+        start = time.perf_counter()
+        try:
+            written = []
+            for cas, file_name in batch:
+                written.append(self._write('text', file_name + '.txt', cas.sofa_string))
+                written.append(self._write('cas', file_name + '.json', cas.to_json(pretty_print=0)))
+
+            if self.fsync == 'batch':
+                for target in dict.fromkeys(written):
+                    self._sync(target)
+
+            self.stats['documents'] = self.stats['documents'] + len(batch)
+            self.stats['batches'] = self.stats['batches'] + 1
+        except Exception as e:
+            logging.error(msg='Export failed: ' + str(e))
+            self.error = e
+
+        self.stats['seconds_writing'] = self.stats['seconds_writing'] + time.perf_counter() - start
+
+    def _write(self, target, name, content):
+        data = content.encode('utf-8')
+
+        if self.archive is None:
+            path = self.targets[target] + os.sep + name
+            with open(path, 'wb') as f:
+                f.write(data)
+                if self.fsync == 'file':
+                    f.flush()
+                    os.fsync(f.fileno())
+            logging.info('New ' + target + ' file: ' + path)
+            return path
+
+        if self.archive == 'zip':
+            self.targets[target].writestr(name, data)
+        else:
+            tar_info = tarfile.TarInfo(name=name)
+            tar_info.size = len(data)
+            tar_info.mtime = int(time.time())
+            self.targets[target].addfile(tar_info, io.BytesIO(data))
+        logging.info('New ' + target + ' file in archive: ' + name)
+
+        if self.fsync == 'file':
+            self._sync(self.targets[target])
+        return self.targets[target]
+
+    def _sync(self, target):
+        if isinstance(target, str):
+            with open(target, 'rb') as f:
+                os.fsync(f.fileno())
+        else:
+            fileobj = target.fp if isinstance(target, zipfile.ZipFile) else target.fileobj
+            fileobj.flush()
+            os.fsync(fileobj.fileno())
@@ -0,0 +1,308 @@
+import copy
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+
+DOCUMENT_META_DATA_TYPE = 'de.tudarmstadt.ukp.dkpro.core.api.metadata.type.DocumentMetaData'
+
+
+def get_document_name(cas, default):
+    """
+    Name of a document: title of the DocumentMetaData of an INCEpTION cas, otherwise default.
+
+    Parameters
+    ----------
+    cas : cas object
+    default : str
+
+    Returns
+    -------
+    str
+    """
+
+    try:
+        for meta_data in cas.select(DOCUMENT_META_DATA_TYPE):
+            if meta_data.documentTitle:
+                return meta_data.documentTitle
+    except Exception:
+        pass
+    return default
+
+
+class StageProfiler:
+
+    """
+    Lightweight instrumentation of the processing of documents: wall time and calls per stage,
+    annotations and cache hits per PHI kind and further counters (e.g. Overpass queries) for each document.
+
+    A stage is measured by lap(stage): the time since the start of the document or the former lap.
+    The aggregate over all documents is updated at the end of each document; the profiles of the single
+    documents are only kept with keep_documents (a long-running service keeps only the aggregate).
+    Stages of a project which belong to no single document (e.g. the resolve of the corpus mode) are
+    profiled by project_stage(name), they count in the aggregate but not as documents.
+
+    Parameters
+    ----------
+    keep_documents : bool
+
+    Examples
+    --------
+    with profiler.document(name):
+        ...
+        profiler.lap('names', calls=len(names))
+    """
+
+    def __init__(self, keep_documents=True):
+        self.keep_documents = keep_documents
+        self.documents = {}
+        self.project_stages = {}
+        self.unfinished = {}
+        self.total = self._empty_total()
+        self.current = None
+        self.last = None
+
+    @staticmethod
+    def _empty_total():
+        return {'documents': 0, 'seconds': 0.0, 'stages': {}, 'kinds': {}, 'counters': {}}
+
+    @staticmethod
+    def _empty_profile():
+        return {'seconds': 0.0, 'stages': {}, 'kinds': {}, 'counters': {}}
+
+    @contextmanager
+    def document(self, name, finish=True):
+        """
+        Profile the processing of a document.
+
+        Parameters
+        ----------
+        name : str
+        finish : bool, with False the next document(name) continues the profile (e.g. collect and rewrite
+            of the corpus mode), it is added to the aggregate when it is finished
+        """
+
+        self.current = self.unfinished.pop(name, None) or self._empty_profile()
+        if self.keep_documents:
+            self.documents[name] = self.current
+        start = self.last = time.perf_counter()
+        try:
+            yield self.current
+        finally:
+            self.current['seconds'] = self.current['seconds'] + time.perf_counter() - start
+            if finish:
+                self._add_to_total(self.current)
+            else:
+                self.unfinished[name] = self.current
+            self.current = None
+
+    def finish(self, name):
+        """
+        Finish the profile of a document from document(name, finish=False) which is not continued.
+
+        Parameters
+        ----------
+        name : str
+        """
+
+        if name in self.unfinished:
+            self._add_to_total(self.unfinished.pop(name))
+
+    @contextmanager
+    def project_stage(self, name):
+        """
+        Profile a stage of a project which belongs to no single document, its laps, kinds and counters
+        are kept under project_stages[name].
+
+        Parameters
+        ----------
+        name : str
+        """
+
+        self.current = self._empty_profile()
+        start = self.last = time.perf_counter()
+        try:
+            yield self.current
+        finally:
+            self.current['seconds'] = time.perf_counter() - start
+            self._merge(self.project_stages.setdefault(name, self._empty_profile()), self.current)
+            self._merge(self.total, self.current)
+            self.current = None
+
+    def _add_to_total(self, document_profile):
+        self.total['documents'] = self.total['documents'] + 1
+        self._merge(self.total, document_profile)
+
+    @staticmethod
+    def _merge(target, profile):
+        target['seconds'] = target['seconds'] + profile['seconds']
+        for group in ['stages', 'kinds']:
+            for name, values in profile[group].items():
+                target_values = target[group].setdefault(name, dict.fromkeys(values, 0))
+                for key, value in values.items():
+                    target_values[key] = target_values[key] + value
+        for counter, value in profile['counters'].items():
+            target['counters'][counter] = target['counters'].get(counter, 0) + value
+
+    def lap(self, stage, calls=1):
+        """
+        Record the wall time since the start of the document (or the former lap) for a stage.
+
+        Parameters
+        ----------
+        stage : str
+        calls : int, number of calls (e.g. of surrogate functions) in this stage
+        """
+
+        now = time.perf_counter()
+        if self.current is not None:
+            stage_profile = self.current['stages'].setdefault(stage, {'seconds': 0.0, 'calls': 0})
+            stage_profile['seconds'] = stage_profile['seconds'] + now - self.last
+            stage_profile['calls'] = stage_profile['calls'] + calls
+        self.last = now
+
+    def count(self, counter, n=1):
+        if self.current is not None:
+            self.current['counters'][counter] = self.current['counters'].get(counter, 0) + n
+
+    def count_kind(self, kind, cache_hit=False):
+        """
+        Count an annotation of a PHI kind, cache_hit if its surrogate is known from a former document.
+        """
+
+        if self.current is not None:
+            kind_profile = self.current['kinds'].setdefault(str(kind), {'annotations': 0, 'cache_hits': 0})
+            kind_profile['annotations'] = kind_profile['annotations'] + 1
+            kind_profile['cache_hits'] = kind_profile['cache_hits'] + int(cache_hit)
+
+    def reset(self):
+        self.documents = {}
+        self.project_stages = {}
+        self.unfinished = {}
+        self.total = self._empty_total()
+
+    def get_profile(self):
+        """
+        Profile of all documents since the last reset() (empty without keep_documents), the stages of the
+        project and the aggregate over them.
+
+        Returns
+        -------
+        dict
+        """
+
+        return {
+            'total': copy.deepcopy(self.total),
+            'documents': self.documents,
+            'project_stages': self.project_stages
+        }
+
+
+class CountingOverpass:
+
+    """
+    Overpass API wrapper counting the queries (counter 'overpass_queries') of a document.
+
+    Parameters
+    ----------
+    overpass_api : overpy.Overpass
+    profiler : StageProfiler
+    """
+
+    def __init__(self, overpass_api, profiler):
+        self.overpass_api = overpass_api
+        self.profiler = profiler
+
+    def query(self, query):
+        self.profiler.count('overpass_queries')
+        return self.overpass_api.query(query)
+
+    def __getattr__(self, name):
+        return getattr(self.overpass_api, name)
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def profile_to_prometheus(profile, project_name, mode):
+    """
+    Prometheus text format of the aggregate of a profile.
+
+    Parameters
+    ----------
+    profile : dict, StageProfiler.get_profile()
+    project_name : str
+    mode : str
+
+    Returns
+    -------
+    str
+    """
+
+    labels = 'project="' + _escape_label(project_name) + '",mode="' + _escape_label(mode) + '"'
+    total = profile['total']
+
+    lines = [
+        '# HELP surrogator_documents_total Processed documents.',
+        '# TYPE surrogator_documents_total counter',
+        'surrogator_documents_total{' + labels + '} ' + str(total['documents']),
+        '# HELP surrogator_document_seconds_total Wall time of the processed documents.',
+        '# TYPE surrogator_document_seconds_total counter',
+        'surrogator_document_seconds_total{' + labels + '} ' + repr(total['seconds']),
+    ]
+
+    for metric, key, group, label, description in [
+        ('surrogator_stage_seconds_total', 'seconds', 'stages', 'stage', 'Wall time per stage.'),
+        ('surrogator_stage_calls_total', 'calls', 'stages', 'stage', 'Calls per stage.'),
+        ('surrogator_phi_annotations_total', 'annotations', 'kinds', 'kind', 'PHI annotations per kind.'),
+        ('surrogator_phi_cache_hits_total', 'cache_hits', 'kinds', 'kind',
+         'PHI annotations per kind with a surrogate of a former document.'),
+    ]:
+        lines.append('# HELP ' + metric + ' ' + description)
+        lines.append('# TYPE ' + metric + ' counter')
+        for name, values in sorted(total[group].items()):
+            lines.append(
+                metric + '{' + labels + ',' + label + '="' + _escape_label(name) + '"} ' + repr(values[key])
+            )
+
+    lines.append('# HELP surrogator_counter_total Further counters (e.g. Overpass queries).')
+    lines.append('# TYPE surrogator_counter_total counter')
+    for counter, value in sorted(total['counters'].items()):
+        lines.append('surrogator_counter_total{' + labels + ',counter="' + _escape_label(counter) + '"} ' + str(value))
+
+    return '\n'.join(lines) + '\n'
+
+
+def write_profile(profile, dir_project_quality_control, project_name, timestamp_key, mode, prometheus=False):
+    """
+    Write the profile of a project (json) next to the quality control report, optional in Prometheus text format.
+
+    Parameters
+    ----------
+    profile : dict, StageProfiler.get_profile()
+    dir_project_quality_control : str
+    project_name : str
+    timestamp_key : str
+    mode : str
+    prometheus : bool
+
+    Returns
+    -------
+    str, path of the json profile
+    """
+
+    path_profile = dir_project_quality_control + os.sep + project_name + '_' + timestamp_key + '_profile_' + mode
+
+    with open(file=path_profile + '.json', mode='w', encoding='utf8') as outfile:
+        json.dump(profile, outfile, indent=2, ensure_ascii=False)
+    logging.info(msg='Profile: ' + path_profile + '.json')
+
+    if prometheus:
+        with open(file=path_profile + '.prom', mode='w', encoding='utf8') as outfile:
+            outfile.write(profile_to_prometheus(profile, project_name, mode))
+        logging.info(msg='Profile (Prometheus): ' + path_profile + '.prom')
+
+    return path_profile + '.json'
@@ -1,12 +1,15 @@
 import collections
-import json
+import concurrent.futures
+import csv
+import io
 import logging
 import os
 
+import cassis
 import pandas as pd
 from mdutils.mdutils import MdUtils
 
-from Surrogator.FileUtils import read_dir, handle_config
+from Surrogator.FileUtils import iter_dir, handle_config
 from Surrogator.Substitution.Entities.Date import get_quarter
 
 
@@ -36,7 +39,8 @@ def examine_cas(cas, cas_name):
             else:
                 is_part_of_corpus = 0
 
-    return ({kind: list(set(dict(stats_det[kind]).keys())) for kind in stats_det},
+    # unique values in order of occurrence (independent of the hash seed, same in every process)
+    return ({kind: list(stats_det[kind].keys()) for kind in stats_det},
             {kind: sum(stats_det[kind].values()) for kind in stats_det},
             is_part_of_corpus)
 
@@ -57,175 +61,349 @@ def run_quality_control_only(config):
 
     dir_out_private, dir_out_public, surrogate_modes, timestamp_key = handle_config(config)
 
-    projects = read_dir(dir_path=config['input']['annotation_project_path'])
+    workers = config.get('quality_control', {}).get('workers', 1)
+
+    # one project at a time in memory, with workers the cas json files are parsed by the process pool
+    projects = iter_dir(dir_path=config['input']['annotation_project_path'], load_cas=workers <= 1)
 
     proof_projects(
         projects=projects,
         dir_out_private=dir_out_private,
-        timestamp_key=timestamp_key
+        timestamp_key=timestamp_key,
+        workers=workers
     )
 
 
-def write_quality_control_report(quality_control, dir_project_quality_control, project_name, timestamp_key):
+# entries of the top-N lists of the markdown report, the complete tables are written as csv files
+QC_REPORT_TOP_N = 20
+
+# kinds whose most frequent values are listed in the markdown report
+QC_REPORT_VALUE_KINDS = ['OTHER', 'PROFESSION', 'LOCATION_OTHER', 'AGE']
+
+
+def create_quality_control_dir(dir_out_private, project_name, timestamp_key):
+    """
+    Create the directory of the quality control of a project in the private directory of a run.
+
+    Returns
+    -------
+    str
+    """
+
+    dir_project_quality_control = (dir_out_private + os.sep + project_name + os.sep + 'quality_control' + '_'
+                                   + project_name + '_' + timestamp_key)
+    os.makedirs(name=dir_project_quality_control, exist_ok=True)
+    return dir_project_quality_control
+
+
+def get_quality_control_table_paths(dir_project_quality_control, project_name):
     """
-    create the markdown report for quality control
+    Paths of the csv tables of the quality control of a project (QualityControlTables).
+
+    Returns
+    -------
+    dict
+    """
+
+    return {
+        'documents':         dir_project_quality_control + os.sep + project_name + '_corpus_documents.csv',
+        'phi_counts':        dir_project_quality_control + os.sep + project_name + '_phi_counts.csv',
+        'phi_values':        dir_project_quality_control + os.sep + project_name + '_phi_values.csv',
+        'wrong_annotations': dir_project_quality_control + os.sep + project_name + '_wrong_annotations.csv',
+    }
+
+
+class QualityControlTables:
+
+    """
+    Columnar csv tables of the quality control of a project, written document by document while the documents
+    are examined: documents (part of corpus), PHI counts and values per document and kind (long format) and
+    wrong annotations.
+
+    Parameters
+    ----------
+    dir_project_quality_control : str
+    project_name : string
+    """
+
+    HEADERS = {
+        'documents':         ['document', 'part_of_corpus'],
+        'phi_counts':        ['document', 'kind', 'count'],
+        'phi_values':        ['document', 'kind', 'value'],
+        'wrong_annotations': ['document', 'token_id', 'kind', 'text', 'begin', 'end'],
+    }
+
+    def __init__(self, dir_project_quality_control, project_name):
+        self.paths = get_quality_control_table_paths(dir_project_quality_control, project_name)
+        self.files = {}
+        try:
+            for table, path in self.paths.items():
+                self.files[table] = open(path, mode='w', encoding='utf8', newline='')
+        except OSError:
+            self.close()
+            raise
+        self.writers = {table: csv.writer(table_file) for table, table_file in self.files.items()}
+        for table, header in self.HEADERS.items():
+            self.writers[table].writerow(header)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write(self, quality_control):
+        """
+        Write the rows of a (partial) quality control, e.g. of one document (examine_document).
+
+        Parameters
+        ----------
+        quality_control : dict
+        """
+
+        writers = self.writers
+        for document, part_of_corpus in quality_control['corpus_files'].items():
+            writers['documents'].writerow([document, part_of_corpus])
+            writers['phi_counts'].writerows(
+                [document, kind, count] for kind, count in quality_control['stats_detailed_cnt'].get(document, {}).items()
+            )
+            writers['phi_values'].writerows(
+                [document, kind, value]
+                for kind, values in quality_control['stats_detailed'].get(document, {}).items()
+                for value in values
+            )
+
+        for kind, wrong_annotations in [('NONE', quality_control['wrong_annotations_none']),
+                                        ('OTHER', quality_control['wrong_annotations_other'])]:
+            for document_token, annotation in wrong_annotations.items():
+                document, token_id = document_token.rsplit(' & ', 1)
+                writers['wrong_annotations'].writerow(
+                    [document, token_id, kind, annotation['text'], annotation['token.begin'], annotation['token.end']]
+                )
+
+        for kind, wrong_annotations in [('DATE_BIRTH', quality_control['wrong_annotations_date_birth']),
+                                        ('DATE_DEATH', quality_control['wrong_annotations_date_death'])]:
+            for document, annotation in wrong_annotations.items():
+                writers['wrong_annotations'].writerow(
+                    [document, '', kind, annotation['wrong data annotation'], '', '']
+                )
+
+    def close(self):
+        for table_file in self.files.values():
+            table_file.close()
+
+
+def write_quality_control_tables(quality_control, dir_project_quality_control, project_name):
+    """
+    Write the quality control of a project (already examined) as columnar csv tables (QualityControlTables).
 
     Parameters
     ----------
     quality_control : dict
     dir_project_quality_control : str
     project_name : string
-    timestamp_key : string
 
     Returns
     -------
-    dict
+    dict, paths of the tables
     """
 
-    md_report = MdUtils(
-        file_name=dir_project_quality_control + os.sep + 'Report_Quality_Control_' + project_name + '_' + timestamp_key + '.md',
-        title='Report Quality Control of Run ' + project_name + '_' + timestamp_key
-    )
-    md_report.write('# Project: ' + project_name + '\n\n')
-
-    with open(file=dir_project_quality_control + os.sep + 'quality_control.json', mode='w', encoding='utf8') as outfile:
-        json.dump(quality_control, outfile, indent=2, sort_keys=True, ensure_ascii=False)
+    with QualityControlTables(dir_project_quality_control, project_name) as tables:
+        tables.write(quality_control)
+    return tables.paths
 
-    pd_corpus = pd.DataFrame(
-        quality_control['corpus_files'],
-        index=['part_of_corpus']
-    ).rename_axis('document', axis=1).transpose()
-    path_file_corpus_documents = dir_project_quality_control + os.sep + project_name + '_corpus_documents.csv'
-    pd_corpus.to_csv(path_file_corpus_documents)
 
-    path_file_corpus_details = dir_project_quality_control + os.sep + project_name + '_corpus_details.csv'
-    pd.DataFrame(quality_control['stats_detailed']).transpose().to_csv(path_file_corpus_details)
-    corpus_details = pd.DataFrame(quality_control['stats_detailed']).transpose().rename_axis('document', axis=1)
+def _top_n_markdown(df, top_n=QC_REPORT_TOP_N):
+    """
+    Markdown of the first top_n rows of a table and a note on the further rows.
+    """
 
-    path_file_statistics = dir_project_quality_control + os.sep + project_name + '_statistics.csv'
-    pd.DataFrame(quality_control['stats_detailed_cnt']).transpose().to_csv(path_file_statistics)
+    markdown = df.head(top_n).to_markdown()
+    if len(df) > top_n:
+        markdown = markdown + '\n\n... ' + str(len(df) - top_n) + ' more, see csv tables.'
+    return markdown + '\n\n'
 
-    md_report.write('\n\n' + pd.DataFrame(
-        quality_control['stats_detailed_cnt']).transpose().rename_axis('document').to_markdown() + '\n\n')
 
-    md_report.write('\n\n' + pd.DataFrame(
-        quality_control['stats_detailed']).transpose().rename_axis('document').to_markdown() + '\n\n')
+def write_quality_control_report(quality_control, dir_project_quality_control, project_name, timestamp_key,
+                                 paths=None):
+    """
+    create the markdown report for quality control:
+    the complete results are written as csv tables (QualityControlTables), the markdown report
+    contains aggregates and top-N lists computed from the tables
 
-    for item in ['OTHER', 'PROFESSION', 'LOCATION_OTHER', 'AGE']:
-        if item in corpus_details.keys():
-            md_report.write('\n\n' + pd.DataFrame(
-                corpus_details).dropna(subset=[item])[item].transpose().rename_axis('document').to_markdown() + '\n\n')
+    Parameters
+    ----------
+    quality_control : dict
+    dir_project_quality_control : str
+    project_name : string
+    timestamp_key : string
+    paths : dict, paths of the tables if they were written while the documents were examined
+        (QualityControlTables), otherwise they are written from quality_control
 
-    md_report.write('## Documents of Corpus\n\n')
+    Returns
+    -------
+    dict
+    """
 
-    corpus_files = pd.DataFrame(quality_control['corpus_files'], index=['part_of_corpus']).transpose()
-    md_report.write('### Processed Documents\n\n')
-    md_report.write(pd.DataFrame(
-        corpus_files[corpus_files['part_of_corpus'] == 1].index).rename_axis('document', axis=0).to_markdown() + '\n\n')
+    if paths is None:
+        paths = write_quality_control_tables(quality_control, dir_project_quality_control, project_name)
 
-    md_report.write('### Excluded Documents from Corpus (containing OTHER or NONE annotation)\n\n')
+    documents = pd.read_csv(paths['documents'], dtype={'document': str})
+    counts = pd.read_csv(paths['phi_counts'], dtype={'document': str, 'kind': str})
+    values = pd.read_csv(paths['phi_values'], dtype={'document': str, 'kind': str, 'value': str}, keep_default_na=False)
+    wrong_annotations = pd.read_csv(paths['wrong_annotations'], dtype=str, keep_default_na=False)
 
-    df_part_of_corpus = pd.DataFrame(corpus_files[corpus_files['part_of_corpus'] == 0].index).rename_axis('document', axis=0)
-    if not df_part_of_corpus.empty:
-        md_report.write(df_part_of_corpus.to_markdown() + '\n\n')
-    else:
-        md_report.write('No excluded documents.' + '\n\n')
+    md_report = MdUtils(
+        file_name=dir_project_quality_control + os.sep + 'Report_Quality_Control_' + project_name + '_' + timestamp_key + '.md',
+        title='Report Quality Control of Run ' + project_name + '_' + timestamp_key
+    )
+    md_report.write('# Project: ' + project_name + '\n\n')
 
-    df_wrong_annotations_none = pd.DataFrame(quality_control['wrong_annotations_none']).transpose().rename_axis('document & token.id')
-    if not df_wrong_annotations_none.empty:
-        md_report.write('## Wrong annotations (NONE)\n\n' + df_wrong_annotations_none.to_markdown() + '\n\n')
+    part_of_corpus = documents['part_of_corpus'] == 1
+    md_report.write('## Summary\n\n' + pd.DataFrame({
+        'documents': [len(documents)],
+        'part of corpus': [int(part_of_corpus.sum())],
+        'excluded (OTHER or NONE)': [int((~part_of_corpus).sum())],
+        'PHI annotations': [int(counts['count'].sum())],
+        'wrong annotations': [len(wrong_annotations)],
+    }).transpose().rename(columns={0: '#'}).to_markdown() + '\n\n')
+
+    md_report.write('## PHI per Kind\n\n')
+    if not counts.empty:
+        kinds = counts.groupby('kind')['count'].agg(annotations='sum', documents='count')
+        kinds['per document'] = (kinds['annotations'] / max(len(documents), 1)).round(2)
+        kinds['unique values'] = values.groupby('kind')['value'].nunique()
+        kinds = kinds.fillna(0).astype({'unique values': int}).sort_values('annotations', ascending=False)
+        md_report.write(kinds.to_markdown() + '\n\n')
+
+        phi_per_document = counts.groupby('document')['count'].sum().sort_values(ascending=False)
+        md_report.write('### Documents with most PHI annotations\n\n'
+                        + _top_n_markdown(phi_per_document.rename('PHI annotations').to_frame()))
     else:
-        md_report.write('No wrong annotations with tag NONE.' + '\n\n')
+        md_report.write('No PHI annotations.\n\n')
 
-    df_wrong_annotations_other = pd.DataFrame(quality_control['wrong_annotations_other']).transpose().rename_axis('document & token.id')
-    if not df_wrong_annotations_other.empty:
-        md_report.write('## Wrong annotations (OTHER)\n\n' + df_wrong_annotations_other.to_markdown() + '\n\n')
-    else:
-        md_report.write('No wrong annotations with tag OTHER.' + '\n\n')
+    for kind in QC_REPORT_VALUE_KINDS:
+        values_of_kind = values[values['kind'] == kind]
+        if not values_of_kind.empty:
+            md_report.write('### Most frequent values ' + kind + '\n\n' + _top_n_markdown(
+                values_of_kind['value'].value_counts().rename('documents').rename_axis('value').to_frame()
+            ))
 
-    df_wrong_annotations_date_birth = pd.DataFrame(quality_control['wrong_annotations_date_birth'])
-    if not df_wrong_annotations_date_birth.empty:
-        md_report.write('## Wrong DATE_BIRTH\n\n' + df_wrong_annotations_date_birth.transpose().to_markdown() + '\n\n')
+    md_report.write('## Documents of Corpus\n\n')
+    md_report.write('### Excluded Documents from Corpus (containing OTHER or NONE annotation)\n\n')
+    excluded = documents[~part_of_corpus][['document']].reset_index(drop=True)
+    if not excluded.empty:
+        md_report.write(_top_n_markdown(excluded))
     else:
-        md_report.write('No wrong annotations with tag BIRTH_DATE.' + '\n\n')
+        md_report.write('No excluded documents.' + '\n\n')
 
-    df_wrong_annotations_date_death = pd.DataFrame(quality_control['wrong_annotations_date_death'])
-    if not df_wrong_annotations_date_death.empty:
-        md_report.write('## Wrong BIRTH_DATE\n\n' + df_wrong_annotations_date_death.transpose().to_markdown() + '\n\n')
+    md_report.write('## Wrong Annotations\n\n')
+    if not wrong_annotations.empty:
+        md_report.write(wrong_annotations['kind'].value_counts().rename('#').to_frame().to_markdown() + '\n\n')
+        md_report.write(_top_n_markdown(wrong_annotations))
     else:
-        md_report.write('No wrong annotations with tag BIRTH_DEATH.' + '\n\n')
-
-    md_report.write(
-        '## Counts DATE_BIRTH\n\n'
-        + pd.DataFrame(
-            quality_control['birthday_cnt'],
-            index=['DATE_BIRTH (#)']
-        ).rename_axis('document', axis=0).transpose().to_markdown() + '\n\n'
-    )
+        md_report.write('No wrong annotations.' + '\n\n')
+
+    md_report.write('## Counts DATE_BIRTH\n\n')
+    date_birth = counts[counts['kind'] == 'DATE_BIRTH'].set_index('document')['count']
+    date_birth = date_birth.reindex(documents['document'], fill_value=0)
+    md_report.write(pd.DataFrame({
+        'documents without DATE_BIRTH': [int((date_birth == 0).sum())],
+        'documents with more than one DATE_BIRTH': [int((date_birth > 1).sum())],
+    }).transpose().rename(columns={0: '#'}).to_markdown() + '\n\n')
+    if (date_birth > 1).any():
+        md_report.write(_top_n_markdown(
+            date_birth[date_birth > 1].sort_values(ascending=False).rename('DATE_BIRTH (#)').to_frame()
+        ))
+
+    md_report.write('## Tables\n\n' + '\n'.join('* ' + os.path.basename(path) for path in paths.values()) + '\n\n')
 
     md_report.create_md_file()
     logging.info(msg='Report quality control of project "' + project_name + '" in ' + md_report.file_name)
 
     return {
-        "path_file_corpus_details":    path_file_corpus_details,
-        "path_file_corpus_documents":  path_file_corpus_documents,
-        "path_file_statistics":        path_file_statistics,
+        "path_file_phi_values":        paths['phi_values'],
+        "path_file_corpus_documents":  paths['documents'],
+        "path_file_phi_counts":        paths['phi_counts'],
+        "path_file_wrong_annotations": paths['wrong_annotations'],
         "path_file_report_md":         md_report.file_name,
         "dir_project_quality_control": dir_project_quality_control
     }
 
 
-def proof_projects(projects, dir_out_private, timestamp_key):
+def proof_projects(projects, dir_out_private, timestamp_key, workers=1):
     """
     proof and examine projects (bunch of single projects),
-    examination started by run_quality_control_of_project(...)
+    examination started by run_quality_control_of_projects(...)
 
     Parameters
     ----------
-    projects : list[dict]
+    projects : list[dict] or iterator of dicts
     dir_out_private : str
     timestamp_key : str
+    workers : int, processes examining the documents
 
     Returns
     -------
     dict
     """
 
-    for project in projects:
+    def open_tables(project):
+        return QualityControlTables(
+            create_quality_control_dir(dir_out_private, project['name'], timestamp_key), project['name']
+        )
+
+    for project, quality_control in run_quality_control_of_projects(
+            projects=projects, workers=workers, open_tables=open_tables
+    ):
         project_name = project['name']
 
         logging.info(msg='name: ' + project_name)
 
-        dir_project_private = dir_out_private + os.sep + project_name
-        if not os.path.exists(path=dir_project_private):
-            os.makedirs(name=dir_project_private)
-
-        dir_project_quality_control = dir_project_private + os.sep + 'quality_control' + '_' + project_name + '_' + timestamp_key
-        if not os.path.exists(path=dir_project_quality_control):
-            os.makedirs(name=dir_project_quality_control)
-
+        dir_project_quality_control = create_quality_control_dir(dir_out_private, project_name, timestamp_key)
         write_quality_control_report(
-            quality_control=run_quality_control_of_project(project),
+            quality_control=quality_control,
             dir_project_quality_control=dir_project_quality_control,
             project_name=project_name,
-            timestamp_key=timestamp_key
+            timestamp_key=timestamp_key,
+            paths=get_quality_control_table_paths(dir_project_quality_control, project_name)
         )
 
 
-def run_quality_control_of_project(project):
+# partial statistics of the quality control, each entry is keyed by the document
+QUALITY_CONTROL_KEYS = [
+    'wrong_annotations_none',
+    'wrong_annotations_other',
+    'wrong_annotations_date_birth',
+    'wrong_annotations_date_death',
+    'stats_detailed',
+    'stats_detailed_cnt',
+    'corpus_files',
+    'birthday_cnt'
+]
+
+
+def examine_document(document, cas):
     """
-    proof and examine one single project
+    proof and examine one single document of a project
 
     Parameters
     ----------
-    project : dict
+    document : str
+    cas : cas object or cas json (bytes)
 
     Returns
     -------
-    dict
+    dict, partial quality control of the document (merge_quality_control), empty if the cas json is not
+    readable (such documents are skipped as by read_dir)
     """
 
-    logging.info(msg='project: ' + str(project['name']))
+    if isinstance(cas, bytes):
+        try:
+            cas = cassis.load_cas_from_json(io.BytesIO(cas))
+        except Exception as e:
+            logging.warning(msg='cas of document not readable, skipped: ' + str(document) + ' (' + str(e) + ')')
+            return {key: {} for key in QUALITY_CONTROL_KEYS}
 
     wrong_annotations_none       = {}
     wrong_annotations_other      = {}
@@ -237,70 +415,66 @@ def run_quality_control_of_project(project):
     corpus_files            = {}
     birthday_cnt            = {}
 
-    for i, document in enumerate(project['annotations']):
-
-        logging.info(msg='processing document [' + str(i + 1) + ']: ' + str(document))
-        cas = project['annotations'][document]
-        relevant_types = [t for t in cas.typesystem.get_types() if 'PHI' in t.name]
+    relevant_types = [t for t in cas.typesystem.get_types() if 'PHI' in t.name]
 
-        if relevant_types:
+    if relevant_types:
 
-            cas_name = relevant_types[0].name
+        cas_name = relevant_types[0].name
 
-            stats_det, stats_det_count, is_part_of_corpus = examine_cas(cas=cas, cas_name=cas_name)
+        stats_det, stats_det_count, is_part_of_corpus = examine_cas(cas=cas, cas_name=cas_name)
 
-            corpus_files[document]       = is_part_of_corpus
-            stats_detailed[document]     = dict(stats_det)
-            stats_detailed_cnt[document] = dict(stats_det_count)
+        corpus_files[document]       = is_part_of_corpus
+        stats_detailed[document]     = dict(stats_det)
+        stats_detailed_cnt[document] = dict(stats_det_count)
 
-            if 'DATE_BIRTH' not in stats_det_count:
-                logging.warning(msg='No BIRTH_DATE annotated.')
-                birthday_cnt[document] = 0
-            else:
-                if 'DATE_BIRTH' in stats_detailed[document].keys():
-                    for date_ann in stats_detailed[document]['DATE_BIRTH']:
-                        if get_quarter(date_ann) == 'none':
-                            wrong_annotations_date_death[document] = {'wrong data annotation': date_ann}
-                else:
-                    logging.warning('no DATE_BIRTH annotation')
-
-                if int(stats_detailed_cnt[document]['DATE_BIRTH']) > 1:
-                    logging.warning(msg='More than one DATE_BIRTH inside!')
-                    birthday_cnt[document] = stats_detailed_cnt[document]['DATE_BIRTH']
-
-            if 'DATE_DEATH' in stats_detailed[document].keys():
-                for date_ann in stats_detailed[document]['DATE_DEATH']:
+        if 'DATE_BIRTH' not in stats_det_count:
+            logging.warning(msg='No BIRTH_DATE annotated.')
+            birthday_cnt[document] = 0
+        else:
+            if 'DATE_BIRTH' in stats_detailed[document].keys():
+                for date_ann in stats_detailed[document]['DATE_BIRTH']:
                     if get_quarter(date_ann) == 'none':
                         wrong_annotations_date_death[document] = {'wrong data annotation': date_ann}
-                else:
-                    logging.warning(msg='no DATE_DEATH annotation')
-
-            for sentence in cas.select(cas_name):
-
-                for token in cas.select_covered(cas_name, sentence):
-
-                    if token.kind is None or 'OTHER' == token.kind:
-                        if token.kind is None:
-                            wrong_annotations_none[document + ' & ' + str(token.xmiID)] = {
-                                'text':        token.get_covered_text(),
-                                'token.begin': str(token.begin),
-                                'token.end':   str(token.end),
-                            }
-                        elif token.kind == 'OTHER':
-                            wrong_annotations_other[document + ' & ' + str(token.xmiID)] = {
-                                'text':        token.get_covered_text(),
-                                'token.begin': str(token.begin),
-                                'token.end':   str(token.end),
-                            }
-
-                        logging.warning(msg='---- Wrong Annotation : [kind]' + str(token.kind) + ' ----')
-                        logging.warning(msg='token.xmiID: ' + str(token.xmiID))
-                        logging.warning(msg='token.text: '  + str(token.get_covered_text()))
-                        logging.warning(msg='token.begin: ' + str(token.begin) + ' / token.end: ' + str(token.end))
-                        logging.warning(msg='------------------------')
+            else:
+                logging.warning('no DATE_BIRTH annotation')
 
-        else:
-            logging.warning(msg='--- NO PII or PHI layer annotations ---')
+            if int(stats_detailed_cnt[document]['DATE_BIRTH']) > 1:
+                logging.warning(msg='More than one DATE_BIRTH inside!')
+                birthday_cnt[document] = stats_detailed_cnt[document]['DATE_BIRTH']
+
+        if 'DATE_DEATH' in stats_detailed[document].keys():
+            for date_ann in stats_detailed[document]['DATE_DEATH']:
+                if get_quarter(date_ann) == 'none':
+                    wrong_annotations_date_death[document] = {'wrong data annotation': date_ann}
+            else:
+                logging.warning(msg='no DATE_DEATH annotation')
+
+        for sentence in cas.select(cas_name):
+
+            for token in cas.select_covered(cas_name, sentence):
+
+                if token.kind is None or 'OTHER' == token.kind:
+                    if token.kind is None:
+                        wrong_annotations_none[document + ' & ' + str(token.xmiID)] = {
+                            'text':        token.get_covered_text(),
+                            'token.begin': str(token.begin),
+                            'token.end':   str(token.end),
+                        }
+                    elif token.kind == 'OTHER':
+                        wrong_annotations_other[document + ' & ' + str(token.xmiID)] = {
+                            'text':        token.get_covered_text(),
+                            'token.begin': str(token.begin),
+                            'token.end':   str(token.end),
+                        }
+
+                    logging.warning(msg='---- Wrong Annotation : [kind]' + str(token.kind) + ' ----')
+                    logging.warning(msg='token.xmiID: ' + str(token.xmiID))
+                    logging.warning(msg='token.text: '  + str(token.get_covered_text()))
+                    logging.warning(msg='token.begin: ' + str(token.begin) + ' / token.end: ' + str(token.end))
+                    logging.warning(msg='------------------------')
+
+    else:
+        logging.warning(msg='--- NO PII or PHI layer annotations ---')
 
     quality_control = {
         'wrong_annotations_none':       wrong_annotations_none,
@@ -314,3 +488,119 @@ def run_quality_control_of_project(project):
     }
 
     return quality_control
+
+
+def merge_quality_control(quality_controls):
+    """
+    Merge partial quality controls (examine_document) of the documents of a project.
+    The entries are keyed by the document, the merge is associative and keeps the order of the documents:
+    merged in document order the result is the same as the one of a serial run.
+
+    Parameters
+    ----------
+    quality_controls : iterable of dicts
+
+    Returns
+    -------
+    dict
+    """
+
+    merged = {key: {} for key in QUALITY_CONTROL_KEYS}
+    for quality_control in quality_controls:
+        for key in QUALITY_CONTROL_KEYS:
+            merged[key].update(quality_control[key])
+
+    return merged
+
+
+def run_quality_control_of_project(project, tables=None):
+    """
+    proof and examine one single project
+
+    Parameters
+    ----------
+    project : dict
+    tables : QualityControlTables, the documents are written to the tables as they are examined
+
+    Returns
+    -------
+    dict
+    """
+
+    logging.info(msg='project: ' + str(project['name']))
+
+    def examine_documents():
+        for i, document in enumerate(project['annotations']):
+            logging.info(msg='processing document [' + str(i + 1) + ']: ' + str(document))
+            quality_control = examine_document(document=document, cas=project['annotations'][document])
+            if tables is not None:
+                tables.write(quality_control)
+            yield quality_control
+
+    return merge_quality_control(examine_documents())
+
+
+def _collect_quality_control(project, futures, tables=None):
+    """
+    Merge the partial quality controls of the documents of a project examined by the process pool,
+    they are written to the tables in the order of the documents.
+    """
+
+    logging.info(msg='project: ' + str(project['name']))
+
+    def collect_documents():
+        for future in futures:
+            quality_control = future.result()
+            if tables is not None:
+                tables.write(quality_control)
+            yield quality_control
+
+    try:
+        return project, merge_quality_control(collect_documents())
+    finally:
+        if tables is not None:
+            tables.close()
+
+
+def run_quality_control_of_projects(projects, workers=1, open_tables=None):
+    """
+    proof and examine projects, with workers > 1 the documents of the projects are examined by a process pool:
+    the documents of the next project are examined while the last ones of the current project are finished.
+    The annotations of the projects should be the cas json files (read_dir(..., load_cas=False)), they are
+    parsed by the workers.
+
+    Parameters
+    ----------
+    projects : list[dict] or iterator of dicts
+    workers : int
+    open_tables : callable, project -> QualityControlTables, the documents of a project are written to its
+        tables as they are examined
+
+    Returns
+    -------
+    iterator of (project, quality control)
+    """
+
+    if not workers or workers <= 1:
+        for project in projects:
+            tables = open_tables(project) if open_tables is not None else None
+            try:
+                quality_control = run_quality_control_of_project(project, tables=tables)
+            finally:
+                if tables is not None:
+                    tables.close()
+            yield project, quality_control
+        return
+
+    pending = collections.deque()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        for project in projects:
+            pending.append((project, [
+                executor.submit(examine_document, document, cas)
+                for document, cas in project['annotations'].items()
+            ], open_tables(project) if open_tables is not None else None))
+            while len(pending) > 1:
+                yield _collect_quality_control(*pending.popleft())
+
+        while pending:
+            yield _collect_quality_control(*pending.popleft())
@@ -0,0 +1,310 @@
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cassis
+
+from Surrogator.Substitution.ProjectManagement import create_cas_management
+
+
+SURROGATE_MODES = ['x', 'entity', 'gemtex', 'fictive']
+
+# modes with surrogates consistent over documents, their CasManagement processes one document at a time
+STATEFUL_MODES = ['gemtex', 'fictive']
+
+
+class ServiceBusy(Exception):
+    pass
+
+
+class BatchTooLarge(Exception):
+    pass
+
+
+class DocumentNotProcessable(Exception):
+    pass
+
+
+class SurrogateService:
+
+    """
+    Surrogation of single cas documents with CasManagements (and models) loaded once at startup.
+
+    Documents are processed by a pool of 'workers' threads, at most 'queue_size' further documents wait
+    for a worker, more documents are rejected (ServiceBusy). The CasManagement of the modes gemtex and
+    fictive keeps the surrogates consistent over all documents of the service and processes one document
+    at a time.
+
+    Parameters
+    ----------
+    modes : list of strings
+    date_shift : int, date shift of mode fictive
+    workers : int
+    queue_size : int
+    """
+
+    def __init__(self, modes=None, date_shift=0, workers=4, queue_size=32):
+        self.modes = modes or SURROGATE_MODES
+        self.workers = workers
+        self.queue_size = queue_size
+
+        config = {'surrogate_process': {'surrogate_modes': self.modes, 'date_surrogation': date_shift}}
+
+        self.cas_managements = {}
+        for mode in self.modes:
+            start = time.perf_counter()
+            self.cas_managements[mode] = create_cas_management(mode, config)
+            if hasattr(self.cas_managements[mode], 'profiler'):
+                # the service runs without end, only the aggregate of the profile is kept
+                self.cas_managements[mode].profiler.keep_documents = False
+            logging.info(msg='Mode ' + mode + ' loaded in ' + str(round(time.perf_counter() - start, 2)) + ' s.')
+
+        self.mode_locks = {mode: threading.Lock() for mode in self.modes if mode in STATEFUL_MODES}
+
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='surrogate')
+        self.slots = threading.BoundedSemaphore(workers + queue_size)
+        self.stats_lock = threading.Lock()
+        self.stats = {'in_flight': 0, 'processed': 0, 'failed': 0, 'rejected': 0, 'seconds_processing': 0.0}
+        self.started = time.time()
+
+    def surrogate_document(self, mode, cas_json):
+        """
+        Surrogate one cas (json) document.
+
+        Parameters
+        ----------
+        mode : str
+        cas_json : str
+
+        Returns
+        -------
+        dict, 'cas' (json), 'key_assignment' and 'seconds'
+        """
+
+        start = time.perf_counter()
+        try:
+            cas = cassis.load_cas_from_json(cas_json)
+        except Exception as e:
+            raise ValueError('No valid cas json: ' + str(e))
+
+        cm = self.cas_managements[mode]
+        if mode in self.mode_locks:
+            with self.mode_locks[mode]:
+                pipeline_results = cm.manipulate_cas(cas=cas)
+        else:
+            pipeline_results = cm.manipulate_cas(cas=cas)
+
+        if not pipeline_results:
+            raise DocumentNotProcessable('Document not processable, it contains annotations of kind OTHER.')
+
+        return {
+            'cas': json.loads(pipeline_results['cas'].to_json(pretty_print=0)),
+            'key_assignment': pipeline_results.get('key_ass', {}),
+            'seconds': round(time.perf_counter() - start, 4)
+        }
+
+    def _run(self, mode, cas_json):
+        start = time.perf_counter()
+        try:
+            result = self.surrogate_document(mode, cas_json)
+            failed = 0
+            return result
+        except BaseException:
+            failed = 1
+            raise
+        finally:
+            self.slots.release()
+            with self.stats_lock:
+                self.stats['in_flight'] = self.stats['in_flight'] - 1
+                self.stats['processed'] = self.stats['processed'] + 1 - failed
+                self.stats['failed'] = self.stats['failed'] + failed
+                self.stats['seconds_processing'] = self.stats['seconds_processing'] + time.perf_counter() - start
+
+    def submit(self, mode, documents):
+        """
+        Queue documents for surrogation, all or none of them.
+        A batch larger than workers + queue_size never fits and is rejected with BatchTooLarge, a batch which
+        does not fit at the moment with ServiceBusy.
+
+        Parameters
+        ----------
+        mode : str
+        documents : dict, {name: cas json}
+
+        Returns
+        -------
+        dict, {name: future}
+        """
+
+        if mode not in self.cas_managements:
+            raise KeyError('Mode not loaded: ' + str(mode))
+        if len(documents) > self.workers + self.queue_size:
+            with self.stats_lock:
+                self.stats['rejected'] = self.stats['rejected'] + len(documents)
+            raise BatchTooLarge('Batch of ' + str(len(documents)) + ' documents, at most ' +
+                                str(self.workers + self.queue_size) + ' documents per batch.')
+
+        acquired = 0
+        for _ in documents:
+            if not self.slots.acquire(blocking=False):
+                for _ in range(acquired):
+                    self.slots.release()
+                with self.stats_lock:
+                    self.stats['rejected'] = self.stats['rejected'] + len(documents)
+                raise ServiceBusy('Queue full, ' + str(self.workers + self.queue_size) + ' documents in process.')
+            acquired = acquired + 1
+
+        with self.stats_lock:
+            self.stats['in_flight'] = self.stats['in_flight'] + len(documents)
+
+        return {name: self.executor.submit(self._run, mode, cas_json) for name, cas_json in documents.items()}
+
+    def health(self):
+        with self.stats_lock:
+            stats = dict(self.stats)
+        stats['seconds_processing'] = round(stats['seconds_processing'], 3)
+        return {
+            'status': 'ok',
+            'modes': list(self.cas_managements),
+            'workers': self.workers,
+            'queue_size': self.queue_size,
+            'uptime_seconds': round(time.time() - self.started, 1),
+            **stats
+        }
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+def _error_result(error):
+    return {'error': type(error).__name__, 'message': str(error)}
+
+
+def create_server(service, host='127.0.0.1', port=8502):
+    """
+    HTTP server of a SurrogateService (one thread per connection).
+
+    GET  /health                      state of the service
+    POST /surrogate/<mode>            body: cas json, response: {'cas', 'key_assignment', 'seconds'}
+    POST /surrogate/<mode>/batch      body: {'documents': {name: cas json}},
+                                      response: {'documents': {name: result or {'error', 'message'}}}
+
+    Parameters
+    ----------
+    service : SurrogateService
+    host : str
+    port : int
+
+    Returns
+    -------
+    ThreadingHTTPServer
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def _respond(self, status, body, headers=None):
+            data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            for header, value in (headers or {}).items():
+                self.send_header(header, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip('/') == '/health':
+                self._respond(200, service.health())
+            else:
+                self._respond(404, {'error': 'NotFound', 'message': self.path})
+
+        def do_POST(self):
+            parts = [part for part in self.path.split('?')[0].split('/') if part]
+            if len(parts) not in [2, 3] or parts[0] != 'surrogate' or (len(parts) == 3 and parts[2] != 'batch'):
+                self._respond(404, {'error': 'NotFound', 'message': self.path})
+                return
+            mode = parts[1]
+            if mode not in service.cas_managements:
+                self._respond(404, {'error': 'NotFound', 'message': 'Mode not loaded: ' + mode})
+                return
+
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8')
+
+            if len(parts) == 2:
+                documents = {'document': body}
+            else:
+                try:
+                    documents = {
+                        name: cas if isinstance(cas, str) else json.dumps(cas)
+                        for name, cas in json.loads(body)['documents'].items()
+                    }
+                except Exception as e:
+                    self._respond(400, {'error': 'BadRequest', 'message': 'Expected {"documents": {...}}: ' + str(e)})
+                    return
+
+            try:
+                futures = service.submit(mode, documents)
+            except BatchTooLarge as e:
+                self._respond(413, _error_result(e))
+                return
+            except ServiceBusy as e:
+                self._respond(503, _error_result(e), headers={'Retry-After': '1'})
+                return
+
+            if len(parts) == 2:
+                try:
+                    self._respond(200, {'mode': mode, **futures['document'].result()})
+                except ValueError as e:
+                    self._respond(400, _error_result(e))
+                except DocumentNotProcessable as e:
+                    self._respond(422, _error_result(e))
+                except BaseException as e:
+                    logging.exception(msg='Surrogation failed.')
+                    self._respond(500, _error_result(e))
+                return
+
+            results = {}
+            for name, future in futures.items():
+                try:
+                    results[name] = future.result()
+                except BaseException as e:
+                    results[name] = _error_result(e)
+            self._respond(200, {'mode': mode, 'documents': results})
+
+        def log_message(self, format, *args):
+            logging.info(msg='Service: ' + format % args)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def run_service(modes=None, date_shift=0, host='127.0.0.1', port=8502, workers=4, queue_size=32):
+    """
+    Load the models and serve the surrogation until interrupted.
+
+    Parameters
+    ----------
+    modes : list of strings
+    date_shift : int
+    host : str
+    port : int
+    workers : int
+    queue_size : int
+    """
+
+    service = SurrogateService(modes=modes, date_shift=date_shift, workers=workers, queue_size=queue_size)
+    server = create_server(service, host=host, port=port)
+    logging.info(msg='Surrogate service on http://' + host + ':' + str(port) + ', modes: ' + str(service.modes))
+    print('Surrogate service on http://' + host + ':' + str(port) + ', modes: ' + ', '.join(service.modes))
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
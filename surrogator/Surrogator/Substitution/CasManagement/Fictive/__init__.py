@@ -22,6 +22,7 @@ from Surrogator.Substitution.Entities.Name.NameTitles import surrogate_name_titl
 from Surrogator.Substitution.Entities.Date import get_quarter, surrogate_dates
 
 from Surrogator.Substitution.CasManagement import CasManagement
+from Surrogator.Profiling import StageProfiler, CountingOverpass, get_document_name
 from Surrogator.Configuration.model_loader import load_embedding_model
 
 from Surrogator.Configuration.const import HOSPITAL_DATA_PATH
@@ -35,6 +36,75 @@ from Surrogator.Configuration.const import SPACY_MODEL
 from Surrogator.Configuration.const import PHONE_AREA_CODE_PATH
 
 
+# tables which keep the surrogates of PHI consistent over documents (and runs)
+CONSISTENCY_TABLES = [
+    'global_user_names',
+    'global_name_titles',
+    'global_location_hospitals',
+    'global_location_organizations',
+    'global_location_replaced_others',
+    'global_location_replaced_address_locations',
+    'global_identifiers',
+    'global_contact_phone_numbers',
+    'global_contact_email',
+    'global_contact_url',
+    'global_countries',
+]
+
+# tables of the corpus mode, names and dates are resolved once per corpus (not kept over runs)
+CORPUS_TABLES = [
+    'global_names',
+    'global_dates',
+]
+
+# global tables of PHI kinds, an annotation of a value in its table is surrogated by a former document
+CACHE_TABLES_OF_KINDS = {
+    'NAME_USER': 'global_user_names',
+    'NAME_TITLE': 'global_name_titles',
+    'LOCATION_HOSPITAL': 'global_location_hospitals',
+    'LOCATION_ORGANIZATION': 'global_location_organizations',
+    'LOCATION_OTHER': 'global_location_replaced_others',
+    'LOCATION_STATE': 'global_location_replaced_address_locations',
+    'LOCATION_CITY': 'global_location_replaced_address_locations',
+    'LOCATION_STREET': 'global_location_replaced_address_locations',
+    'LOCATION_ZIP': 'global_location_replaced_address_locations',
+    'ID': 'global_identifiers',
+    'CONTACT_PHONE': 'global_contact_phone_numbers',
+    'CONTACT_FAX': 'global_contact_phone_numbers',
+    'CONTACT_EMAIL': 'global_contact_email',
+    'CONTACT_URL': 'global_contact_url',
+}
+
+
+def merge_collected_phi(collected):
+    """
+    Merge the collected PHI (collect_phi) of several documents, every surface string once.
+    The preceding words of a name are taken from its first document.
+
+    Parameters
+    ----------
+    collected : list of dicts
+
+    Returns
+    -------
+    dict
+    """
+
+    merged = {}
+    list_kinds = set()
+    for phi in collected:
+        for kind, values in phi.items():
+            merged_values = merged.setdefault(kind, {})
+            if isinstance(values, dict):
+                for value, context in values.items():
+                    merged_values.setdefault(value, context)
+            else:
+                list_kinds.add(kind)
+                merged_values.update(dict.fromkeys(values))
+
+    return {kind: list(values) if kind in list_kinds else values for kind, values in merged.items()}
+
+
 class CasManagementFictive(CasManagement):
 
     """
@@ -43,17 +113,23 @@ class CasManagementFictive(CasManagement):
     Parameters
     ----------
     config : dict
+    model : SentenceTransformer, already loaded embedding model (optional)
+    nlp : spacy.Language, already loaded spaCy model (optional)
 
     """
 
-    def __init__(self, config):
+    def __init__(self, config, model=None, nlp=None):
 
         self.date_shift = config['surrogate_process']['date_surrogation']
 
-        self.model = load_embedding_model()
-        logging.info('SentenceTransformer model ' + EMBEDDING_MODEL_NAME + ' loaded.')
-        self.nlp = spacy.load(SPACY_MODEL)
-        logging.info('spaCy model ' + SPACY_MODEL + ' loaded.')
+        if model is None:
+            model = load_embedding_model()
+            logging.info('SentenceTransformer model ' + EMBEDDING_MODEL_NAME + ' loaded.')
+        self.model = model
+        if nlp is None:
+            nlp = spacy.load(SPACY_MODEL)
+            logging.info('spaCy model ' + SPACY_MODEL + ' loaded.')
+        self.nlp = nlp
 
         self.used_keys = []  # hier gebraucht?
 
@@ -76,12 +152,82 @@ class CasManagementFictive(CasManagement):
 
         # OSM Locations
         self.global_countries = {}
+
+        # corpus tables of an interrupted run, restored by set_corpus_tables()
+        self.resumed_corpus_tables = {}
+
+        # originals found in the consistency tables since the last pop_used_consistency_entries()
+        self.used_consistency_entries = collections.defaultdict(set)
+
+        # stage timings and counters per document
+        self.profiler = StageProfiler()
         #self.global_states = []
         #self.global_cities = []
         #self.global_streets = []
         #self.global_zips = []
 
 
+    def get_consistency_tables(self):
+        """
+        Get the tables which keep the surrogates consistent over documents.
+
+        Returns
+        -------
+        dict
+        """
+
+        return {table: dict(getattr(self, table)) for table in CONSISTENCY_TABLES}
+
+    def pop_used_consistency_entries(self):
+        """
+        Get and reset the originals that were found in the consistency tables (e.g. loaded from the surrogate
+        cache), so that their entries count as used.
+
+        Returns
+        -------
+        dict, {table: set of originals}
+        """
+
+        used = self.used_consistency_entries
+        self.used_consistency_entries = collections.defaultdict(set)
+        return used
+
+    def set_consistency_tables(self, tables):
+        """
+        Restore tables from get_consistency_tables(), e.g. from a former run.
+
+        Parameters
+        ----------
+        tables : dict
+        """
+
+        for table in CONSISTENCY_TABLES:
+            if table in tables:
+                getattr(self, table).update(tables[table])
+
+    def get_corpus_tables(self):
+        """
+        Get the names and dates resolved by resolve_corpus.
+
+        Returns
+        -------
+        dict
+        """
+
+        return {table: dict(getattr(self, table)) for table in CORPUS_TABLES}
+
+    def set_corpus_tables(self, tables):
+        """
+        Restore tables from get_corpus_tables() of an interrupted run, the next resolve_corpus keeps their
+        surrogates, so the remaining documents get the same names and dates as the documents rewritten before.
+
+        Parameters
+        ----------
+        tables : dict
+        """
+
+        self.resumed_corpus_tables = {table: dict(tables[table]) for table in CORPUS_TABLES if table in tables}
+
     def load_nn_and_resource(self,
                              nn_path: str,
                              data_path: str,
@@ -110,7 +256,7 @@ class CasManagementFictive(CasManagement):
 
     def manipulate_cas(self, cas):
         """
-        Manipulate sofa string into a cas object.
+        Manipulate sofa string into a cas object, profiled in self.profiler.
 
         Parameters
         ----------
@@ -122,13 +268,101 @@ class CasManagementFictive(CasManagement):
         cas : cas object
         """
 
-        sofa = cas.get_sofa()
+        document_name = get_document_name(cas, default='document_' + str(self.profiler.total['documents']))
+        with self.profiler.document(document_name):
+            return self._manipulate_cas(cas)
+
+    def _manipulate_cas(self, cas):
+        phi = self.collect_phi(cas)
+        if phi is None:
+            return {}
+        self.profiler.lap('collect')
+
+        self.resolve_surrogates(phi)
+
+        pipeline_results = self.substitute_phi(cas)
+        self.profiler.lap('substitution')
+
+        return pipeline_results
+
+    def resolve_corpus(self, cas_documents):
+        """
+        Resolve the surrogates of a corpus, every PHI surface string is resolved once for the whole corpus:
+        1. collect the unique PHI of all documents per kind (the documents are only read),
+        2. resolve the surrogates of every kind in one batch (names, dates, identifiers, addresses,
+           hospitals, organizations, ...).
+        Afterwards the documents are rewritten one at a time with substitute_corpus_document.
+
+        In contrast to manipulate_cas, names and dates are consistent over the whole corpus.
+
+        Parameters
+        ----------
+        cas_documents : dict, {document name: cas object}
+
+        Returns
+        -------
+        set, names of the documents with annotations of kind OTHER (not processable)
+        """
+
+        # the profile of a document is continued by substitute_corpus_document
+        collected = {}
+        for name, cas in cas_documents.items():
+            with self.profiler.document(name, finish=False):
+                collected[name] = self.collect_phi(cas)
+                self.profiler.lap('collect')
+
+        not_processable = {name for name, phi in collected.items() if phi is None}
+        processable = [phi for name, phi in collected.items() if phi is not None]
+        for name in not_processable:
+            self.profiler.finish(name)
+
+        if processable:
+            with self.profiler.project_stage('resolve_corpus'):
+                self.resolve_surrogates(merge_collected_phi(processable))
+
+        # a resumed run keeps the names and dates of the documents rewritten before the checkpoint
+        for table, surrogates in self.resumed_corpus_tables.items():
+            getattr(self, table).update(surrogates)
+        self.resumed_corpus_tables = {}
+
+        return not_processable
+
+    def substitute_corpus_document(self, name, cas):
+        """
+        Rewrite a document of the corpus with the surrogates of resolve_corpus.
+
+        Parameters
+        ----------
+        name : str
+        cas : cas object, changed in place
+
+        Returns
+        -------
+        dict, 'cas', 'key_ass' and 'used_keys'
+        """
+
+        with self.profiler.document(name):
+            pipeline_results = self.substitute_phi(cas)
+            self.profiler.lap('substitution')
+        return pipeline_results
+
+    def collect_phi(self, cas):
+        """
+        Collect the PHI of a document per kind, values already in the consistency tables are left out.
+
+        Parameters
+        ----------
+        cas : cas object
+
+        Returns
+        -------
+        dict or None, None if the document contains annotations of kind OTHER
+        """
+
         annotations = collections.defaultdict(set)
         token_type = next(t for t in cas.typesystem.get_types() if 'Token' in t.name)
         tokens = cas.select(token_type.name)
 
-        shift = []
-
         names = {}
         dates = {}
         hospitals = {}
@@ -155,6 +389,14 @@ class CasManagementFictive(CasManagement):
         for sentence in cas.select(cas_name):
             for custom_pii in cas.select_covered(cas_name, sentence):
 
+                cache_table = CACHE_TABLES_OF_KINDS.get(custom_pii.kind)
+                cache_hit = cache_table is not None and custom_pii.get_covered_text() in getattr(self, cache_table)
+                self.profiler.count_kind(custom_pii.kind, cache_hit=cache_hit)
+                if cache_table is not None:
+                    for original in (custom_pii.get_covered_text(), 'A-' + custom_pii.get_covered_text()):
+                        if original in getattr(self, cache_table):
+                            self.used_consistency_entries[cache_table].add(original)
+
                 if custom_pii.kind is not None and custom_pii.kind != 'OTHER':
 
                     if custom_pii.kind not in ['PROFESSION', 'AGE']:
@@ -240,20 +482,68 @@ class CasManagementFictive(CasManagement):
                     logging.warning('token.kind: NONE - ' + custom_pii.get_covered_text())
                     annotations[custom_pii.kind].add(custom_pii.get_covered_text())
                 else: #custom_pii.kind == 'OTHER':
-                    return {}
+                    return None
+
+        return {
+            'names': names,
+            'dates': dates,
+            'hospitals': hospitals,
+            'organizations': organizations,
+            'others': others,
+            'identifiers': identifiers,
+            'contacts_email': contacts_email,
+            'contacts_url': contacts_url,
+            'user_names': user_names,
+            'titles': titles,
+            'phone_numbers': phone_numbers,
+            'countries': countries,
+            'states': states,
+            'cities': cities,
+            'streets': streets,
+            'zips': zips
+        }
+
+    def resolve_surrogates(self, phi):
+        """
+        Resolve the surrogates of collected PHI (collect_phi or merge_collected_phi) into the global tables.
+
+        Parameters
+        ----------
+        phi : dict
+        """
+
+        names = phi['names']
+        dates = phi['dates']
+        hospitals = phi['hospitals']
+        organizations = phi['organizations']
+        others = phi['others']
+        identifiers = phi['identifiers']
+        contacts_email = phi['contacts_email']
+        contacts_url = phi['contacts_url']
+        user_names = phi['user_names']
+        titles = phi['titles']
+        phone_numbers = phi['phone_numbers']
+        states = phi['states']
+        cities = phi['cities']
+        streets = phi['streets']
+        zips = phi['zips']
 
         self.global_dates = surrogate_dates(dates=dates, int_delta=self.date_shift)
+        self.profiler.lap('dates', calls=len(dates))
         self.global_names = surrogate_names_by_fictive_names(names)
+        self.profiler.lap('names', calls=len(names))
 
         self.global_identifiers.update(           surrogate_identifiers(identifiers))
         self.global_contact_phone_numbers.update( surrogate_identifiers(phone_numbers))  # ?
         self.global_user_names.update(            surrogate_identifiers(user_names))
+        self.profiler.lap('identifiers', calls=len(identifiers) + len(phone_numbers) + len(user_names))
 
         self.global_name_titles.update(           surrogate_name_titles(titles))
+        self.profiler.lap('name_titles', calls=len(titles))
 
         # LOCATION Address
         overpass_url = environ['OVERPASS_URL'] if 'OVERPASS_URL' in environ else None
-        overpass_api = overpy.Overpass(url=overpass_url)
+        overpass_api = CountingOverpass(overpy.Overpass(url=overpass_url), self.profiler)
 
         # Load phone area code mappings from JSON file
         with Path(PHONE_AREA_CODE_PATH).open(encoding="utf-8") as f:
@@ -280,6 +570,7 @@ class CasManagementFictive(CasManagement):
                 tel_dict
             )
         )
+        self.profiler.lap('addresses', calls=len(states) + len(cities) + len(streets) + len(zips))
 
         self.global_contact_email.update(
             surrogate_email(
@@ -304,19 +595,21 @@ class CasManagementFictive(CasManagement):
 
         #replaced_phone_numbers = {} ## now a global variable
 
+        # Surrogate all subscribers of this document in one batch
+        surrogate_subscribers = surrogate_identifiers([subscriber for _, _, subscriber in phone_dict.values()])
+
         for full_number, (prefix, area, subscriber) in phone_dict.items():
-            # Surrogate just this one subscriber
-            surrogate_subscriber = surrogate_identifiers([subscriber])[subscriber]
             # filter any None values
             surrogate_number = ''.join(filter(None, [
                 prefix,
                 self.global_location_replaced_address_locations.get(area),
-                surrogate_subscriber
+                surrogate_subscribers[subscriber]
             ]))
 
             # map phone numbers with its surrogate
             #replaced_phone_numbers[full_number] = surrogate_number
             self.global_contact_phone_numbers[full_number] = surrogate_number
+        self.profiler.lap('contacts', calls=len(contacts_email) + len(contacts_url) + len(phone_dict))
 
         # Location hospital, location organization, location other
         # model = load_embedding_model()
@@ -340,6 +633,7 @@ class CasManagementFictive(CasManagement):
             for hospital in hospitals
         }
         self.global_location_hospitals.update(replaced_hospital)
+        self.profiler.lap('hospitals', calls=len(hospitals))
 
         # --- Organizations
         org_nn, org_names = self.load_nn_and_resource(
@@ -359,6 +653,7 @@ class CasManagementFictive(CasManagement):
             for organization in organizations
         }
         self.global_location_organizations.update(replaced_organization)
+        self.profiler.lap('organizations', calls=len(organizations))
 
         # --- Other
         other_nn, other_names = self.load_nn_and_resource(
@@ -378,6 +673,23 @@ class CasManagementFictive(CasManagement):
             for other in others
         }
         self.global_location_replaced_others.update(replaced_other)
+        self.profiler.lap('other_locations', calls=len(others))
+
+    def substitute_phi(self, cas):
+        """
+        Replace the PHI of a document by the surrogates of the global tables (resolve_surrogates before).
+
+        Parameters
+        ----------
+        cas : cas object
+
+        Returns
+        -------
+        dict, 'cas', 'key_ass' and 'used_keys'
+        """
+
+        sofa = cas.get_sofa()
+        shift = []
 
         new_text = ''
         last_token_end = 0
@@ -486,8 +798,10 @@ class CasManagementFictive(CasManagement):
 
         new_text = new_text + cas.get_sofa().sofaString[last_token_end:]
 
+        cas = self.manipulate_sofa_string_in_cas(cas=cas, new_text=new_text, shift=shift)
+
         return {
-            'cas': self.manipulate_sofa_string_in_cas(cas=cas, new_text=new_text, shift=shift),
+            'cas': cas,
             'key_ass': key_ass_ret,
             'used_keys': self.used_keys
         }
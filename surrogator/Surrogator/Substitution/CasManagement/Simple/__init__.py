@@ -1,6 +1,56 @@
+import json
+
+import cassis
+
 from Surrogator.Substitution.CasManagement import CasManagement
 
 
+SOFA_TYPE = 'uima.cas.Sofa'
+INITIAL_VIEW = '_InitialView'
+
+
+def get_utf16_offsets(text):
+    """
+    Offsets of a text in UTF-16 code units (offsets of UIMA cas json) for every character index and the end.
+    None if they are identical (no characters beyond the Basic Multilingual Plane).
+
+    Parameters
+    ----------
+    text : str
+
+    Returns
+    -------
+    list of ints or None
+    """
+
+    if len(text.encode('utf-16-le')) == 2 * len(text):
+        return None
+
+    offsets = [0]
+    for character in text:
+        offsets.append(offsets[-1] + (2 if ord(character) > 0xFFFF else 1))
+    return offsets
+
+
+class JsonCas:
+
+    """
+    Cas json (dict) with a changed sofa string, exported like a cas object (sofa_string, to_json).
+
+    Parameters
+    ----------
+    cas_json : dict
+    sofa_string : str
+    """
+
+    def __init__(self, cas_json, sofa_string):
+        self.cas_json = cas_json
+        self.sofa_string = sofa_string
+
+    def to_json(self, pretty_print=0):
+        return json.dumps(self.cas_json, ensure_ascii=False, indent=pretty_print or None)
+
+
 class CasManagementSimple(CasManagement):
 
     """
@@ -73,3 +123,80 @@ class CasManagementSimple(CasManagement):
                     shift=shift
                 )
         }
+
+    def manipulate_cas_json(self, cas_json):
+        """
+        Fast path of manipulate_cas on the cas json of INCEpTION, without a cas object: the sofa string and
+        the begin and end of the PHI annotations are replaced in the json, all other feature structures are
+        kept as they are. Cas with nested or overlapping PHI annotations are processed by manipulate_cas.
+
+        Parameters
+        ----------
+        cas_json : bytes or str
+
+        Returns
+        -------
+        dict, 'cas' (JsonCas or cas object), {} if the document contains annotations of kind OTHER or NONE
+        """
+
+        document = json.loads(cas_json)
+        feature_structures = {fs['%ID']: fs for fs in document['%FEATURE_STRUCTURES']}
+
+        phi_types = [type_name for type_name in document.get('%TYPES', {}) if 'PHI' in type_name]
+        view = document['%VIEWS'][INITIAL_VIEW]
+        sofa = feature_structures[view['%SOFA']]
+        text = sofa.get('sofaString') or ''
+
+        annotations = []
+        if phi_types:
+            annotations = sorted(
+                (fs for fs in feature_structures.values()
+                 if fs['%TYPE'] == phi_types[0] and fs.get('@sofa') == sofa['%ID']),
+                key=lambda fs: (fs.get('begin', 0), fs.get('end', 0), fs['%ID'])
+            )
+
+        if any(annotation.get('kind') in [None, 'OTHER'] for annotation in annotations):
+            return {}
+
+        offsets = get_utf16_offsets(text)
+        if offsets is not None:
+            index_of_offset = {offset: index for index, offset in enumerate(offsets)}
+
+        new_text = []
+        new_length = 0
+        new_spans = []
+        last_token_end = 0
+
+        for annotation in annotations:
+            begin = annotation.get('begin', 0)
+            end = annotation.get('end', 0)
+            if offsets is not None:
+                begin = index_of_offset[begin]
+                end = index_of_offset[end]
+            if begin < last_token_end:
+                return self.manipulate_cas(cas=cassis.load_cas_from_json(cas_json))
+
+            if self.mode == 'x':
+                replace_element = 'X' * (end - begin)
+            elif self.mode == 'entity':
+                replace_element = str(annotation['kind'])
+            else:
+                exit(-1)
+
+            new_text.append(text[last_token_end:begin])
+            new_length = new_length + begin - last_token_end
+            new_spans.append((annotation, new_length, new_length + len(replace_element)))
+            new_text.append(replace_element)
+            new_length = new_length + len(replace_element)
+            last_token_end = end
+
+        new_text.append(text[last_token_end:])
+        new_text = ''.join(new_text)
+
+        new_offsets = get_utf16_offsets(new_text)
+        for annotation, begin, end in new_spans:
+            annotation['begin'] = begin if new_offsets is None else new_offsets[begin]
+            annotation['end'] = end if new_offsets is None else new_offsets[end]
+        sofa['sofaString'] = new_text
+
+        return {'cas': JsonCas(cas_json=document, sofa_string=new_text)}
@@ -0,0 +1,134 @@
+import logging
+import os
+import pickle
+import random
+
+import numpy as np
+
+
+CHECKPOINT_FILE_NAME = 'checkpoint.pkl'
+
+
+class RunCheckpoint:
+
+    """
+    Checkpoint of a surrogate run in its private directory: the completed documents per mode and project,
+    the state of the CasManagement (used keys, consistency tables and corpus names and dates of mode fictive)
+    and the state of the random number generators (random and numpy.random).
+
+    The outputs of a completed document (text and cas file, key assignment) are written before its
+    checkpoint, so a resumed run continues with the next document and yields the same surrogates.
+
+    Parameters
+    ----------
+    dir_out_private : str, private directory of the run ('private/private-timestamp_key')
+    interval : int, number of documents between two checkpoints, 0 disables checkpoints
+    """
+
+    def __init__(self, dir_out_private, interval=10):
+        self.path = dir_out_private + os.sep + CHECKPOINT_FILE_NAME
+        self.interval = interval
+        self.pending = 0
+        self.state = {'done': {}, 'cas_management': {}, 'random_state': None, 'np_random_state': None}
+
+    def load(self):
+        """
+        Load the checkpoint of a former (interrupted) run and restore the random number generators.
+
+        Returns
+        -------
+        bool, True if a checkpoint was found
+        """
+
+        if not os.path.exists(self.path):
+            logging.warning(msg='No checkpoint found: ' + self.path)
+            return False
+
+        with open(self.path, 'rb') as checkpoint_file:
+            self.state = pickle.load(checkpoint_file)
+
+        random.setstate(self.state['random_state'])
+        np.random.set_state(self.state['np_random_state'])
+
+        logging.info(
+            msg='Checkpoint loaded: ' + self.path + ', '
+            + str(sum(len(documents) for documents in self.state['done'].values())) + ' documents done.'
+        )
+        return True
+
+    def restore(self, cm, mode):
+        """
+        Restore the state of the CasManagement of a mode.
+
+        Parameters
+        ----------
+        cm : CasManagement
+        mode : str
+        """
+
+        if mode not in self.state['cas_management']:
+            return
+
+        cm_state = self.state['cas_management'][mode]
+        cm.used_keys = list(cm_state['used_keys'])
+        if hasattr(cm, 'set_consistency_tables'):
+            cm.set_consistency_tables(cm_state['consistency_tables'])
+        if hasattr(cm, 'set_corpus_tables') and 'corpus_tables' in cm_state:
+            cm.set_corpus_tables(cm_state['corpus_tables'])
+
+    def is_done(self, mode, project, document):
+        return document in self.state['done'].get((mode, project), set())
+
+    def document_done(self, cm, mode, project, document, before_save=None):
+        """
+        Mark a document as completed and save the checkpoint every 'interval' documents.
+
+        Parameters
+        ----------
+        cm : CasManagement
+        mode : str
+        project : str
+        document : str
+        before_save : callable, makes the outputs of the completed documents durable (flush and commit)
+        """
+
+        self.state['done'].setdefault((mode, project), set()).add(document)
+        self.pending = self.pending + 1
+
+        if self.interval and self.pending >= self.interval:
+            self.save(cm, mode, before_save)
+
+    def save(self, cm, mode, before_save=None):
+        """
+        Write the checkpoint (atomic replace of the former checkpoint).
+
+        Parameters
+        ----------
+        cm : CasManagement
+        mode : str
+        before_save : callable
+        """
+
+        if not self.interval:
+            return
+
+        if before_save is not None:
+            before_save()
+
+        self.state['cas_management'][mode] = {
+            'used_keys': list(getattr(cm, 'used_keys', [])),
+            'consistency_tables': cm.get_consistency_tables() if hasattr(cm, 'get_consistency_tables') else {},
+            'corpus_tables': cm.get_corpus_tables() if hasattr(cm, 'get_corpus_tables') else {}
+        }
+        self.state['random_state'] = random.getstate()
+        self.state['np_random_state'] = np.random.get_state()
+
+        path_tmp = self.path + '.tmp'
+        with open(path_tmp, 'wb') as checkpoint_file:
+            pickle.dump(self.state, checkpoint_file)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(path_tmp, self.path)
+
+        self.pending = 0
+        logging.info(msg='Checkpoint saved: ' + self.path)
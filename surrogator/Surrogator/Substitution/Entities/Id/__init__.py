@@ -4,6 +4,22 @@ import re
 import schwifty
 
 
+_IBAN_CANDIDATE = re.compile(r'^[A-Z]{2}\d{2}[A-Z0-9]{11,30}$')
+_BIC_CANDIDATE = re.compile(r'^[A-Z]{6}[A-Z0-9]{2}(?:[A-Z0-9]{3})?$')
+
+_UPPER_CHARS = string.ascii_uppercase + 'ÄÖÜ'
+_LOWER_CHARS = string.ascii_lowercase + 'äöüß'
+
+# maps every character to its class: U (upper case), L (lower case), D (digit), other characters are kept;
+# letters which are not in the table (e.g. é, ñ, ç) are classified by surrogate_pattern
+_CHAR_CLASS_TABLE = str.maketrans(
+    {**{c: 'U' for c in _UPPER_CHARS}, **{c: 'L' for c in _LOWER_CHARS}, **{c: 'D' for c in string.digits}}
+)
+
+_KEPT_ADDRESS_PARTS = ['klinik', 'klinikum', 'krankenhaus']
+_KEPT_URL_PARTS = ['www', 'http', 'https']
+
+
 def check_iban(id_iban):
     """
     Proof if given string is a valid IBAN
@@ -14,18 +30,19 @@ def check_iban(id_iban):
 
     Returns
     -------
-    string or 0
+    1 or 0
     """
 
     try:
         schwifty.IBAN(id_iban)
     except ValueError:
         return 0
+    return 1
 
 
 def check_bic(id_bic):
     """
-    Proof if given string is a valid IBAN
+    Proof if given string is a valid BIC
 
     Parameters
     ----------
@@ -33,125 +50,176 @@ def check_bic(id_bic):
 
     Returns
     -------
-    string or 0
+    1 or 0
     """
 
     try:
         schwifty.BIC(id_bic)
     except ValueError:
         return 0
+    return 1
 
 
-def surrogate_identifiers(identifier_strings):
+def classify_identifiers(identifier_strings):
     """
-    create surrogates of identifiers tagged PII items
+    Classify all given identifiers at once as 'IBAN', 'BIC' or 'ID'.
+    A cheap structural pre-filter is applied first, only candidates are validated by schwifty.
 
     Parameters
     ----------
-    identifier_strings : dict
+    identifier_strings : iterable of strings
 
     Returns
     -------
     dict
     """
 
-    random.seed(random.randint(0, 100))
-
-    id_strs = {}
+    id_classes = {}
     for id_str in identifier_strings:
+        if id_str in id_classes:
+            continue
 
-        if check_iban(id_str) != 0 and check_iban(id_str) is not None:
-            id_strs[id_str] = schwifty.IBAN.random(country_code="DE")
-        if check_bic(id_str) != 0 and check_bic(id_str) is not None:
-            id_strs[id_str] = schwifty.BIC.from_bank_code('DE', schwifty.IBAN.random(country_code="DE").bank_code)
+        compact = id_str.replace(' ', '')
+
+        if _IBAN_CANDIDATE.match(compact.upper()) and check_iban(compact.upper()):
+            id_classes[id_str] = 'IBAN'
+        # BICs are written in upper case, otherwise any word of 8 or 11 letters would be a candidate
+        elif _BIC_CANDIDATE.match(compact) and check_bic(compact):
+            id_classes[id_str] = 'BIC'
         else:
-            random_id = ''
-            for c in id_str:
-                if c.isupper():
-                    random_id = random_id + random.choice(string.ascii_uppercase)
-                elif c.islower():
-                    random_id = random_id + random.choice(string.ascii_lowercase)
-                elif c.isdigit():
-                    random_id = random_id + str(random.randint(0, 9))
-                else:
-                    random_id = random_id + c
-            id_strs[id_str] = random_id
+            id_classes[id_str] = 'ID'
 
-    return id_strs
+    return id_classes
 
 
-def surrogate_email(mail_strings, names, locations, location_organizations):
+def surrogate_pattern(id_str):
     """
-    create surrogates of PII items tagged as email
+    create a random surrogate keeping the pattern of upper case letters, lower case letters and digits,
+    all other characters are kept (letters of all alphabets are replaced by ascii letters)
 
     Parameters
     ----------
-    mail_strings : dict
-    names : dict
-    locations : dict
-    location_organizations : dict
+    id_str : str
+
+    Returns
+    -------
+    str
+    """
+
+    mask = ''.join([
+        m if m != c else 'U' if c.isupper() else 'L' if c.islower() else c
+        for m, c in zip(id_str.translate(_CHAR_CLASS_TABLE), id_str)
+    ])
+    pools = {
+        'U': iter(random.choices(string.ascii_uppercase, k=mask.count('U'))),
+        'L': iter(random.choices(string.ascii_lowercase, k=mask.count('L'))),
+        'D': iter(random.choices(string.digits, k=mask.count('D'))),
+    }
+
+    return ''.join([next(pools[m]) if m in pools else c for m, c in zip(mask, id_str)])
+
+
+def surrogate_identifiers(identifier_strings):
+    """
+    create surrogates of identifiers tagged PII items,
+    valid IBANs and BICs are replaced by random valid ones, all other identifiers pattern-preserving
+
+    Parameters
+    ----------
+    identifier_strings : iterable of strings
 
     Returns
     -------
     dict
     """
 
-    replaced_strings = {}
+    id_strs = {}
+    for id_str, id_class in classify_identifiers(identifier_strings).items():
+
+        if id_class == 'IBAN':
+            iban = schwifty.IBAN.random(country_code="DE")
+            id_strs[id_str] = iban.formatted if ' ' in id_str.strip() else str(iban)
+
+        elif id_class == 'BIC':
+            try:
+                id_strs[id_str] = str(
+                    schwifty.BIC.from_bank_code('DE', schwifty.IBAN.random(country_code="DE").bank_code)
+                )
+            except ValueError:
+                id_strs[id_str] = surrogate_pattern(id_str)
 
-    l_names = {}
-    l_cities = {}
-    l_location_organizations = {}
+        else:
+            id_strs[id_str] = surrogate_pattern(id_str)
 
-    for nam_str in names:
-        l_names[nam_str.lower()] = (names[nam_str]).lower()
+    return id_strs
 
-    for city_string in locations:
-        l_cities[city_string.lower()] = (locations[city_string]).lower()
 
-    for loc_str in location_organizations:
-        l_location_organizations[loc_str.lower()] = (location_organizations[loc_str]).lower()
+def _surrogate_address_parts(address_strings, names, locations, location_organizations, kept_parts):
+    """
+    create surrogates of all parts (split by non-word characters) of the given email addresses or urls,
+    except the last part (top level domain)
 
-    names.update(l_names)
-    locations.update(l_cities)
-    location_organizations.update(l_location_organizations)
+    Parameters
+    ----------
+    address_strings : dict
+    names : dict
+    locations : dict
+    location_organizations : dict
+    kept_parts : list of strings
+
+    Returns
+    -------
+    dict
+    """
+
+    lookups = []
+    for surrogates in [names, locations, location_organizations]:
+        lookup = dict(surrogates)
+        lookup.update({orig.lower(): str(surrogates[orig]).lower() for orig in surrogates})
+        lookups.append(lookup)
 
     spl_dict = {}
-    for mail_string in mail_strings:
-        spl = re.split(r'\W', mail_string)
-
-        for i, s in enumerate(spl):
-            if i != len(spl) - 1:
-                if s in names.keys():
-                    spl_dict[s] = names[s]
-                elif s in locations.keys():
-                    spl_dict[s] = locations[s]
-                elif s in location_organizations.keys():
-                    spl_dict[s] = location_organizations[s]
-                elif s in ['klinik', 'klinikum', 'krankenhaus']:
+    unknown_parts = []
+
+    for address_string in address_strings:
+        spl = re.split(r'\W', address_string)
+
+        for s in spl[:-1]:
+            if not s or s in spl_dict or s in kept_parts:
+                continue
+            for lookup in lookups:
+                if s in lookup:
+                    spl_dict[s] = lookup[s]
+                    break
+            else:
+                if s in _KEPT_ADDRESS_PARTS:
                     spl_dict[s] = s
                 else:
-                    if s is not spl_dict.keys():
-                        spl_dict[s] = ''.join(list(surrogate_identifiers([s]).values()))
+                    unknown_parts.append(s)
 
-    for mail_string in mail_strings:
-        mail_string_old = mail_string
-        for entry in spl_dict:
-            mail_string = mail_string.replace(entry, spl_dict[entry])
+    spl_dict.update(surrogate_identifiers(unknown_parts))
 
-        replaced_strings[mail_string_old] = mail_string.replace(' ', '')
+    if not spl_dict:
+        return {address_string: address_string.replace(' ', '') for address_string in address_strings}
 
-    return replaced_strings
+    # one alternation over all parts, the longest parts win over their prefixes
+    parts_pattern = re.compile('|'.join(re.escape(part) for part in sorted(spl_dict, key=len, reverse=True)))
 
+    return {
+        address_string: parts_pattern.sub(lambda m: spl_dict[m.group(0)], address_string).replace(' ', '')
+        for address_string in address_strings
+    }
 
-def surrogate_url(url_strings, names, locations, location_organizations):
+
+def surrogate_email(mail_strings, names, locations, location_organizations):
     """
-    create surrogates of PII items tagged as url
+    create surrogates of PII items tagged as email
 
     Parameters
     ----------
     mail_strings : dict
     names : dict
-    location : dict
+    locations : dict
     location_organizations : dict
 
     Returns
@@ -159,49 +227,35 @@ def surrogate_url(url_strings, names, locations, location_organizations):
     dict
     """
 
-    replaced_strings = {}
+    return _surrogate_address_parts(
+        address_strings=mail_strings,
+        names=names,
+        locations=locations,
+        location_organizations=location_organizations,
+        kept_parts=[]
+    )
 
-    l_names = {}
-    l_cities = {}
-    l_location_organizations = {}
 
-    for nam_str in names:
-        l_names[nam_str.lower()] = (names[nam_str]).lower()
-
-    for city_string in locations:
-        l_cities[city_string.lower()] = (locations[city_string]).lower()
+def surrogate_url(url_strings, names, locations, location_organizations):
+    """
+    create surrogates of PII items tagged as url
 
-    for loc_str in location_organizations:
-        l_location_organizations[loc_str.lower()] = (location_organizations[loc_str]).lower()
+    Parameters
+    ----------
+    url_strings : dict
+    names : dict
+    locations : dict
+    location_organizations : dict
 
-    names.update(l_names)
-    locations.update(l_cities)
-    location_organizations.update(l_location_organizations)
+    Returns
+    -------
+    dict
+    """
 
-    spl_dict = {}
-    for url_string in url_strings:
-        spl = re.split(r'\W', url_string)
-
-        for i, s in enumerate(spl):
-            if (i != len(spl) - 1):
-                if (s != 'www') and (s != 'http') and (s != 'https'):
-                    if s in names.keys():
-                        spl_dict[s] = names[s]
-                    elif s in locations.keys():
-                        spl_dict[s] = locations[s]
-                    elif s in location_organizations.keys():
-                        spl_dict[s] = location_organizations[s]
-                    elif s in ['klinik', 'klinikum', 'krankenhaus']:
-                        spl_dict[s] = s
-                    else:
-                        if s is not spl_dict.keys():
-                            spl_dict[s] = ''.join(list(surrogate_identifiers([s]).values()))
-
-    for url_string in url_strings:
-        url_string_old = url_string
-        for entry in spl_dict:
-            url_string = url_string.replace(entry, spl_dict[entry])
-
-        replaced_strings[url_string_old] = url_string.replace(' ', '')
-
-    return replaced_strings
+    return _surrogate_address_parts(
+        address_strings=url_strings,
+        names=names,
+        locations=locations,
+        location_organizations=location_organizations,
+        kept_parts=_KEPT_URL_PARTS
+    )
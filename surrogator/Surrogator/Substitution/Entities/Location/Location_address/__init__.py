@@ -8,6 +8,9 @@ from collections import defaultdict
 from anytree import Node, PreOrderIter
 from overpy import Overpass
 
+# highest admin_level of OSM, sample_child_relation does not search below it
+MAX_ADMIN_LEVEL = 11
+
 
 def safe_query(api: Overpass, query: str, *, max_retries=5, base_delay=2, verbose=True):
     """
@@ -852,7 +855,8 @@ def sample_child_relation(parent_id, child_admin_level, overpass_api):
     Supports both administrative boundaries and streets (admin_level=99).
     In scenarios where no relation is found for the specified administrative
     level within the area, the function dynamically increments the admin level
-    and continues the search until a valid result is retrieved.
+    and continues the search until a valid result is retrieved or MAX_ADMIN_LEVEL
+    is passed (a street is searched once).
 
     Parameters
     ----------
@@ -888,7 +892,7 @@ def sample_child_relation(parent_id, child_admin_level, overpass_api):
         """
     }
 
-    while True:
+    while child_admin_level == 99 or child_admin_level <= MAX_ADMIN_LEVEL:
         # Select appropriate query based on admin_level
         is_street = child_admin_level == 99
         query = queries['street'] if is_street else queries['admin']
@@ -907,6 +911,9 @@ def sample_child_relation(parent_id, child_admin_level, overpass_api):
                 sample = random.choice(result.relations)
                 return sample.tags.get('name'), sample.id
 
+            if is_street:
+                break
+
             # If no results, increment admin level and try again
             child_admin_level += 1
 
@@ -914,6 +921,8 @@ def sample_child_relation(parent_id, child_admin_level, overpass_api):
             logging.error(f"Error in sample_child_relation: {e}")
             return None, None
 
+    return None, None
+
 
 def regex_phone_number(phone_number):
     """
@@ -0,0 +1,222 @@
+import json
+import logging
+import os
+import sqlite3
+
+
+KEY_STORE_SUFFIX = '.db'
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS key_assignment (
+        project   TEXT NOT NULL,
+        document  TEXT NOT NULL,
+        kind      TEXT,
+        surrogate TEXT NOT NULL,
+        original  TEXT NOT NULL,
+        mode      TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_key_assignment_surrogate ON key_assignment (project, document, kind, surrogate);
+    CREATE INDEX IF NOT EXISTS idx_key_assignment_original ON key_assignment (original);
+    CREATE INDEX IF NOT EXISTS idx_key_assignment_by_surrogate ON key_assignment (surrogate, kind);
+    CREATE TABLE IF NOT EXISTS key_assignment_document (
+        project   TEXT NOT NULL,
+        document  TEXT NOT NULL,
+        mode      TEXT NOT NULL,
+        PRIMARY KEY (project, document, mode)
+    );
+"""
+
+_COLUMNS = ['project', 'document', 'kind', 'surrogate', 'original', 'mode']
+
+
+class KeyAssignmentStore:
+
+    """
+    Indexed store (SQLite) of the private key assignments (surrogate -> original) of surrogate runs.
+
+    Parameters
+    ----------
+    db_path : str
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+        self.connection.executescript(_SCHEMA)
+
+    def add_document(self, project, document, mode, key_ass):
+        """
+        Insert the key assignment of one document in one bulk statement, committed with commit().
+        The document is recorded also without surrogates (empty key assignment).
+
+        Parameters
+        ----------
+        project : str
+        document : str
+        mode : str
+        key_ass : dict, {kind: {surrogate: original}}
+        """
+
+        self.connection.execute(
+            'INSERT OR IGNORE INTO key_assignment_document (project, document, mode) VALUES (?, ?, ?)',
+            (project, document, mode)
+        )
+        self.connection.executemany(
+            'INSERT INTO key_assignment (project, document, kind, surrogate, original, mode) VALUES (?, ?, ?, ?, ?, ?)',
+            [
+                (project, document, kind, str(surrogate), str(original), mode)
+                for kind in key_ass
+                for surrogate, original in key_ass[kind].items()
+            ]
+        )
+
+    def delete_document(self, project, document, mode):
+        """
+        Delete the key assignment of one document, e.g. before it is processed again by a resumed run.
+
+        Parameters
+        ----------
+        project : str
+        document : str
+        mode : str
+        """
+
+        for table in ['key_assignment', 'key_assignment_document']:
+            self.connection.execute(
+                'DELETE FROM ' + table + ' WHERE project = ? AND document = ? AND mode = ?', (project, document, mode)
+            )
+
+    def commit(self):
+        self.connection.commit()
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def lookup(self, surrogate=None, original=None, project=None, document=None, kind=None):
+        """
+        Query key assignments, every given parameter restricts the result.
+
+        Parameters
+        ----------
+        surrogate : str
+        original : str
+        project : str
+        document : str
+        kind : str
+
+        Returns
+        -------
+        list of dicts
+        """
+
+        conditions = []
+        values = []
+        for column, value in [('project', project), ('document', document), ('kind', kind),
+                              ('surrogate', surrogate), ('original', original)]:
+            if value is not None:
+                conditions.append(column + ' = ?')
+                values.append(value)
+
+        query = 'SELECT ' + ', '.join(_COLUMNS) + ' FROM key_assignment'
+        if conditions:
+            query = query + ' WHERE ' + ' AND '.join(conditions)
+
+        return [dict(zip(_COLUMNS, row)) for row in self.connection.execute(query, values)]
+
+    def export_json(self, path_json, path_json_flat=None):
+        """
+        Export the store into the nested json format (and the flat json format) of the key assignment.
+
+        Parameters
+        ----------
+        path_json : str
+        path_json_flat : str
+        """
+
+        doc_random_keys = {}
+        flat_random_keys = {}
+
+        # documents without surrogates are exported with empty annotations
+        for (document,) in self.connection.execute('SELECT document FROM key_assignment_document ORDER BY rowid'):
+            doc_random_keys.setdefault(document, {'filename_orig': document, 'annotations': {}})
+
+        for project, document, kind, surrogate, original, mode in self.connection.execute(
+                'SELECT ' + ', '.join(_COLUMNS) + ' FROM key_assignment ORDER BY rowid'
+        ):
+            doc_random_keys.setdefault(document, {'filename_orig': document, 'annotations': {}})
+            doc_random_keys[document]['annotations'].setdefault(kind, {})[surrogate] = original
+            flat_random_keys[project + '-**-' + document + '-**-' + str(kind) + '-**-' + surrogate] = original
+
+        with open(file=path_json, mode='w', encoding='utf8') as outfile:
+            json.dump(doc_random_keys, outfile, indent=2, sort_keys=False, ensure_ascii=False)
+        logging.info(msg='Key assignment exported: ' + path_json)
+
+        if path_json_flat:
+            with open(file=path_json_flat, mode='w', encoding='utf8') as outfile_flat:
+                json.dump(flat_random_keys, outfile_flat, indent=2, sort_keys=False, ensure_ascii=False)
+            logging.info(msg='Key assignment exported: ' + path_json_flat)
+
+
+def get_key_assignment_path(dir_project_private, project_name, timestamp_key, mode, suffix=KEY_STORE_SUFFIX):
+    """
+    Path of the key assignment of a project, suffix '.db' for the store, '.json' or '_flat.json' for exports.
+
+    Returns
+    -------
+    str
+    """
+
+    return dir_project_private + os.sep + project_name + '_' + timestamp_key + '_key_assignment_' + mode + suffix
+
+
+def find_key_stores(path):
+    """
+    Find all key assignment stores in a path (a store itself or a directory searched recursively).
+
+    Parameters
+    ----------
+    path : str
+
+    Returns
+    -------
+    list of strings
+    """
+
+    if os.path.isfile(path):
+        return [path]
+
+    key_stores = []
+    for root, _, files in os.walk(path):
+        for file_name in sorted(files):
+            if '_key_assignment_' in file_name and file_name.endswith(KEY_STORE_SUFFIX):
+                key_stores.append(os.path.join(root, file_name))
+
+    return key_stores
+
+
+def lookup_key_assignments(path, surrogate=None, original=None, project=None, document=None, kind=None):
+    """
+    Re-identification lookup over all key assignment stores in a path.
+
+    Returns
+    -------
+    list of dicts
+    """
+
+    results = []
+    for key_store_path in find_key_stores(path):
+        with KeyAssignmentStore(key_store_path) as key_store:
+            for result in key_store.lookup(
+                    surrogate=surrogate, original=original, project=project, document=document, kind=kind
+            ):
+                result['key_store'] = key_store_path
+                results.append(result)
+
+    return results
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import sqlite3
+
+from Surrogator.FileUtils import get_output_option
+
+
+# keys of config['surrogate_process'] which change the surrogates of a document; options which only change
+# how a run is done (e.g. the fast path of x and entity) are left out, they do not invalidate the manifest
+OUTPUT_CONFIG_KEYS = ['date_surrogation', 'corpus']
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS manifest (
+        project       TEXT NOT NULL,
+        document      TEXT NOT NULL,
+        cas_hash      TEXT NOT NULL,
+        mode          TEXT NOT NULL,
+        config_hash   TEXT NOT NULL,
+        timestamp_key TEXT NOT NULL,
+        dir_out_text  TEXT NOT NULL,
+        dir_out_cas   TEXT NOT NULL,
+        file_name     TEXT NOT NULL,
+        key_store     TEXT,
+        PRIMARY KEY (project, document, mode, config_hash)
+    );
+    CREATE TABLE IF NOT EXISTS consistency_tables (
+        mode          TEXT NOT NULL,
+        config_hash   TEXT NOT NULL,
+        tables        TEXT NOT NULL,
+        PRIMARY KEY (mode, config_hash)
+    );
+"""
+
+
+def hash_config(config, mode):
+    """
+    Hash of the parts of a configuration which change the surrogates of a document (mode and surrogate process).
+
+    Parameters
+    ----------
+    config : dict
+    mode : str
+
+    Returns
+    -------
+    str
+    """
+
+    surrogate_process = {
+        key: value for key, value in config.get('surrogate_process', {}).items()
+        if key in OUTPUT_CONFIG_KEYS
+    }
+    return hashlib.sha256(
+        json.dumps({'mode': mode, 'surrogate_process': surrogate_process}, sort_keys=True, default=str).encode('utf-8')
+    ).hexdigest()
+
+
+def get_manifest_path(config, out_directory_private):
+    """
+    Path of the manifest: config['output']['manifest'] or 'manifest.db' in the private output directory.
+
+    Parameters
+    ----------
+    config : dict
+    out_directory_private : str, private directory of the run ('private/private-timestamp_key')
+
+    Returns
+    -------
+    str
+    """
+
+    if get_output_option(config, 'manifest'):
+        return get_output_option(config, 'manifest')
+    return os.path.dirname(out_directory_private) + os.sep + 'manifest.db'
+
+
+class RunManifest:
+
+    """
+    Manifest of incremental runs: (project, document, cas content hash, mode, config hash) -> output location,
+    additionally the consistency tables of the fictive mode.
+
+    Parameters
+    ----------
+    db_path : str
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+        self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def is_unchanged(self, project, document, cas_hash, mode, config_hash):
+        """
+        Check if a document was already processed with the same curated cas, mode and configuration.
+
+        Returns
+        -------
+        bool
+        """
+
+        row = self.connection.execute(
+            'SELECT cas_hash FROM manifest WHERE project = ? AND document = ? AND mode = ? AND config_hash = ?',
+            (project, document, mode, config_hash)
+        ).fetchone()
+        return row is not None and row[0] == cas_hash
+
+    def get_location(self, project, document, mode, config_hash):
+        """
+        Output location of a processed document.
+
+        Returns
+        -------
+        dict or None
+        """
+
+        columns = ['cas_hash', 'timestamp_key', 'dir_out_text', 'dir_out_cas', 'file_name', 'key_store']
+        row = self.connection.execute(
+            'SELECT ' + ', '.join(columns) + ' FROM manifest'
+            ' WHERE project = ? AND document = ? AND mode = ? AND config_hash = ?',
+            (project, document, mode, config_hash)
+        ).fetchone()
+        return dict(zip(columns, row)) if row is not None else None
+
+    def record(self, project, document, cas_hash, mode, config_hash, timestamp_key,
+               dir_out_text, dir_out_cas, file_name, key_store=None):
+        """
+        Record the output location of a processed document, committed with commit().
+        """
+
+        self.connection.execute(
+            'INSERT OR REPLACE INTO manifest'
+            ' (project, document, cas_hash, mode, config_hash, timestamp_key, dir_out_text, dir_out_cas, file_name,'
+            ' key_store) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (project, document, cas_hash, mode, config_hash, timestamp_key,
+             dir_out_text, dir_out_cas, file_name, key_store)
+        )
+
+    def commit(self):
+        self.connection.commit()
+
+    def load_consistency_tables(self, mode, config_hash):
+        """
+        Returns
+        -------
+        dict
+        """
+
+        row = self.connection.execute(
+            'SELECT tables FROM consistency_tables WHERE mode = ? AND config_hash = ?', (mode, config_hash)
+        ).fetchone()
+        return json.loads(row[0]) if row is not None else {}
+
+    def save_consistency_tables(self, mode, config_hash, tables):
+        self.connection.execute(
+            'INSERT OR REPLACE INTO consistency_tables (mode, config_hash, tables) VALUES (?, ?, ?)',
+            (mode, config_hash, json.dumps(tables, ensure_ascii=False))
+        )
+        self.connection.commit()
@@ -1,4 +1,4 @@
-import json
+import hashlib
 import logging
 import os
 from copy import deepcopy
@@ -7,20 +7,245 @@ import cassis
 import pandas as pd
 from cassis import load_cas_from_json
 
-from Surrogator.FileUtils import export_cas_to_file, read_dir, handle_config
-from Surrogator.QualityControl import run_quality_control_of_project, write_quality_control_report
-from Surrogator.Substitution.CasManagement.Fictive import CasManagementFictive
+from Surrogator.FileUtils import read_dir, handle_config, get_output_option, create_cas_exporter
+from Surrogator.QualityControl import (
+    QualityControlTables, create_quality_control_dir, get_quality_control_table_paths, run_quality_control_of_project,
+    run_quality_control_of_projects, write_quality_control_report
+)
+from Surrogator.Substitution.CasManagement.Fictive import CasManagementFictive, CONSISTENCY_TABLES
 from Surrogator.Substitution.CasManagement.Gemtex import CasManagementGemtex
 from Surrogator.Substitution.CasManagement.Simple import CasManagementSimple
+from Surrogator.Substitution.KeyStore import KeyAssignmentStore, get_key_assignment_path
+from Surrogator.Substitution.Manifest import RunManifest, get_manifest_path, hash_config
+from Surrogator.Substitution.Checkpoint import RunCheckpoint
+from Surrogator.Substitution.SurrogateCache import SurrogateCache, FernetCipher, SURROGATE_CACHE_KEY_ENVIRONMENT
+from Surrogator.Profiling import write_profile
 
 
-def set_surrogates_in_inception_projects(config):
+def close_key_assignment(key_store, config, dir_project_private, project_name, timestamp_key, mode):
+    """
+    Commit and close the key assignment store of a project,
+    export it additionally as (nested and flat) json files if configured by config['output']['key_assignment_json'].
+
+    Parameters
+    ----------
+    key_store : KeyAssignmentStore
+    config : dict
+    dir_project_private : str
+    project_name : str
+    timestamp_key : str
+    mode : str
+    """
+
+    key_store.commit()
+    logging.info(msg='Key assignment stored: ' + key_store.db_path)
+
+    if get_output_option(config, 'key_assignment_json', False):
+        key_store.export_json(
+            path_json=get_key_assignment_path(dir_project_private, project_name, timestamp_key, mode, '.json'),
+            path_json_flat=get_key_assignment_path(dir_project_private, project_name, timestamp_key, mode, '_flat.json')
+        )
+
+    key_store.close()
+
+
+def create_cas_management(mode, config):
+    """
+    CasManagement of a surrogate mode.
+
+    Parameters
+    ----------
+    mode : str
+    config : dict
+
+    Returns
+    -------
+    CasManagement
+    """
+
+    if mode in ['x', 'entity']:
+        return CasManagementSimple(mode=mode)
+    if mode == 'gemtex':
+        return CasManagementGemtex()
+    if mode == 'fictive':
+        return CasManagementFictive(config=config)
+    raise ValueError('No valid modus, only x, entity, gemtex and fictive allowed: ' + str(mode))
+
+
+def create_checkpoint(config, dir_out_private):
+    """
+    Create the checkpoint of a run, configured by config['output']['checkpoint_interval'] (documents, 0: off),
+    load the checkpoint of an interrupted run if config['output']['resume'] is set.
+
+    Parameters
+    ----------
+    config : dict
+    dir_out_private : str
+
+    Returns
+    -------
+    RunCheckpoint
+    """
+
+    checkpoint = RunCheckpoint(
+        dir_out_private=dir_out_private,
+        interval=get_output_option(config, 'checkpoint_interval', 0)
+    )
+
+    if get_output_option(config, 'resume'):
+        if get_output_option(config, 'archive'):
+            raise ValueError('Resume is only possible for runs without archive output.')
+        if not checkpoint.interval:
+            checkpoint.interval = 1
+        checkpoint.load()
+
+    return checkpoint
+
+
+def _iterate_projects(projects, read_projects):
+    """
+    Iterate the projects, the first time from projects (list or iterable), further times from read_projects.
+    """
+
+    if read_projects:
+        yield from read_projects
+        return
+    for project in projects:
+        read_projects.append(project)
+        yield project
+
+
+def create_surrogate_cache(config):
+    """
+    Create the persistent surrogate cache of mode fictive if configured by config['output']['surrogate_cache']
+    (path), with the options surrogate_cache_salt, surrogate_cache_max_entries and surrogate_cache_max_age_days.
+    The cache is encrypted with the Fernet key of the environment variable SURROGATOR_CACHE_KEY if set.
+
+    Parameters
+    ----------
+    config : dict
+
+    Returns
+    -------
+    SurrogateCache or None
+    """
+
+    if not get_output_option(config, 'surrogate_cache'):
+        return None
+
+    cipher = None
+    if os.environ.get(SURROGATE_CACHE_KEY_ENVIRONMENT):
+        cipher = FernetCipher(os.environ[SURROGATE_CACHE_KEY_ENVIRONMENT])
+
+    surrogate_cache = SurrogateCache(
+        db_path=get_output_option(config, 'surrogate_cache'),
+        salt=get_output_option(config, 'surrogate_cache_salt', '') or '',
+        cipher=cipher,
+        max_entries=get_output_option(config, 'surrogate_cache_max_entries'),
+        max_age_days=get_output_option(config, 'surrogate_cache_max_age_days')
+    )
+    logging.info(msg='Surrogate cache: ' + surrogate_cache.db_path + (' (encrypted)' if cipher else ''))
+
+    return surrogate_cache
+
+
+def _set_surrogates_fast(config, dir_out_private, dir_out_public, surrogate_modes, timestamp_key,
+                         progress_callback=None):
+    """
+    Fast path of set_surrogates_in_inception_projects for the modes x and entity: the cas json files are
+    processed without cas objects (CasManagementSimple.manipulate_cas_json). As in the cassis path only the
+    documents of the corpus (quality control) are processed: documents with annotations of kind OTHER or NONE
+    and documents which are not readable are left out. The quality control report is written as by the
+    cassis path, the documents are parsed for it by config['quality_control']['workers'] processes.
+
+    Returns
+    -------
+    dict or 0
+    """
+
+    if not config['input']['annotation_project_path'] or not os.path.exists(config['input']['annotation_project_path']):
+        return 0
+    projects = read_dir(dir_path=config['input']['annotation_project_path'], load_cas=False)
+    if not projects:
+        return 0
+
+    def open_tables(project):
+        return QualityControlTables(
+            create_quality_control_dir(dir_out_private, project['name'], timestamp_key), project['name']
+        )
+
+    quality_control_of_projects = {}
+    for project, quality_control in run_quality_control_of_projects(
+            projects=projects, workers=config.get('quality_control', {}).get('workers', 1), open_tables=open_tables
+    ):
+        project_name = project['name']
+        dir_project_quality_control = create_quality_control_dir(dir_out_private, project_name, timestamp_key)
+
+        quality_control_of_projects[project_name] = quality_control
+        write_quality_control_report(
+            quality_control=quality_control,
+            dir_project_quality_control=dir_project_quality_control,
+            project_name=project_name,
+            timestamp_key=timestamp_key,
+            paths=get_quality_control_table_paths(dir_project_quality_control, project_name)
+        )
+
+    for mode in surrogate_modes:
+        cm = CasManagementSimple(mode=mode)
+
+        for project in projects:
+            project_name = project['name']
+            logging.info(msg='Project (name): ' + project_name + ', mode: ' + mode + ' (fast path)')
+
+            dir_project_private = dir_out_private + os.sep + project_name
+            os.makedirs(name=dir_project_private, exist_ok=True)
+
+            cas_exporter = create_cas_exporter(
+                config=config,
+                dir_out_text=dir_out_public + os.sep + 'surrogate' + '_' + project_name + '_' + timestamp_key,
+                dir_out_cas=dir_project_private + os.sep + 'cas' + '_' + project_name + '_' + timestamp_key
+            )
+
+            corpus_files = quality_control_of_projects[project_name]['corpus_files']
+            documents = [ann_doc for ann_doc, part_of_corpus in corpus_files.items() if part_of_corpus == 1]
+            for i, ann_doc in enumerate(documents):
+                if progress_callback is not None:
+                    progress_callback(mode, project_name, i, len(documents))
+
+                pipeline_results = cm.manipulate_cas_json(project['annotations'][ann_doc])
+                if not pipeline_results:
+                    logging.warning(msg='file not part of the corpus (annotations OTHER or NONE): ' + str(ann_doc))
+                    continue
+
+                cas_exporter.export(cas=pipeline_results['cas'], file_name=ann_doc + '_deid_' + timestamp_key)
+
+            cas_exporter.close()
+
+            if progress_callback is not None:
+                progress_callback(mode, project_name, len(documents), len(documents))
+
+    logging.info(msg='Processing of given projects done! Timestamp key from this run: ' + timestamp_key)
+
+    return {
+        "dir_out_private": dir_out_private,
+        "dir_out_public": dir_out_public,
+        "projects": [project['name'] for project in projects],
+        "timestamp_key": timestamp_key,
+        "quality_control_of_projects": quality_control_of_projects
+    }
+
+
+def set_surrogates_in_inception_projects(config, cas_managements=None, progress_callback=None, projects=None):
     """
     This function starts the process to transform text with different configurations of the placeholders.
 
     Parameters
     ----------
     config : dict
+    cas_managements : dict, {mode: CasManagement} already created (e.g. with cached models), optional
+    progress_callback : callable, called with (mode, project name, processed documents, documents), optional
+    projects : list or iterable of projects (read_dir), e.g. yielded as soon as their export is downloaded,
+        default: read from config['input']['annotation_project_path']
 
     Returns
     -------
@@ -32,118 +257,218 @@ def set_surrogates_in_inception_projects(config):
 
     dir_out_private, dir_out_public, surrogate_modes, timestamp_key = handle_config(config)
 
-    if config['input']['annotation_project_path'] != "":
-        if os.path.exists(config['input']['annotation_project_path']):
-            projects = read_dir(dir_path=config['input']['annotation_project_path'])
+    # fast path without cas objects for the modes x and entity (no incremental runs and checkpoints)
+    if (config['surrogate_process'].get('fast', False) and projects is None
+            and set(surrogate_modes) <= {'x', 'entity'}
+            and not get_output_option(config, 'incremental', False) and not get_output_option(config, 'resume')):
+        return _set_surrogates_fast(config, dir_out_private, dir_out_public, surrogate_modes, timestamp_key,
+                                    progress_callback=progress_callback)
+
+    if projects is None:
+        if config['input']['annotation_project_path'] != "":
+            if os.path.exists(config['input']['annotation_project_path']):
+                projects = read_dir(dir_path=config['input']['annotation_project_path'])
+            else:
+                return 0
         else:
             return 0
-    else:
-        return 0
 
-    if not projects:
-        return 0
+        if not projects:
+            return 0
 
     logging.info(msg='setting private directory ' + dir_out_private)
     logging.info(msg='setting public directory ' + dir_out_public)
 
     quality_control_of_projects = {}
 
+    manifest = None
+    if get_output_option(config, 'incremental', False):
+        manifest = RunManifest(get_manifest_path(config, dir_out_private))
+        logging.info(msg='Incremental run, manifest: ' + manifest.db_path)
+
+    checkpoint = create_checkpoint(config, dir_out_private)
+    resume = bool(get_output_option(config, 'resume'))
+    surrogate_cache = create_surrogate_cache(config)
+    corpus_mode = config['surrogate_process'].get('corpus', False)
+
+    read_projects = []
+
     for mode in surrogate_modes:
-        if mode in ['x', 'entity']:
-            cm = CasManagementSimple(mode=mode)
-        elif mode == 'gemtex':
-            cm = CasManagementGemtex()
-        elif mode == 'fictive':
-            cm = CasManagementFictive(config=config)
+        if cas_managements and mode in cas_managements:
+            cm = cas_managements[mode]
         else:
-            logging.warning("No valid modus, only x, entity, gemtex and fictive allowed.")
-            exit()
-
-        for project in projects:
+            try:
+                cm = create_cas_management(mode, config)
+            except ValueError as e:
+                logging.warning(msg=str(e))
+                exit()
+
+        config_hash = hash_config(config, mode)
+        if manifest is not None and mode == 'fictive':
+            cm.set_consistency_tables(manifest.load_consistency_tables(mode, config_hash))
+        if surrogate_cache is not None and mode == 'fictive':
+            cm.set_consistency_tables(surrogate_cache.load(CONSISTENCY_TABLES))
+        checkpoint.restore(cm, mode)
+
+        for project in _iterate_projects(projects, read_projects):
             logging.info(msg='Project (file): ' + str(project['name']))
             project_name = project['name']
+            # the manifest keys the project by its slug, a new export of the project has a new file name
+            project_slug = project['slug']
 
             logging.info(msg='Project (name): ' + project_name)
 
-            quality_control = run_quality_control_of_project(project)
+            dir_project_quality_control = create_quality_control_dir(dir_out_private, project_name, timestamp_key)
+            with QualityControlTables(dir_project_quality_control, project_name) as quality_control_tables:
+                quality_control = run_quality_control_of_project(project, tables=quality_control_tables)
             corpus_documents = pd.DataFrame(quality_control['corpus_files'], index=['part_of_corpus']).transpose()
 
             project_surrogate = dir_out_public + os.sep + 'surrogate' + '_' + project_name + '_' + timestamp_key
-            if not os.path.exists(path=project_surrogate):
-                os.makedirs(name=project_surrogate)
 
             dir_project_private = dir_out_private + os.sep + project_name
             if not os.path.exists(path=dir_project_private):
                 os.makedirs(name=dir_project_private)
 
             dir_project_cas = dir_project_private + os.sep + 'cas' + '_' + project_name + '_' + timestamp_key
-            if not os.path.exists(path=dir_project_cas):
-                os.makedirs(name=dir_project_cas)
 
-            doc_random_keys = {}
+            cas_exporter = create_cas_exporter(
+                config=config,
+                dir_out_text=project_surrogate,
+                dir_out_cas=dir_project_cas
+            )
+
+            if mode in ['fictive', 'gemtex']:
+                key_store = KeyAssignmentStore(
+                    get_key_assignment_path(dir_project_private, project_name, timestamp_key, mode)
+                )
 
             logging.info('mode: ' + str(mode))
 
-            for i, ann_doc in enumerate(corpus_documents[corpus_documents['part_of_corpus'] == 1].index):
+            if hasattr(cm, 'profiler'):
+                cm.profiler.reset()
 
-                logging.info(msg='processing file: ' + str(ann_doc))
-                m_cas = deepcopy(project['annotations'][ann_doc])
+            def make_outputs_durable():
+                cas_exporter.flush()
+                if mode in ['fictive', 'gemtex']:
+                    key_store.commit()
+                if manifest is not None:
+                    manifest.commit()
+                if surrogate_cache is not None and mode == 'fictive':
+                    surrogate_cache.update(cm.get_consistency_tables(), used=cm.pop_used_consistency_entries())
+                    surrogate_cache.commit()
+
+            documents = corpus_documents[corpus_documents['part_of_corpus'] == 1].index
+
+            # corpus mode: unique PHI of all documents resolved once, documents rewritten one at a time
+            corpus_not_processable = None
+            if corpus_mode and hasattr(cm, 'resolve_corpus'):
+                pending_documents = [
+                    ann_doc for ann_doc in documents
+                    if not checkpoint.is_done(mode, project_name, ann_doc) and not (
+                        manifest is not None and manifest.is_unchanged(
+                            project_slug, ann_doc, project['annotation_hashes'][ann_doc], mode, config_hash
+                        )
+                    )
+                ]
+                logging.info(msg='Corpus mode, documents: ' + str(len(pending_documents)))
+                # the documents are only read here, each one is copied right before it is rewritten
+                corpus_not_processable = cm.resolve_corpus(
+                    cas_documents={ann_doc: project['annotations'][ann_doc] for ann_doc in pending_documents}
+                )
 
-                pipeline_results = cm.manipulate_cas(cas=m_cas)
+            for i, ann_doc in enumerate(documents):
+
+                if progress_callback is not None:
+                    progress_callback(mode, project_name, i, len(documents))
+
+                if checkpoint.is_done(mode, project_name, ann_doc):
+                    logging.info(msg='file done before checkpoint, skipped: ' + str(ann_doc))
+                    continue
+
+                cas_hash = project['annotation_hashes'][ann_doc]
+                if manifest is not None and manifest.is_unchanged(project_slug, ann_doc, cas_hash, mode, config_hash):
+                    logging.info(msg='unchanged file, skipped: ' + str(ann_doc))
+                    continue
+
+                logging.info(msg='processing file: ' + str(ann_doc))
+                if corpus_not_processable is not None and ann_doc in corpus_not_processable:
+                    pipeline_results = {}
+                elif corpus_not_processable is not None:
+                    m_cas = deepcopy(project['annotations'][ann_doc])
+                    pipeline_results = cm.substitute_corpus_document(ann_doc, m_cas)
+                else:
+                    m_cas = deepcopy(project['annotations'][ann_doc])
+                    pipeline_results = cm.manipulate_cas(cas=m_cas)
 
                 if mode in ['fictive', 'gemtex']:
-                    doc_random_keys[ann_doc] = {
-                        'filename_orig': str(ann_doc),
-                        'annotations': pipeline_results['key_ass'],
-                    }
+                    if resume:
+                        key_store.delete_document(project_name, str(ann_doc), mode)
+                    key_store.add_document(project_name, str(ann_doc), mode, pipeline_results['key_ass'])
 
-                export_cas_to_file(
-                    # cas=m_cas,
+                cas_exporter.export(
                     cas=pipeline_results['cas'],
-                    dir_out_text=project_surrogate,
-                    dir_out_cas=dir_project_cas,
                     file_name=ann_doc + '_deid_' + timestamp_key,
                 )
 
+                if manifest is not None:
+                    manifest.record(
+                        project=project_slug,
+                        document=ann_doc,
+                        cas_hash=cas_hash,
+                        mode=mode,
+                        config_hash=config_hash,
+                        timestamp_key=timestamp_key,
+                        dir_out_text=project_surrogate,
+                        dir_out_cas=dir_project_cas,
+                        file_name=ann_doc + '_deid_' + timestamp_key,
+                        key_store=key_store.db_path if mode in ['fictive', 'gemtex'] else None
+                    )
+
+                checkpoint.document_done(cm, mode, project_name, ann_doc, before_save=make_outputs_durable)
+
+            make_outputs_durable()
+            checkpoint.save(cm, mode)
+            cas_exporter.close()
+
+            if progress_callback is not None:
+                progress_callback(mode, project_name, len(documents), len(documents))
+
             # project relevant output
             if mode in ['gemtex', 'fictive']:
-                with open(
-                        file=dir_project_private + os.sep + project_name + '_' + timestamp_key + '_key_assignment_' + mode + '.json',
-                        mode='w',
-                        encoding='utf8'
-                ) as outfile:
-                    json.dump(doc_random_keys, outfile, indent=2, sort_keys=False, ensure_ascii=False)
-
-                flat_random_keys = {}
-
-                # for filename in random_filenames:
-                for filename in corpus_documents[corpus_documents['part_of_corpus'] == 1].index:
-                    for annotations in doc_random_keys[filename]['annotations']:
-                        for key in doc_random_keys[filename]['annotations'][annotations]:
-                            flat_random_keys[
-                                project_name + '-**-' + filename + '-**-' + str(annotations) + '-**-' + key] = \
-                                doc_random_keys[filename]['annotations'][annotations][key]
-
-                with open(
-                        file=dir_project_private + os.sep + project_name + '_' + timestamp_key + '_key_assignment_' + mode + '_flat.json',
-                        mode='w',
-                        encoding='utf8'
-                ) as outfile_flat:
-                    json.dump(flat_random_keys, outfile_flat, indent=2, sort_keys=False, ensure_ascii=False)
-
-            dir_project_quality_control = dir_project_private + os.sep + 'quality_control' + '_' + project_name + '_' + timestamp_key
-            if not os.path.exists(path=dir_project_quality_control):
-                os.makedirs(name=dir_project_quality_control)
+                close_key_assignment(key_store, config, dir_project_private, project_name, timestamp_key, mode)
 
             quality_control_of_projects[project_name] = quality_control
             write_quality_control_report(
-                quality_control=run_quality_control_of_project(project),
+                quality_control=quality_control,
                 dir_project_quality_control=dir_project_quality_control,
                 project_name=project_name,
-                timestamp_key=timestamp_key
+                timestamp_key=timestamp_key,
+                paths=quality_control_tables.paths
             )
 
+            if hasattr(cm, 'profiler'):
+                write_profile(
+                    profile=cm.profiler.get_profile(),
+                    dir_project_quality_control=dir_project_quality_control,
+                    project_name=project_name,
+                    timestamp_key=timestamp_key,
+                    mode=mode,
+                    prometheus=get_output_option(config, 'profile_prometheus', False)
+                )
+
             logging.info(msg='Processing of project ' + project_name + ' done!')
+
+        if manifest is not None and mode == 'fictive':
+            manifest.save_consistency_tables(mode, config_hash, cm.get_consistency_tables())
+
+    if manifest is not None:
+        manifest.close()
+    if surrogate_cache is not None:
+        surrogate_cache.close()
+
+    if not read_projects:
+        return 0
+
     logging.info(msg='Processing of given projects done! Timestamp key from this run: ' + timestamp_key)
     logging.info(msg='Private exports: ' + dir_out_private)
     logging.info(msg='Public exports: ' + dir_out_public)
@@ -151,7 +476,7 @@ def set_surrogates_in_inception_projects(config):
     return {
         "dir_out_private": dir_out_private,
         "dir_out_public": dir_out_public,
-        "projects": [project['name'] for project in projects],
+        "projects": [project['name'] for project in read_projects],
         "timestamp_key": timestamp_key,
         "quality_control_of_projects": quality_control_of_projects
     }
@@ -187,36 +512,74 @@ def set_surrogates_in_inception_files(config):
     #corpus_documents = pd.DataFrame(quality_control['corpus_files'], index=['part_of_corpus']).transpose()
 
     project_surrogate = dir_out_public + os.sep + 'surrogate' + '_' + project_name + '_' + timestamp_key
-    if not os.path.exists(path=project_surrogate):
-        os.makedirs(name=project_surrogate)
 
     dir_project_private = dir_out_private + os.sep + project_name
     if not os.path.exists(path=dir_project_private):
         os.makedirs(name=dir_project_private)
 
     dir_project_cas = dir_project_private + os.sep + 'cas' + '_' + project_name + '_' + timestamp_key
-    if not os.path.exists(path=dir_project_cas):
-        os.makedirs(name=dir_project_cas)
+
+    manifest = None
+    if get_output_option(config, 'incremental', False):
+        manifest = RunManifest(get_manifest_path(config, dir_out_private))
+        logging.info(msg='Incremental run, manifest: ' + manifest.db_path)
+
+    checkpoint = create_checkpoint(config, dir_out_private)
+    resume = bool(get_output_option(config, 'resume'))
+    surrogate_cache = create_surrogate_cache(config)
 
     for mode in surrogate_modes: ## eigentlich nur 1 Modus!!
 
-        if mode in ['x', 'entity']:
-            cm = CasManagementSimple(mode=mode)
-        elif mode == 'gemtex':
-            cm = CasManagementGemtex()
-        elif mode == 'fictive':
-            cm = CasManagementFictive(config)
-        else:
-            logging.warning("No valid modus, only x, entity, gemtex and fictive allowed.")
+        try:
+            cm = create_cas_management(mode, config)
+        except ValueError as e:
+            logging.warning(msg=str(e))
             exit()
 
-        doc_random_keys = {}
+        config_hash = hash_config(config, mode)
+        if manifest is not None and mode == 'fictive':
+            cm.set_consistency_tables(manifest.load_consistency_tables(mode, config_hash))
+        if surrogate_cache is not None and mode == 'fictive':
+            cm.set_consistency_tables(surrogate_cache.load(CONSISTENCY_TABLES))
+        checkpoint.restore(cm, mode)
+
+        if mode in ['fictive', 'gemtex']:
+            key_store = KeyAssignmentStore(
+                get_key_assignment_path(dir_project_private, project_name, timestamp_key, mode)
+            )
 
-        for ann_doc in os.listdir(path_files_to_process):
+        cas_exporter = create_cas_exporter(
+            config=config,
+            dir_out_text=project_surrogate,
+            dir_out_cas=dir_project_cas
+        )
+
+        def make_outputs_durable():
+            cas_exporter.flush()
+            if mode in ['fictive', 'gemtex']:
+                key_store.commit()
+            if manifest is not None:
+                manifest.commit()
+            if surrogate_cache is not None and mode == 'fictive':
+                surrogate_cache.update(cm.get_consistency_tables(), used=cm.pop_used_consistency_entries())
+                surrogate_cache.commit()
+
+        for ann_doc in sorted(os.listdir(path_files_to_process)):
             if ann_doc.endswith('json'):# or cas_file.endswith('xmi'):
 
+                if checkpoint.is_done(mode, project_name, ann_doc):
+                    logging.info(msg='file done before checkpoint, skipped: ' + path_files_to_process + os.sep + ann_doc)
+                    continue
+
                 with open(path_files_to_process + os.sep + ann_doc, 'rb') as cas_file_stream:
-                    cas = cassis.load_cas_from_json(cas_file_stream)
+                    cas_content = cas_file_stream.read()
+
+                cas_hash = hashlib.sha256(cas_content).hexdigest()
+                if manifest is not None and manifest.is_unchanged(project_name, ann_doc, cas_hash, mode, config_hash):
+                    logging.info(msg='unchanged file, skipped: ' + path_files_to_process + os.sep + ann_doc)
+                    continue
+
+                cas = cassis.load_cas_from_json(cas_content.decode('utf-8'))
 
                 logging.info(msg='processing file: ' + path_files_to_process + os.sep + ann_doc)
                 m_cas = deepcopy(cas)
@@ -226,44 +589,55 @@ def set_surrogates_in_inception_files(config):
                 logging.info('mode: ' + str(mode))
 
                 if mode in ['fictive', 'gemtex']:
-                    doc_random_keys[ann_doc] = {
-                        'filename_orig': str(ann_doc),
-                        'annotations': pipeline_results['key_ass'],
-                    }
+                    if resume:
+                        key_store.delete_document(project_name, str(ann_doc), mode)
+                    key_store.add_document(project_name, str(ann_doc), mode, pipeline_results['key_ass'])
 
-                export_cas_to_file(
-                    # cas=m_cas,
+                cas_exporter.export(
                     cas=pipeline_results['cas'],
-                    dir_out_text=project_surrogate,
-                    dir_out_cas=dir_project_cas,
                     file_name=ann_doc + '_deid_' + timestamp_key,
                 )
 
+                if manifest is not None:
+                    manifest.record(
+                        project=project_name,
+                        document=ann_doc,
+                        cas_hash=cas_hash,
+                        mode=mode,
+                        config_hash=config_hash,
+                        timestamp_key=timestamp_key,
+                        dir_out_text=project_surrogate,
+                        dir_out_cas=dir_project_cas,
+                        file_name=ann_doc + '_deid_' + timestamp_key,
+                        key_store=key_store.db_path if mode in ['fictive', 'gemtex'] else None
+                    )
+
+                checkpoint.document_done(cm, mode, project_name, ann_doc, before_save=make_outputs_durable)
+
+        make_outputs_durable()
+        checkpoint.save(cm, mode)
+        cas_exporter.close()
+
         # project relevant output
         if mode in ['gemtex', 'fictive']:
-            with open(
-                    file=dir_project_private + os.sep + project_name + '_' + timestamp_key + '_key_assignment_' + mode + '.json',
-                    mode='w',
-                    encoding='utf8'
-            ) as outfile:
-                json.dump(doc_random_keys, outfile, indent=2, sort_keys=False, ensure_ascii=False)
-
-
-            flat_random_keys = {}
-
-            # for filename in random_filenames:
-            #for filename in corpus_documents[corpus_documents['part_of_corpus'] == 1].index:
-            for filename in os.listdir(path_files_to_process):
-                if filename.endswith('json'):
-                    for annotations in doc_random_keys[filename]['annotations']:
-                        for key in doc_random_keys[filename]['annotations'][annotations]:
-                            flat_random_keys[
-                                project_name + '-**-' + filename + '-**-' + str(annotations) + '-**-' + key] = \
-                                doc_random_keys[filename]['annotations'][annotations][key]
-
-            with open(
-                    file=dir_project_private + os.sep + project_name + '_' + timestamp_key + '_key_assignment_' + mode + '_flat.json',
-                    mode='w',
-                    encoding='utf8'
-            ) as outfile_flat:
-                json.dump(flat_random_keys, outfile_flat, indent=2, sort_keys=False, ensure_ascii=False)
\ No newline at end of file
+            close_key_assignment(key_store, config, dir_project_private, project_name, timestamp_key, mode)
+
+        if hasattr(cm, 'profiler'):
+            write_profile(
+                profile=cm.profiler.get_profile(),
+                dir_project_quality_control=dir_project_private,
+                project_name=project_name,
+                timestamp_key=timestamp_key,
+                mode=mode,
+                prometheus=get_output_option(config, 'profile_prometheus', False)
+            )
+
+        if manifest is not None:
+            if mode == 'fictive':
+                manifest.save_consistency_tables(mode, config_hash, cm.get_consistency_tables())
+            manifest.commit()
+
+    if manifest is not None:
+        manifest.close()
+    if surrogate_cache is not None:
+        surrogate_cache.close()
@@ -0,0 +1,221 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+
+
+SURROGATE_CACHE_KEY_ENVIRONMENT = 'SURROGATOR_CACHE_KEY'
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS surrogate (
+        salt       TEXT NOT NULL,
+        tab        TEXT NOT NULL,
+        key        TEXT NOT NULL,
+        value      BLOB NOT NULL,
+        written    REAL NOT NULL,
+        PRIMARY KEY (salt, tab, key)
+    );
+    CREATE INDEX IF NOT EXISTS idx_surrogate_written ON surrogate (salt, written);
+"""
+
+
+def normalize_original(original):
+    """
+    Normalized original of a surrogate: whitespace collapsed.
+
+    Parameters
+    ----------
+    original : str
+
+    Returns
+    -------
+    str
+    """
+
+    return ' '.join(str(original).split())
+
+
+class FernetCipher:
+
+    """
+    Encryption at rest of the surrogate cache with Fernet (package cryptography).
+
+    Parameters
+    ----------
+    key : str or bytes, Fernet key (Fernet.generate_key())
+    """
+
+    def __init__(self, key):
+        try:
+            from cryptography.fernet import Fernet
+        except ImportError:
+            raise ImportError('Encryption of the surrogate cache needs the package cryptography.')
+        self.fernet = Fernet(key)
+
+    def encrypt(self, data):
+        return self.fernet.encrypt(data)
+
+    def decrypt(self, data):
+        return self.fernet.decrypt(data)
+
+
+class SurrogateCache:
+
+    """
+    Persistent store (SQLite) of resolved surrogates over runs, e.g. the tables of mode fictive which keep
+    the surrogates consistent (CasManagementFictive.get_consistency_tables).
+
+    An entry is keyed by the salt (site or project), the table (kind) and the normalized original, the key
+    is hashed with the salt. The value (original and surrogate) is private data, it is encrypted by the
+    cipher if given (object with encrypt(bytes) and decrypt(bytes), e.g. FernetCipher).
+
+    Eviction: entries not used for max_age_days are removed, beyond max_entries the least recently used entries.
+    The column written holds the last use, it is renewed for the entries served from the cache (update(used=...)).
+
+    Parameters
+    ----------
+    db_path : str
+    salt : str
+    cipher : object with encrypt and decrypt, optional
+    max_entries : int, optional
+    max_age_days : float, optional
+    """
+
+    def __init__(self, db_path, salt='', cipher=None, max_entries=None, max_age_days=None):
+        self.db_path = db_path
+        self.salt = hashlib.sha256(('surrogate-cache\x00' + salt).encode('utf-8')).hexdigest()
+        self.cipher = cipher
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.connection = sqlite3.connect(db_path)
+        self.connection.executescript(_SCHEMA)
+        self.known = {}
+
+    def _key(self, table, original):
+        return hashlib.sha256(
+            (self.salt + '\x00' + table + '\x00' + normalize_original(original)).encode('utf-8')
+        ).hexdigest()
+
+    def _encode(self, original, surrogate):
+        data = json.dumps([original, surrogate], ensure_ascii=False).encode('utf-8')
+        return self.cipher.encrypt(data) if self.cipher is not None else data
+
+    def _decode(self, value):
+        data = self.cipher.decrypt(value) if self.cipher is not None else value
+        return json.loads(data.decode('utf-8'))
+
+    def load(self, tables=None):
+        """
+        Load the cached surrogates of the salt, after the eviction of old entries.
+
+        Parameters
+        ----------
+        tables : list of strings, default: all tables
+
+        Returns
+        -------
+        dict, {table: {original: surrogate}}
+        """
+
+        self.evict()
+
+        loaded = {}
+        for table, key, value in self.connection.execute(
+                'SELECT tab, key, value FROM surrogate WHERE salt = ?', (self.salt,)
+        ):
+            if tables is not None and table not in tables:
+                continue
+            try:
+                original, surrogate = self._decode(value)
+            except Exception:
+                logging.warning(msg='Surrogate cache: entry not readable (other key?), ignored.')
+                continue
+            loaded.setdefault(table, {})[original] = surrogate
+            self.known.setdefault(table, set()).add(key)
+
+        logging.info(msg='Surrogate cache ' + self.db_path + ': ' +
+                         str(sum(len(surrogates) for surrogates in loaded.values())) + ' surrogates loaded.')
+        return loaded
+
+    def update(self, tables, used=None):
+        """
+        Append the new surrogates of the tables and renew the last use of the used entries,
+        committed with commit().
+
+        Parameters
+        ----------
+        tables : dict, {table: {original: surrogate}}
+        used : dict, optional, {table: originals}, originals served from the cache since the last update
+
+        Returns
+        -------
+        int, number of new entries
+        """
+
+        now = time.time()
+
+        touched = []
+        for table, originals in (used or {}).items():
+            known = self.known.get(table, set())
+            for original in originals:
+                key = self._key(table, original)
+                if key in known:
+                    touched.append((now, self.salt, table, key))
+        self.connection.executemany(
+            'UPDATE surrogate SET written = ? WHERE salt = ? AND tab = ? AND key = ?', touched
+        )
+
+        rows = []
+        for table, surrogates in tables.items():
+            known = self.known.setdefault(table, set())
+            for original, surrogate in surrogates.items():
+                key = self._key(table, original)
+                if key not in known:
+                    known.add(key)
+                    rows.append((self.salt, table, key, self._encode(original, surrogate), now))
+
+        self.connection.executemany(
+            'INSERT OR REPLACE INTO surrogate (salt, tab, key, value, written) VALUES (?, ?, ?, ?, ?)', rows
+        )
+        return len(rows)
+
+    def evict(self):
+        """
+        Remove the entries of the salt older than max_age_days and the oldest beyond max_entries.
+
+        Returns
+        -------
+        int, number of removed entries
+        """
+
+        removed = 0
+        if self.max_age_days:
+            removed = removed + self.connection.execute(
+                'DELETE FROM surrogate WHERE salt = ? AND written < ?',
+                (self.salt, time.time() - self.max_age_days * 24 * 60 * 60)
+            ).rowcount
+        if self.max_entries:
+            removed = removed + self.connection.execute(
+                'DELETE FROM surrogate WHERE salt = ? AND rowid NOT IN '
+                '(SELECT rowid FROM surrogate WHERE salt = ? ORDER BY written DESC LIMIT ?)',
+                (self.salt, self.salt, self.max_entries)
+            ).rowcount
+        self.connection.commit()
+
+        if removed:
+            logging.info(msg='Surrogate cache: ' + str(removed) + ' entries evicted.')
+        return removed
+
+    def commit(self):
+        self.connection.commit()
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -4,11 +4,15 @@ This file is derived from
 https://github.com/inception-project/inception-reporting-dashboard/blob/main/inception_reports/generate_reports_manager.py
 """
 
-import copy
+import hashlib
 import logging as log
 import os
+import secrets
 import shutil
+import tempfile
 import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
 
@@ -24,6 +28,15 @@ from streamlit import session_state
 from Surrogator.FileUtils import read_dir
 from Surrogator.QualityControl import run_quality_control_of_project, write_quality_control_report
 from Surrogator.Substitution.ProjectManagement import set_surrogates_in_inception_projects
+from Surrogator.Substitution.CasManagement.Fictive import CasManagementFictive
+
+# downloads are served from here by Streamlit (server.enableStaticServing) without reading them into memory
+STATIC_DIR = Path(__file__).parent / 'static'
+DOWNLOAD_MAX_AGE_SECONDS = 24 * 60 * 60
+
+# concurrent project exports from INCEpTION (API)
+EXPORT_WORKERS = 4
+EXPORT_RETRIES = 1
 
 st.set_page_config(
     page_title="GeMTeX Surrogator",
@@ -105,6 +118,271 @@ def check_package_version(current_version, package_name):
     return None
 
 
+@st.cache_resource(show_spinner="Loading models of mode fictive ...")
+def load_fictive_models():
+    """
+    Load the models of mode fictive once per webservice process.
+
+    Returns
+    -------
+    SentenceTransformer, spacy.Language
+    """
+
+    import spacy
+    from Surrogator.Configuration.model_loader import load_embedding_model
+    from Surrogator.Configuration.const import SPACY_MODEL
+
+    return load_embedding_model(), spacy.load(SPACY_MODEL)
+
+
+def hash_project_files(dir_path, selected_projects=None):
+    """
+    Content hash of the project exports (zip files) in a directory.
+
+    Parameters
+    ----------
+    dir_path : str
+    selected_projects : list of strings
+
+    Returns
+    -------
+    str
+    """
+
+    content_hash = hashlib.sha256()
+    for file_name in sorted(os.listdir(dir_path)):
+        if not file_name.endswith('.zip'):
+            continue
+        if selected_projects and file_name.split(".")[0] not in selected_projects:
+            continue
+        content_hash.update(file_name.encode('utf-8'))
+        with open(os.path.join(dir_path, file_name), 'rb') as project_file:
+            for chunk in iter(lambda: project_file.read(1024 * 1024), b''):
+                content_hash.update(chunk)
+    return content_hash.hexdigest()
+
+
+@st.cache_resource(show_spinner="Reading projects ...", max_entries=8)
+def _read_projects(dir_path, selected_projects, content_hash):
+    return read_dir(dir_path=dir_path, selected_projects=selected_projects)
+
+
+def load_projects(dir_path, selected_projects=None):
+    """
+    Read the projects of a directory, cached by the content hash of the project exports.
+    The cached projects are shared, they are only read (quality control).
+
+    Parameters
+    ----------
+    dir_path : str
+    selected_projects : list of strings
+
+    Returns
+    -------
+    list of dicts
+    """
+
+    dir_path = str(dir_path)
+    return _read_projects(dir_path, selected_projects, hash_project_files(dir_path, selected_projects))
+
+
+def create_download(root_dir, file_name, label, private=True):
+    """
+    Zip a directory on disk and offer it as download.
+    PRIVATE archives are always passed to a download button of the session, the zip file is written to a
+    temporary directory and removed afterwards. Only public archives are served with static serving
+    (server.enableStaticServing) by a link with an unguessable path, static files need no login.
+
+    Parameters
+    ----------
+    root_dir : str
+    file_name : str, name of the downloaded zip file
+    label : str
+    private : bool, the archive contains original (not surrogated) data
+    """
+
+    if private:
+        dir_tmp = tempfile.mkdtemp(prefix='surrogator_download_')
+        try:
+            path_archive = shutil.make_archive(
+                base_name=dir_tmp + os.sep + file_name.replace('.zip', ''),
+                format='zip',
+                root_dir=root_dir
+            )
+            with open(path_archive, "rb") as zip_file:
+                ste.download_button(label=label, data=zip_file, file_name=file_name, mime='application/zip')
+        finally:
+            shutil.rmtree(dir_tmp, ignore_errors=True)
+    elif st.get_option('server.enableStaticServing'):
+        STATIC_DIR.mkdir(exist_ok=True)
+        for old_download in STATIC_DIR.glob('*.zip'):
+            if time.time() - old_download.stat().st_mtime > DOWNLOAD_MAX_AGE_SECONDS:
+                old_download.unlink()
+
+        path_archive = shutil.make_archive(
+            base_name=str(STATIC_DIR / (secrets.token_urlsafe(24) + '_' + file_name.replace('.zip', ''))),
+            format='zip',
+            root_dir=root_dir
+        )
+        st.markdown(
+            '<a href="app/static/' + os.path.basename(path_archive) + '" download="' + file_name + '">'
+            + label + '</a>',
+            unsafe_allow_html=True
+        )
+    else:
+        path_archive = shutil.make_archive(base_name=root_dir, format='zip', root_dir=root_dir)
+        with open(path_archive, "rb") as zip_file:
+            ste.download_button(label=label, data=zip_file, file_name=file_name, mime='application/zip')
+
+
+def run_surrogates_with_progress(config, projects=None):
+    """
+    Run the surrogation in a background worker and show its progress.
+    The models of mode fictive are taken from the cache.
+
+    Parameters
+    ----------
+    config : dict
+    projects : iterable of projects (e.g. export_inception_projects), default: read from the config
+
+    Returns
+    -------
+    dict or 0, return of set_surrogates_in_inception_projects
+    """
+
+    cas_managements = {}
+    if 'fictive' in config['surrogate_process']['surrogate_modes']:
+        model, nlp = load_fictive_models()
+        cas_managements['fictive'] = CasManagementFictive(config=config, model=model, nlp=nlp)
+
+    progress = {'text': 'Starting...', 'value': 0.0}
+
+    def update_progress(mode, project_name, processed_documents, documents):
+        progress['text'] = ('mode ' + mode + ', project ' + project_name + ': ' + str(processed_documents)
+                            + ' / ' + str(documents) + ' documents')
+        progress['value'] = processed_documents / documents if documents else 1.0
+
+    progress_bar = st.progress(0.0, text=progress['text'])
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix='surrogator') as executor:
+        future = executor.submit(
+            set_surrogates_in_inception_projects,
+            config=config,
+            cas_managements=cas_managements,
+            progress_callback=update_progress,
+            projects=projects
+        )
+        while not future.done():
+            progress_bar.progress(progress['value'], text=progress['text'])
+            time.sleep(0.25)
+    progress_bar.progress(1.0, text='Processing done.')
+
+    return future.result()
+
+
+def verify_project_export(file_path, size):
+    """
+    Check a downloaded project export: file size and the CRC of all zip members.
+
+    Parameters
+    ----------
+    file_path : str
+    size : int, number of downloaded bytes
+
+    Returns
+    -------
+    bool
+    """
+
+    if os.path.getsize(file_path) != size:
+        return False
+    try:
+        with zipfile.ZipFile(file_path) as zip_file:
+            return zip_file.testzip() is None
+    except zipfile.BadZipFile:
+        return False
+
+
+def export_inception_project(inception_client, project_id, projects_folder, retries=EXPORT_RETRIES):
+    """
+    Export a project from INCEpTION (jsoncas), verify the download and read it.
+    The export is written under a temporary name and renamed after the verification,
+    read_dir never sees an incomplete file.
+
+    Parameters
+    ----------
+    inception_client : Pycaprio
+    project_id : int
+    projects_folder : str
+    retries : int, further downloads of a damaged export
+
+    Returns
+    -------
+    list of dicts, read_dir of the project
+    """
+
+    project = inception_client.api.project(project_id)
+    file_path = projects_folder + os.sep + project.project_name + '.zip'
+    file_path_part = projects_folder + os.sep + '.' + project.project_name + '.zip.part'
+
+    for attempt in range(retries + 1):
+        start = time.perf_counter()
+        log.info(f"Importing project {project.project_name} into {file_path} ")
+        project_export = inception_client.api.export_project(project, "jsoncas")
+
+        with open(file_path_part, "wb") as f:
+            f.write(project_export)
+
+        if verify_project_export(file_path_part, len(project_export)):
+            os.replace(file_path_part, file_path)
+            log.info(f"Import of project {project.project_name} verified "
+                     f"({len(project_export)} bytes, {round(time.perf_counter() - start, 2)} s)")
+            break
+        log.warning(f"Export of project {project.project_name} damaged (attempt {attempt + 1}).")
+    else:
+        os.unlink(file_path_part)
+        raise ValueError('Export of project ' + project.project_name + ' damaged, size or CRC check failed.')
+
+    return read_dir(dir_path=projects_folder, selected_projects=[project.project_name])
+
+
+def _iterate_project_exports(futures):
+    for future in as_completed(futures):
+        yield from future.result()
+
+
+def export_inception_projects(inception_client, project_ids, projects_folder, max_workers=EXPORT_WORKERS):
+    """
+    Export projects from INCEpTION concurrently (bounded pool).
+    The exports start immediately, the returned iterator yields every project as soon as its own export
+    is downloaded, verified and read, so the processing of a project overlaps with further downloads.
+
+    Parameters
+    ----------
+    inception_client : Pycaprio
+    project_ids : list of ints
+    projects_folder : str
+    max_workers : int
+
+    Returns
+    -------
+    iterator of dicts, projects (read_dir)
+    """
+
+    os.makedirs(projects_folder, exist_ok=True)
+    for file in os.scandir(projects_folder):
+        if file.name.endswith(".zip") or file.name.endswith(".zip.part"):
+            os.unlink(file.path)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='inception_export')
+    futures = [
+        executor.submit(export_inception_project, inception_client, project_id, projects_folder)
+        for project_id in project_ids
+    ]
+    executor.shutdown(wait=False)
+
+    return _iterate_project_exports(futures)
+
+
 def set_sidebar_state(value):
     if st.session_state.sidebar_state == value:
         st.session_state.flag = value
@@ -180,11 +458,11 @@ def select_method_to_handle_the_data():
                     with open(file_path, "wb") as f:
                         f.write(uploaded_file.read())
                 selected_projects = [f.name.split(".")[0] for f in uploaded_files]
-                st.session_state["projects"] = read_dir(str(upload_folder), selected_projects)
+                st.session_state["projects"] = load_projects(upload_folder, selected_projects)
                 st.session_state["projects_folder"] = upload_folder
 
             elif projects_folder:
-                st.session_state["projects"] = read_dir(projects_folder)
+                st.session_state["projects"] = load_projects(projects_folder)
                 st.session_state["projects_folder"] = projects_folder
 
             st.session_state["task"] = "quality_control"
@@ -259,41 +537,22 @@ def select_method_to_handle_the_data():
                 selected_projects[project_id] = st.sidebar.checkbox(project_name, value=False)
                 st.session_state["selected_projects"] = selected_projects
 
-            selected_projects_names = []
-
             button_qc_a = st.sidebar.button("Run Quality Control")
             button_sur_a = st.sidebar.button("Run Creation Surrogates")
 
             if button_qc_a or button_sur_a:
-
-                for project_id, is_selected in selected_projects.items():
-
-                    if is_selected:
-
-                        project = inception_client.api.project(project_id)
-                        selected_projects_names.append(project.project_name)
-                        file_path = f"{projects_folder}/{project.project_name}.zip"
-
-                        proc_folder = f"{projects_folder}/"
-                        for file in os.scandir(proc_folder):
-                            if file.name.endswith(".zip"):
-                                os.unlink(file.path)
-                        if not os.path.isdir(proc_folder):
-                            os.makedirs(proc_folder)
-
-                        st.sidebar.write(f"Importing project: {project.project_name}")
-                        log.info(f"Importing project {project.project_name} into {file_path} ")
-                        project_export = inception_client.api.export_project(project, "jsoncas")
-
-                        with open(file_path, "wb") as f:
-                            f.write(project_export)
-                        log.debug("Import Success")
+                project_ids = [project_id for project_id, is_selected in selected_projects.items() if is_selected]
+                st.sidebar.write(f"Importing {len(project_ids)} projects ...")
 
                 st.session_state["method"] = "API"
-                st.session_state["projects"] = read_dir(
-                    dir_path=projects_folder,
-                    selected_projects=selected_projects_names
+                st.session_state["project_exports"] = export_inception_projects(
+                    inception_client=inception_client,
+                    project_ids=project_ids,
+                    projects_folder=projects_folder
                 )
+                # "projects" holds only read projects (dicts), they are added while the exports are processed
+                st.session_state["project_ids"] = project_ids
+                st.session_state["projects"] = []
 
             if button_qc_a:
                 st.session_state["task"] = "quality_control"
@@ -307,12 +566,14 @@ def select_method_to_handle_the_data():
                     },
                     'surrogate_process': {
                         # 'corpus_documents': corpus_documents,
-                        'surrogate_modes': []
+                        'surrogate_modes': [],
+                        'date_surrogation': date_shift
                     },
                     'output': ''
                 }
 
                 st.session_state["task"] = "surrogate"
+                st.session_state["projects"] = projects_folder
 
                 config['surrogate_process']['surrogate_modes'].append(modus)  # .append("gemtex") ## todo
                 config['surrogate_process']['rename_files'] = True
@@ -337,19 +598,11 @@ def create_zip_download_quality_control(project_name, timestamp_key, paths_repor
     Download button provided.
     """
 
-    shutil.make_archive(
-        base_name=os.getcwd() + os.sep + paths_reports['dir_project_quality_control'],
-        format='zip',
-        root_dir=os.getcwd() + os.sep + paths_reports['dir_project_quality_control']
-    )
-
-    with open(os.getcwd() + os.sep + paths_reports['dir_project_quality_control'] + '.zip', "rb") as zip_qc_file:
-        zip_qc_byte = zip_qc_file.read()
-    ste.download_button(
-        label="Download Quality Control Reports (ZIP) - " + project_name,
-        data=zip_qc_byte,
+    create_download(
+        root_dir=os.getcwd() + os.sep + paths_reports['dir_project_quality_control'],
         file_name='quality_control' + '_' + project_name + '_' + timestamp_key + '.zip',
-        mime='application/zip'
+        label="Download Quality Control Reports (ZIP) - " + project_name,
+        private=True
     )
 
 
@@ -466,12 +719,18 @@ def main():
     if (
             "method" in st.session_state.keys() and
             "projects" in st.session_state.keys() and
-            len(st.session_state["projects"]) > 0 and
+            (len(st.session_state["projects"]) > 0 or "project_exports" in st.session_state.keys()) and
             "config" not in st.session_state.keys()
     ):
-        projects = [copy.deepcopy(project) for project in st.session_state["projects"]]
-
-        projects = sorted(projects, key=lambda x: x["name"])
+        # the projects are shared with the cache, the quality control only reads them
+        # projects exported from INCEpTION are processed as soon as their export is downloaded
+        project_exports = st.session_state.pop("project_exports", None)
+        if project_exports is not None:
+            projects = project_exports
+            # stored one by one, a rerun (e.g. by a click) during the loop keeps the projects read so far
+            st.session_state["projects"] = []
+        else:
+            projects = sorted(st.session_state["projects"], key=lambda x: x["name"])
 
         st.write('<h2>Run Quality Control</h2>', unsafe_allow_html=True)
         st.write('Starting...', unsafe_allow_html=True)
@@ -479,6 +738,8 @@ def main():
         timestamp_key = datetime.now().strftime('%Y%m%d-%H%M%S')
 
         for project in projects:
+            if project_exports is not None:
+                st.session_state["projects"].append(project)
             quality_control = run_quality_control_of_project(project)
             st.write("<hr>", unsafe_allow_html=True)
             project_name = '-'.join(project['name'].replace('.zip', '').split('-')[0:-1])
@@ -496,12 +757,18 @@ def main():
                 paths_reports=paths_reports
             )
 
+        if project_exports is not None:
+            st.session_state["projects"].sort(key=lambda x: x["name"])
+
         st.write("<hr>", unsafe_allow_html=True)
 
     if "config" in st.session_state and "projects" in st.session_state:
         st.write('<h2>Run Creation Surrogates</h2>', unsafe_allow_html=True)
 
-        surrogate_return = set_surrogates_in_inception_projects(config=st.session_state["config"])
+        surrogate_return = run_surrogates_with_progress(
+            config=st.session_state["config"],
+            projects=st.session_state.pop("project_exports", None)
+        )
 
         if surrogate_return == 0:
             st.write(
@@ -538,34 +805,18 @@ def main():
             st.write('<b>Private exports:</b> ' + str(dir_out_private), unsafe_allow_html=True)
             st.write('<b>Public exports:</b> ' + str(dir_out_public), unsafe_allow_html=True)
 
-            shutil.make_archive(
-                base_name=dir_out_private,
-                format='zip',
-                root_dir=str('private' + os.sep + 'private-' + timestamp_key),
-            )
-
-            with open(dir_out_private + '.zip', "rb") as zip_file:
-                zip_byte = zip_file.read()
-            ste.download_button(
-                label="Download PRIVATE files: cas annotation files and statistics (" + timestamp_key + ")",
-                data=zip_byte,
+            create_download(
+                root_dir=dir_out_private,
                 file_name='private-' + timestamp_key + '.zip',
-                mime='application/zip'
-            )
-
-            shutil.make_archive(
-                base_name=dir_out_public,
-                format='zip',
-                root_dir=str('public' + os.sep + 'public-' + timestamp_key),
+                label="Download PRIVATE files: cas annotation files and statistics (" + timestamp_key + ")",
+                private=True
             )
 
-            with open(dir_out_public + '.zip', "rb") as zip_file_public:
-                zip_byte_public = zip_file_public.read()
-            ste.download_button(
-                label="Download PUBLIC files: text files with surrogates (" + timestamp_key + ")",
-                data=zip_byte_public,
+            create_download(
+                root_dir=dir_out_public,
                 file_name='public-' + timestamp_key + '.zip',
-                mime='application/zip'
+                label="Download PUBLIC files: text files with surrogates (" + timestamp_key + ")",
+                private=False
             )
 
             st.write('Processing done.')
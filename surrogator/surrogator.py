@@ -27,6 +27,12 @@ if __name__ == '__main__':
         
         -   run with mode *fictive*
             `python surrogator.py -f -p path_to_projects`
+
+        -   headless HTTP surrogation service
+            `python surrogator.py -api --modes entity,fictive --port 8502`
+
+        -   re-identification lookup in the key assignments of a run
+            `python surrogator.py -l -p private/private-timestamp_key --surrogate FR7CR8`
     """
 
     if not os.path.isdir('log'):
@@ -74,6 +80,24 @@ if __name__ == '__main__':
         help="Starting via Webservice",
         action="store_true",
         )
+    group.add_argument(
+        "-api",
+        "--api",
+        help="Starting the headless HTTP surrogation service",
+        action="store_true",
+    )
+    group.add_argument(
+        "-l",
+        "--lookup",
+        help="Lookup in key assignments (re-identification)",
+        action="store_true",
+    )
+    group.add_argument(
+        "-ej",
+        "--export_json",
+        help="Export key assignments as json files",
+        action="store_true",
+    )
 
     args_input = parser._action_groups.pop()
 
@@ -92,6 +116,144 @@ if __name__ == '__main__':
         help='Integer value as date shift'
     )
 
+    parser.add_argument(
+        "-j",
+        "--json_key_assignment",
+        help="Write key assignments additionally as json files (modes gemtex and fictive)",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--archive",
+        type=str,
+        choices=["zip", "tar"],
+        help="Write the text and cas files of a project into one archive each"
+    )
+
+    parser.add_argument(
+        "--fsync",
+        type=str,
+        choices=["none", "batch", "file"],
+        default="none",
+        help="fsync policy of the written output files"
+    )
+
+    parser.add_argument(
+        "-i",
+        "--incremental",
+        help="Skip documents which are unchanged since a former run with the same mode and configuration",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        help="Path of the manifest of incremental runs (default: private/manifest.db)"
+    )
+
+    parser.add_argument(
+        "--checkpoint",
+        type=int,
+        default=10,
+        help="Write a checkpoint every n documents (0: no checkpoints)"
+    )
+
+    parser.add_argument(
+        "--prometheus",
+        help="Write the stage profile of mode fictive additionally in Prometheus text format",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--fast",
+        help="Modes x and entity: process the cas json files without cas objects (the quality control report "
+             "is written as usual, not with --incremental and --resume)",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--surrogate_cache",
+        type=str,
+        metavar="PATH",
+        help="Mode fictive: persistent cache (SQLite) of resolved surrogates over runs, "
+             "encrypted with the Fernet key of the environment variable SURROGATOR_CACHE_KEY if set"
+    )
+
+    parser.add_argument(
+        "--cache_salt",
+        type=str,
+        default="",
+        help="Salt (site or project) of the surrogate cache, runs with another salt do not share surrogates"
+    )
+
+    parser.add_argument(
+        "--cache_max_entries",
+        type=int,
+        help="Surrogate cache: keep at most n entries (the newest)"
+    )
+
+    parser.add_argument(
+        "--cache_max_age_days",
+        type=float,
+        help="Surrogate cache: remove entries not written for n days"
+    )
+
+    parser.add_argument(
+        "--corpus",
+        help="Mode fictive: resolve the surrogates of all documents of a project at once (consistent names and "
+             "dates over the corpus), rewrite the documents one at a time",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--modes",
+        type=str,
+        default="x,entity,gemtex,fictive",
+        help="Surrogate modes loaded by the HTTP service, comma separated"
+    )
+
+    parser.add_argument(
+        "--host",
+        type=str,
+        default="127.0.0.1",
+        help="Host of the HTTP service"
+    )
+
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8502,
+        help="Port of the HTTP service"
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Documents processed concurrently by the HTTP service or examined by processes in the quality control"
+    )
+
+    parser.add_argument(
+        "--queue_size",
+        type=int,
+        default=32,
+        help="Documents waiting for a worker of the HTTP service, further documents are rejected (503)"
+    )
+
+    parser.add_argument(
+        "--resume",
+        type=str,
+        metavar="TIMESTAMP_KEY",
+        help="Resume an interrupted run from its last checkpoint (same input and mode as the interrupted run)"
+    )
+
+    for lookup_argument in ["surrogate", "original", "project", "document", "kind"]:
+        parser.add_argument(
+            "--" + lookup_argument,
+            type=str,
+            help='Lookup restricted to ' + lookup_argument
+        )
+
     parser._action_groups.append(args_input)
     args = parser.parse_args()
 
@@ -112,9 +274,23 @@ if __name__ == '__main__':
             "streamlit",
             "run",
             f"{os.path.dirname(os.path.realpath(__file__))}" + os.sep + "Surrogator" + os.sep + "Webservice" + os.sep + "__init__.py",
+            "--server.enableStaticServing",
+            "true",
         ]
         sys.exit(cli.main())
 
+    elif args.api:
+        import re
+        from Surrogator.Service import run_service
+        run_service(
+            modes=re.split(r',\s*', args.modes),
+            date_shift=int(args.DATE) if args.DATE else 0,
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            queue_size=args.queue_size
+        )
+
     else:
         if args.INPUT_PATH:
 
@@ -124,10 +300,38 @@ if __name__ == '__main__':
                     "input": {
                         "task": "quality_control",
                         "annotation_project_path": args.INPUT_PATH
+                    },
+                    "quality_control": {
+                        "workers": args.workers
                     }
                 }
                 run_quality_control_only(config=config)
 
+            elif args.lookup:
+                import json
+                from Surrogator.Substitution.KeyStore import lookup_key_assignments
+                print(json.dumps(
+                    lookup_key_assignments(
+                        path=args.INPUT_PATH,
+                        surrogate=args.surrogate,
+                        original=args.original,
+                        project=args.project,
+                        document=args.document,
+                        kind=args.kind
+                    ),
+                    indent=2,
+                    ensure_ascii=False
+                ))
+
+            elif args.export_json:
+                from Surrogator.Substitution.KeyStore import KeyAssignmentStore, find_key_stores, KEY_STORE_SUFFIX
+                for key_store_path in find_key_stores(args.INPUT_PATH):
+                    with KeyAssignmentStore(key_store_path) as key_store:
+                        key_store.export_json(
+                            path_json=key_store_path[:-len(KEY_STORE_SUFFIX)] + '.json',
+                            path_json_flat=key_store_path[:-len(KEY_STORE_SUFFIX)] + '_flat.json'
+                        )
+
             else:
                 if args.x_surrogates:
                     surrogate_mode = "x"
@@ -160,7 +364,26 @@ if __name__ == '__main__':
                         "annotation_project_path": args.INPUT_PATH,
                     },
                     "surrogate_process": {
-                        "surrogate_modes": surrogate_mode
+                        "surrogate_modes": surrogate_mode,
+                        "corpus": args.corpus,
+                        "fast": args.fast
+                    },
+                    "output": {
+                        "key_assignment_json": args.json_key_assignment,
+                        "archive": args.archive,
+                        "fsync": args.fsync,
+                        "incremental": args.incremental,
+                        "manifest": args.manifest,
+                        "checkpoint_interval": args.checkpoint,
+                        "resume": args.resume,
+                        "profile_prometheus": args.prometheus,
+                        "surrogate_cache": args.surrogate_cache,
+                        "surrogate_cache_salt": args.cache_salt,
+                        "surrogate_cache_max_entries": args.cache_max_entries,
+                        "surrogate_cache_max_age_days": args.cache_max_age_days
+                    },
+                    "quality_control": {
+                        "workers": args.workers
                     }
                 }
 
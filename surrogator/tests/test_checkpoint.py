@@ -0,0 +1,29 @@
+from Surrogator.Substitution.Checkpoint import RunCheckpoint
+
+
+class CorpusCasManagement:
+
+    def __init__(self):
+        self.used_keys = []
+        self.corpus_tables = {}
+
+    def get_corpus_tables(self):
+        return self.corpus_tables
+
+    def set_corpus_tables(self, tables):
+        self.corpus_tables = tables
+
+
+def test_corpus_tables_are_restored(tmp_path):
+    cm = CorpusCasManagement()
+    cm.corpus_tables = {'global_names': {'Müller': 'Schneider'}, 'global_dates': {'01.02.2020': '03.04.2020'}}
+    checkpoint = RunCheckpoint(str(tmp_path), interval=1)
+    checkpoint.document_done(cm, 'fictive', 'project', 'doc_1')
+
+    resumed_cm = CorpusCasManagement()
+    resumed = RunCheckpoint(str(tmp_path), interval=1)
+    assert resumed.load()
+    resumed.restore(resumed_cm, 'fictive')
+
+    assert resumed.is_done('fictive', 'project', 'doc_1')
+    assert resumed_cm.corpus_tables == cm.corpus_tables
@@ -0,0 +1,26 @@
+from Surrogator.Substitution.Entities.Id import classify_identifiers, surrogate_identifiers, surrogate_pattern
+
+
+def test_lower_case_words_are_no_bic():
+    words = ['hospital', 'krankenhaus', 'Hospital', 'max.mustermann']
+    assert set(classify_identifiers(words).values()) == {'ID'}
+
+    surrogate = surrogate_identifiers(['hospital'])['hospital']
+    assert surrogate.islower() and len(surrogate) == len('hospital')
+
+
+def test_bic_and_iban_are_classified():
+    id_classes = classify_identifiers(['COBADEFFXXX', 'DE89 3704 0044 0532 0130 00', 'de89370400440532013000'])
+    assert id_classes == {
+        'COBADEFFXXX': 'BIC',
+        'DE89 3704 0044 0532 0130 00': 'IBAN',
+        'de89370400440532013000': 'IBAN',
+    }
+
+
+def test_letters_outside_the_table_are_replaced():
+    surrogate = surrogate_pattern('Ébénézer-Ñuñez-ç7')
+
+    assert not set('ÉéÑñç') & set(surrogate)
+    assert surrogate[0].isupper() and surrogate[1:8].islower() and surrogate[8] == '-'
+    assert surrogate[9].isupper() and surrogate[-1].isdigit() and len(surrogate) == len('Ébénézer-Ñuñez-ç7')
@@ -0,0 +1,37 @@
+import json
+
+from Surrogator.Substitution.KeyStore import KeyAssignmentStore
+
+
+def _query_plan(key_store, where, values):
+    return ' '.join(
+        row[-1] for row in key_store.connection.execute(
+            'EXPLAIN QUERY PLAN SELECT * FROM key_assignment WHERE ' + where, values
+        )
+    )
+
+
+def test_lookup_by_surrogate_uses_an_index(tmp_path):
+    with KeyAssignmentStore(str(tmp_path / 'key_assignment.db')) as key_store:
+        key_store.add_document('project', 'document', 'fictive', {'NAME_PATIENT': {'Meier': 'Müller'}})
+        key_store.commit()
+
+        assert key_store.lookup(surrogate='Meier') == [{
+            'project': 'project', 'document': 'document', 'kind': 'NAME_PATIENT',
+            'surrogate': 'Meier', 'original': 'Müller', 'mode': 'fictive'
+        }]
+        assert 'idx_key_assignment_by_surrogate' in _query_plan(key_store, 'surrogate = ?', ['Meier'])
+        assert 'SCAN' not in _query_plan(key_store, 'surrogate = ?', ['Meier'])
+
+
+def test_documents_without_surrogates_are_exported(tmp_path):
+    with KeyAssignmentStore(str(tmp_path / 'key_assignment.db')) as key_store:
+        key_store.add_document('project', 'document_1', 'fictive', {'NAME_PATIENT': {'Meier': 'Müller'}})
+        key_store.add_document('project', 'document_2', 'fictive', {})
+        key_store.export_json(str(tmp_path / 'key_assignment.json'))
+
+    with open(tmp_path / 'key_assignment.json', encoding='utf8') as key_assignment_file:
+        assert json.load(key_assignment_file) == {
+            'document_1': {'filename_orig': 'document_1', 'annotations': {'NAME_PATIENT': {'Meier': 'Müller'}}},
+            'document_2': {'filename_orig': 'document_2', 'annotations': {}},
+        }
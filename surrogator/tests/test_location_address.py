@@ -0,0 +1,27 @@
+import overpy
+
+from Surrogator.Substitution.Entities.Location.Location_address import MAX_ADMIN_LEVEL, sample_child_relation
+
+
+class EmptyOverpass:
+
+    def __init__(self):
+        self.queries = []
+
+    def query(self, query):
+        self.queries.append(query)
+        return overpy.Result()
+
+
+def test_sample_child_relation_stops_after_the_highest_admin_level():
+    overpass_api = EmptyOverpass()
+
+    assert sample_child_relation(4711, 8, overpass_api) == (None, None)
+    assert len(overpass_api.queries) == MAX_ADMIN_LEVEL - 8 + 1
+
+
+def test_sample_child_relation_searches_a_street_once():
+    overpass_api = EmptyOverpass()
+
+    assert sample_child_relation(4711, 99, overpass_api) == (None, None)
+    assert len(overpass_api.queries) == 1
@@ -0,0 +1,44 @@
+import os
+import shutil
+
+from Surrogator.FileUtils import read_dir
+from Surrogator.Substitution.Manifest import RunManifest, hash_config
+
+PROJECTS_PATH = os.path.join(os.path.dirname(__file__), os.pardir, 'test_data', 'projects')
+
+
+def _config(**surrogate_process):
+    return {'surrogate_process': {'surrogate_modes': ['x'], 'date_surrogation': 0, **surrogate_process}}
+
+
+def test_options_of_the_run_do_not_change_the_hash():
+    assert hash_config(_config(fast=True), 'x') == hash_config(_config(fast=False), 'x')
+    assert hash_config(_config(), 'x') == hash_config(_config(fast=True, surrogate_modes=['x', 'entity']), 'x')
+
+
+def test_options_of_the_output_change_the_hash():
+    assert hash_config(_config(), 'fictive') != hash_config(_config(date_surrogation=7), 'fictive')
+    assert hash_config(_config(), 'fictive') != hash_config(_config(corpus=True), 'fictive')
+    assert hash_config(_config(), 'x') != hash_config(_config(), 'entity')
+
+
+def test_a_new_export_of_a_project_is_unchanged(tmp_path):
+    export = 'project-deid-test-data-1-2025-09-18-160813.zip'
+    shutil.copy(os.path.join(PROJECTS_PATH, export), tmp_path / export)
+    [project] = read_dir(str(tmp_path), load_cas=False)
+    config_hash = hash_config(_config(), 'x')
+
+    with RunManifest(str(tmp_path / 'manifest.db')) as manifest:
+        for document, cas_hash in project['annotation_hashes'].items():
+            manifest.record(project['slug'], document, cas_hash, 'x', config_hash, '20250918-160813',
+                            'public', 'private', document + '_deid')
+
+    # the same project exported again
+    os.rename(tmp_path / export, tmp_path / 'project-deid-test-data-1-2025-10-01-090000.zip')
+    [re_export] = read_dir(str(tmp_path), load_cas=False)
+    assert re_export['name'] != project['name']
+
+    with RunManifest(str(tmp_path / 'manifest.db')) as manifest:
+        assert re_export['annotation_hashes']
+        for document, cas_hash in re_export['annotation_hashes'].items():
+            assert manifest.is_unchanged(re_export['slug'], document, cas_hash, 'x', config_hash)
@@ -0,0 +1,53 @@
+from Surrogator.Profiling import StageProfiler
+
+
+def _profile(profiler, names):
+    for name in names:
+        with profiler.document(name):
+            profiler.lap('names', calls=2)
+            profiler.count_kind('NAME_PATIENT', cache_hit=True)
+            profiler.count('overpass_queries')
+
+
+def test_aggregate_without_documents():
+    kept, aggregated = StageProfiler(), StageProfiler(keep_documents=False)
+    _profile(kept, ['a', 'b', 'c'])
+    _profile(aggregated, ['a', 'b', 'c'])
+
+    assert aggregated.documents == {}
+    assert len(kept.documents) == 3
+    for profile in [kept.get_profile(), aggregated.get_profile()]:
+        total = profile['total']
+        assert total['documents'] == 3
+        assert total['stages']['names']['calls'] == 6
+        assert total['kinds']['NAME_PATIENT'] == {'annotations': 3, 'cache_hits': 3}
+        assert total['counters'] == {'overpass_queries': 3}
+
+
+def test_reset():
+    profiler = StageProfiler()
+    _profile(profiler, ['a'])
+    profiler.reset()
+    assert profiler.get_profile()['total']['documents'] == 0
+    assert profiler.documents == {}
+
+
+def test_corpus_documents_and_project_stage():
+    profiler = StageProfiler()
+    for name in ['a', 'b', 'c']:
+        with profiler.document(name, finish=False):
+            profiler.lap('collect')
+    profiler.finish('c')
+    with profiler.project_stage('resolve_corpus'):
+        profiler.lap('names', calls=4)
+    for name in ['a', 'b']:
+        with profiler.document(name):
+            profiler.lap('substitution')
+
+    profile = profiler.get_profile()
+    assert profile['total']['documents'] == 3
+    assert set(profile['documents']) == {'a', 'b', 'c'}
+    assert set(profile['documents']['a']['stages']) == {'collect', 'substitution'}
+    assert profile['project_stages']['resolve_corpus']['stages']['names']['calls'] == 4
+    assert profile['total']['stages']['names']['calls'] == 4
+    assert profile['total']['stages']['collect']['calls'] == 3
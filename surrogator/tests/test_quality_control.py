@@ -0,0 +1,43 @@
+import os
+
+from Surrogator.FileUtils import read_dir
+from Surrogator.QualityControl import (
+    QUALITY_CONTROL_KEYS, QualityControlTables, examine_document, get_quality_control_table_paths,
+    run_quality_control_of_projects, write_quality_control_tables
+)
+
+PROJECTS_PATH = os.path.join(os.path.dirname(__file__), os.pardir, 'test_data', 'projects')
+
+
+def test_unreadable_cas_json_is_skipped():
+    assert examine_document('broken', b'{"no": "cas"') == {key: {} for key in QUALITY_CONTROL_KEYS}
+
+
+def test_unreadable_cas_json_does_not_abort_the_process_pool():
+    projects = [{'name': 'project', 'annotations': {'broken': b'not json'}}]
+
+    results = list(run_quality_control_of_projects(projects, workers=2))
+
+    assert len(results) == 1
+    assert results[0][1] == {key: {} for key in QUALITY_CONTROL_KEYS}
+
+
+def test_tables_are_written_while_the_documents_are_examined(tmp_path):
+    [project] = read_dir(PROJECTS_PATH, load_cas=False)
+    project['annotations']['broken'] = b'not json'
+
+    for workers in [1, 2]:
+        dir_streamed, dir_merged = tmp_path / ('streamed_' + str(workers)), tmp_path / ('merged_' + str(workers))
+        dir_streamed.mkdir()
+        dir_merged.mkdir()
+
+        [(_, quality_control)] = run_quality_control_of_projects(
+            [project], workers=workers, open_tables=lambda p: QualityControlTables(str(dir_streamed), p['name'])
+        )
+        paths = write_quality_control_tables(quality_control, str(dir_merged), project['name'])
+
+        for table, path in get_quality_control_table_paths(str(dir_streamed), project['name']).items():
+            with open(path, encoding='utf8') as streamed, open(paths[table], encoding='utf8') as merged:
+                # the wrong annotations are written per document, not per kind
+                assert sorted(streamed) == sorted(merged)
+        assert 'broken' not in quality_control['corpus_files']
@@ -0,0 +1,18 @@
+import time
+
+from Surrogator.Substitution.SurrogateCache import SurrogateCache
+
+
+def test_used_entries_are_not_evicted(tmp_path):
+    db_path = str(tmp_path / 'cache.db')
+    with SurrogateCache(db_path, salt='site') as cache:
+        cache.update({'global_location_hospitals': {'Klinikum A': 'Klinikum X', 'Klinikum B': 'Klinikum Y'}})
+        # both written 30 days ago
+        cache.connection.execute('UPDATE surrogate SET written = ?', (time.time() - 30 * 24 * 60 * 60,))
+
+    with SurrogateCache(db_path, salt='site', max_age_days=60) as cache:
+        # only Klinikum A occurs in this run
+        cache.update(cache.load(), used={'global_location_hospitals': {'Klinikum A'}})
+
+    with SurrogateCache(db_path, salt='site', max_age_days=10) as cache:
+        assert cache.load() == {'global_location_hospitals': {'Klinikum A': 'Klinikum X'}}
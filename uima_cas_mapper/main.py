@@ -123,16 +123,22 @@ def mark_new(
 
     for source_layer, mapping_dict in mapping.annotation_mapping.items():
         duplicate_check = defaultdict(dict)
+        _dupl = mapping_dict.additional_feats.pop(mapping_dict.target_feature, None)
+        if _dupl is not None:
+            logging.warning(f"Removed {_dupl} from 'add_feature' for entry '{mapping_dict.entry_name}'.")
         try:
             for layer_instance in old_cas.select(source_layer):
                 feat = {mapping_dict.target_feature: 'none'}
-                if mapping_dict.mapping_type == MappingTypeEnum.SINGLELAYER:
+                if mapping_dict.dispatch is not None:
+                    # compiled mapping: one feature read and one lookup
+                    _match = mapping_dict.dispatch.get(layer_instance)
+                    if _match is not None:
+                        feat = {mapping_dict.target_feature: _match[0]}
+                        feat.update({tf: sf[0](layer_instance, sf[1]) for tf, sf in _match[1].items()})
+                elif mapping_dict.mapping_type == MappingTypeEnum.SINGLELAYER:
                     for k, v in mapping_dict.items():
                         if v(layer_instance):
                             feat = {mapping_dict.target_feature: k}
-                            _dupl = mapping_dict.additional_feats.pop(mapping_dict.target_feature, None)
-                            if _dupl is not None:
-                                logging.warning(f"Removed {_dupl} from 'add_feature' for entry '{mapping_dict.entry_name}_{k}'.")
                             feat.update({tf: sf[0](layer_instance, sf[1]) for tf, sf in mapping_dict.additional_feats.items()})
                             break
                 else:
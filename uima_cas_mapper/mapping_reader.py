@@ -6,7 +6,7 @@ Date: February 27, 2024
 
 Description: Contains a class that interprets a mapping file and provides the mapping methods.
 """
-__version__ = "1.3.0"
+__version__ = "1.4.0"
 
 import enum
 import json
@@ -14,7 +14,7 @@ import logging
 import pathlib
 from collections import defaultdict
 from types import SimpleNamespace
-from typing import Union, Iterator, Dict
+from typing import Union, Iterator, Dict, Optional, Tuple
 
 
 class ArchitectureEnum(enum.Enum):
@@ -27,6 +27,54 @@ class MappingTypeEnum(enum.Enum):
     MULTILAYER = "multilayer"
 
 
+def _normalized_value(value) -> str:
+    return (value if (value is not None and len(value) > 0) else "none").lower()
+
+
+class AlwaysCheck:
+    """Check of an entry without a 'feature' condition: every annotation of the source layer matches."""
+
+    def __call__(self, x) -> bool:
+        return True
+
+
+class FeatureExistsCheck:
+    """'@feature': the feature of the annotation is set."""
+
+    def __init__(self, feature: str):
+        self.feature = feature
+
+    def __call__(self, x) -> bool:
+        return x.get(self.feature) is not None
+
+
+class FeatureValueCheck:
+    """'@feature==a|b': the lower-cased value of the feature (empty or missing: 'none') is one of the values."""
+
+    def __init__(self, feature: str, values: str):
+        self.feature = feature
+        self.values = [c.lower() for c in values.split("|")]
+
+    def __call__(self, x) -> bool:
+        return _normalized_value(x.get(self.feature)) in self.values
+
+
+class LabelDispatch:
+    """Compiled checks of a singlelayer source layer: one feature read and one lookup of the lower-cased value
+    in a dict to (label, additional feature extractors). The first matching label of the mapping file wins,
+    as with the checks tried one after another; ``default`` is the label of an entry without condition."""
+
+    def __init__(self, feature: Optional[str], table: Dict[str, Tuple[str, dict]], default: Optional[Tuple[str, dict]]):
+        self.feature = feature
+        self.table = table
+        self.default = default
+
+    def get(self, x) -> Optional[Tuple[str, dict]]:
+        if self.feature is None:
+            return self.default
+        return self.table.get(_normalized_value(x.get(self.feature)), self.default)
+
+
 class AnnotationMapping(dict):
     def __init__(
         self,
@@ -46,6 +94,7 @@ class AnnotationMapping(dict):
         self.entry_name = entry_name
         self.additional_feats = add_feat
         self.priority = priority
+        self.dispatch: Optional[LabelDispatch] = None
 
     @property
     def priority(self):
@@ -87,6 +136,24 @@ class AnnotationMapping(dict):
     def additional_feats(self, val: dict):
         self._additional_feats = val if isinstance(val, dict) else {}
 
+    def compile(self) -> Optional[LabelDispatch]:
+        """Dispatch structure of the labels, None if the checks can't be compiled (multilayer entries,
+        checks of different features or of the existence of a feature); then the checks are tried in order."""
+        if self.mapping_type != MappingTypeEnum.SINGLELAYER:
+            return None
+        feature = None
+        table = {}
+        for label, check in self.items():
+            if isinstance(check, AlwaysCheck):
+                # labels after an entry without condition are never reached
+                return LabelDispatch(feature, table, (label, self.additional_feats))
+            if not isinstance(check, FeatureValueCheck) or feature not in (None, check.feature):
+                return None
+            feature = check.feature
+            for value in check.values:
+                table.setdefault(value, (label, self.additional_feats))
+        return LabelDispatch(feature, table, None)
+
 
 class MappingConfig:
     constants: dict
@@ -139,7 +206,7 @@ class MappingConfig:
                         for key, val in feat_val.items():
                             if isinstance(val, dict):
                                 check_fs = MappingConfig.resolve_simple_bool(
-                                    val.get("feature", lambda x: True)
+                                    val.get("feature", AlwaysCheck())
                                 )
                                 source_layer = val.get("layer", f".{key}")
                                 source_layer = source_layer if isinstance(source_layer, list) else [source_layer]
@@ -163,6 +230,9 @@ class MappingConfig:
                     else:
                         logging.warning(f"No proper description for entries feature '{entry_name}_features_{feat}' (needs to be object/dict).")
 
+        for annotation_mapping in self.annotation_mapping.values():
+            annotation_mapping.dispatch = annotation_mapping.compile()
+
     def get_expression_value(
         self,
         expression: Union[str, dict],
@@ -186,15 +256,9 @@ class MappingConfig:
         if isinstance(check, str) and check.startswith("@"):
             _expr = check[1:].split("==")
             if len(_expr) == 2:
-                _target = _expr[0]
-                _check = _expr[1]
+                return FeatureValueCheck(_expr[0], _expr[1])
             else:
-                return lambda x: x.get(_expr[0]) is not None
-            return lambda x: (
-                x.get(_target)
-                if (x.get(_target) is not None and len(x.get(_target)) > 0)
-                else "none"
-            ).lower() in [c.lower() for c in _check.split("|")]
+                return FeatureExistsCheck(_expr[0])
         else:
             return check
 